@@ -1 +1,18 @@
 from django.contrib import admin
+
+from .models import Mailing, OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "subject", "to_email", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to_email", "subject")
+    readonly_fields = ("claimed_at", "created_at", "sent_at", "last_error")
+
+
+@admin.register(Mailing)
+class MailingAdmin(admin.ModelAdmin):
+    list_display = ("name", "subject", "status", "sent_count", "failed_count", "last_recipient_id", "updated_at")
+    list_filter = ("status",)
+    readonly_fields = ("last_recipient_id", "sent_count", "failed_count", "created_at", "updated_at", "finished_at")
@@ -0,0 +1,144 @@
+"""
+Admin changelists for very large tables.
+
+`PerformanceAdminMixin` (put it before admin.ModelAdmin) switches a ModelAdmin
+to "performance mode" while ADMIN_PERFORMANCE_MODE is on:
+
+- EstimatedCountPaginator: the planner's row estimate instead of COUNT(*) on
+  unfiltered pages, a capped count on filtered ones. The pagination shows
+  "about N" with a link that asks for the exact count (?exact_count=1).
+- no second COUNT(*) for "N total" (show_full_result_count) and no facet counts,
+- foreign keys in list_filter become RelatedAutocompleteFilter: a select2 box
+  fed by the related admin's autocomplete view, instead of a sidebar listing
+  every related row,
+- `cached_file_url()` for thumbnails, so list_display doesn't ask the storage
+  backend for a URL per row (S3 & co. sign every one),
+- the image derivatives (common/images.py) of `list_image_fields` are loaded
+  for the whole page in one query, so thumbnails can use the small variant.
+
+list_select_related is left to each ModelAdmin: Django's default skips
+nullable foreign keys, which then cost one query per row.
+"""
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import ShowFacets
+from django.contrib.admin.widgets import AutocompleteSelect
+
+from .cache import LRUCache
+from .images import prefetch_image_variants
+from .pagination import EstimatedCountPaginator
+
+EXACT_COUNT_PARAM = "exact_count"
+
+file_urls = LRUCache(maxsize=10000, ttl=getattr(settings, "ADMIN_FILE_URL_TTL", 300))
+
+
+def cached_file_url(file):
+    """`file.url`, remembered per file name for ADMIN_FILE_URL_TTL seconds in this process."""
+    if not file:
+        return None
+    url = file_urls.get(file.name)
+    if url is None:
+        url = file.url
+        file_urls.set(file.name, url)
+    return url
+
+
+class RelatedAutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Foreign key filter as an autocomplete box. Loads no related rows except the
+    selected one. The related model's admin needs search_fields.
+    """
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.base_query_string = "?"
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.base_query_string = changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull])
+        return super().choices(changelist)  # "All" (and the empty choice for nullable keys)
+
+    def widget(self):
+        """The select2 box; autocomplete_filter.js reloads the page with the picked value."""
+        form_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(
+                self.field, self.admin_site,
+                attrs={"data-filter-url": self.base_query_string, "data-filter-param": self.lookup_kwarg},
+            ),
+        )
+        value = self.lookup_val[-1] if self.lookup_val else None
+        return form_field.widget.render(f"{self.field_path}-autocomplete-filter", value)
+
+
+class PerformanceAdminMixin:
+    exact_count_param = EXACT_COUNT_PARAM
+    # ImageFields shown in list_display, e.g. ('image',)
+    list_image_fields = ()
+
+    @property
+    def performance_mode(self):
+        return getattr(settings, "ADMIN_PERFORMANCE_MODE", True)
+
+    @property
+    def show_full_result_count(self):
+        return not self.performance_mode
+
+    @property
+    def show_facets(self):
+        return ShowFacets.NEVER if self.performance_mode else ShowFacets.ALLOW
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if not self.performance_mode:
+            return list_filter
+        swapped = []
+        for entry in list_filter:
+            if isinstance(entry, str) and "__" not in entry and self.model._meta.get_field(entry).many_to_one:
+                entry = (entry, RelatedAutocompleteFilter)
+            swapped.append(entry)
+        return swapped
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not self.performance_mode:
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return EstimatedCountPaginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            exact=getattr(request, "_exact_count", False),
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        # The admin rejects query parameters it doesn't know as bad filters.
+        if self.exact_count_param in request.GET:
+            request.GET = request.GET.copy()
+            del request.GET[self.exact_count_param]
+            request._exact_count = True
+        return super().changelist_view(request, extra_context)
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        changelist.exact_count_url = changelist.get_query_string({self.exact_count_param: "1"})
+        if self.list_image_fields:
+            # Evaluates the page's queryset; the template reuses its result cache.
+            prefetch_image_variants(
+                getattr(obj, field) for obj in changelist.result_list for field in self.list_image_fields
+            )
+        return changelist
+
+    @property
+    def media(self):
+        media = super().media
+        if self.performance_mode:
+            media += AutocompleteSelect(None, self.admin_site).media
+            media += forms.Media(js=["admin/js/autocomplete_filter.js"])
+        return media
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
+
+    def ready(self):
+        from .signals import connect_image_fields
+        connect_image_fields()  # IMAGE_DERIVATIVE_FIELDS uploads -> resized variants
@@ -0,0 +1,33 @@
+"""
+Helpers for async views.
+
+Under ASGI an `async def` view runs on the event loop with no thread hop, but
+then nothing it calls may touch the database synchronously, lazily included:
+`request.user`, a context processor, a template tag looking something up.
+So async views
+- load the user with `aload_user()` (or AsyncLoginRequiredMixin) first,
+- load the navbar's categories and tags with `apps.products.navigation.aload_navigation()`,
+- load everything their template reads with the async ORM (aget, afirst,
+  `async for`, aprefetch_* helpers), running independent queries with
+  asyncio.gather,
+- then render; the template only reads what is already in memory.
+
+Under WSGI the same views still work: Django runs them in a short-lived event loop.
+"""
+from django.contrib.auth.mixins import LoginRequiredMixin
+
+
+async def aload_user(request):
+    """Load request.user without blocking (request.auser()) and keep it for templates."""
+    request.user = await request.auser()
+    return request.user
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """LoginRequiredMixin for class-based views whose handlers are `async def`."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aload_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class VersionedCache:
+    """
+    Two-level cache for small, read-mostly data sets (navigation trees, tag lists...).
+
+    - Level 1: a per-process dict, so a hit costs no I/O at all besides the version check.
+    - Level 2: a shared Django cache backend (LocMem in dev/tests, Redis/Memcached in prod),
+      so only one worker has to rebuild a value after it changes.
+
+    Every key of a namespace is stored under the namespace's current *version*.
+    `bump()` increments that version in the shared backend; each worker notices the
+    new version on its next `get()` and drops its stale local copy, no flush needed.
+
+    Example:
+        nav_cache = VersionedCache("catalog-nav")
+        tree = nav_cache.get_or_set("category-tree", build_category_tree)
+        nav_cache.bump()  # after a Category changes
+    """
+    def __init__(self, namespace, alias="default", timeout=60 * 60 * 24):
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = timeout
+        self._local = {}  # key -> (version, value)
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "bumps": 0}
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f"{self.namespace}:version"
+
+    def get_version(self):
+        version = self.backend.get(self.version_key)
+        if version is None:
+            # First use (or the key was evicted): start a new generation. A clock-based
+            # value never collides with a generation some worker may still hold locally.
+            self.backend.add(self.version_key, time.time_ns(), timeout=None)
+            version = self.backend.get(self.version_key)
+        return version
+
+    def get_or_set(self, key, builder):
+        """Return the cached value for `key`, calling `builder()` only on a full miss."""
+        version = self.get_version()
+
+        local = self._local.get(key)
+        if local is not None and local[0] == version:
+            self._incr("local_hits")
+            return local[1]
+
+        shared_key = f"{self.namespace}:{version}:{key}"
+        value = self.backend.get(shared_key)
+        if value is not None:
+            self._incr("shared_hits")
+        else:
+            self._incr("misses")
+            value = builder()
+            self.backend.set(shared_key, value, timeout=self.timeout)
+
+        with self._lock:
+            self._local[key] = (version, value)
+        return value
+
+    def bump(self):
+        """Invalidate every key in the namespace, for all workers."""
+        try:
+            self.backend.incr(self.version_key)
+        except ValueError:
+            # Version key missing (never read, or evicted): any new generation invalidates old entries.
+            self.backend.set(self.version_key, time.time_ns(), timeout=None)
+        with self._lock:
+            self._local.clear()
+        self._incr("bumps")
+
+    def stats(self):
+        """Counters for this process, e.g. for a metrics scrape."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else None
+        return stats
+
+    def _incr(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+
+class LRUCache:
+    """
+    Small thread-safe per-process LRU with a TTL, for hot per-key data (sessions,
+    request.user) in front of a shared cache. Entries are never invalidated across
+    processes, so `ttl` is the bound on how stale another worker's copy can be.
+    """
+    def __init__(self, maxsize=10000, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Every VersionedCache registers itself here so its stats can be scraped in one place.
+registry = {}
+
+
+def get_versioned_cache(namespace, **kwargs):
+    """Return the process-wide VersionedCache for `namespace`, creating it on first use."""
+    if namespace not in registry:
+        registry[namespace] = VersionedCache(namespace, **kwargs)
+    return registry[namespace]
@@ -0,0 +1,26 @@
+"""
+Entry points of the image derivative pool (common/images.py).
+
+The pool spawns fresh interpreters, which import this module before Django is
+set up, so it must not import models at module level.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+
+
+def generate(source, source_path=None):
+    """generate_derivatives() that logs instead of raising; returns the number of variants written."""
+    from .images import generate_derivatives
+    try:
+        return generate_derivatives(source, source_path)
+    except Exception:
+        logger.exception("Generating derivatives of %s failed.", source)
+        return 0
@@ -0,0 +1,252 @@
+"""
+Image derivatives.
+
+Every upload to one of IMAGE_DERIVATIVE_FIELDS gets resized WebP variants
+(IMAGE_DERIVATIVES: thumb, small, medium, large), stored next to the original,
+e.g. products/shoe.jpg -> products/shoe.small.webp. Their URLs and dimensions
+go into ImageDerivative, so pages never stat or open image files.
+
+- Generation runs after the upload's transaction commits, in a process pool
+  (IMAGE_DERIVATIVE_WORKERS, 0 = inline), never in the request. Past
+  IMAGE_DERIVATIVE_MAX_PENDING queued jobs new ones are dropped; the
+  generate_image_derivatives command (also the backfill) picks them up.
+- Until an image's variants exist, lookups fall back to the original.
+- `image_variants()` reads through a per-process LRU. List pages call
+  `prefetch_image_variants()` (`aprefetch_image_variants()` in async views)
+  first: one query for the whole page.
+
+Templates: {% load images %}, then {{ product.image|variant_url:"small" }} or
+{% responsive_image product.image "medium" alt=product.name %}.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import image_worker
+from .cache import LRUCache
+from .models import ImageDerivative
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL = "original"
+
+DEFAULT_VARIANTS = {
+    "thumb": {"size": (80, 80), "crop": True},
+    "small": {"size": (320, 320)},
+    "medium": {"size": (800, 800)},
+    "large": {"size": (1600, 1600)},
+}
+
+lookups = LRUCache(
+    maxsize=getattr(settings, "IMAGE_DERIVATIVE_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "IMAGE_DERIVATIVE_CACHE_TTL", 60),
+)
+
+
+def variant_specs():
+    return getattr(settings, "IMAGE_DERIVATIVES", DEFAULT_VARIANTS)
+
+
+def image_fields():
+    """[(model, field name)] from IMAGE_DERIVATIVE_FIELDS ("app_label.Model.field")."""
+    fields = []
+    for path in getattr(settings, "IMAGE_DERIVATIVE_FIELDS", []):
+        model_path, field_name = path.rsplit(".", 1)
+        fields.append((apps.get_model(model_path), field_name))
+    return fields
+
+
+def derivative_name(source, variant, extension):
+    root, _ = os.path.splitext(source)
+    return f"{root}.{variant}.{extension}"
+
+
+# ---------------------------------------------------------------------------
+# Generation (runs in the pool)
+# ---------------------------------------------------------------------------
+
+def generate_derivatives(source, source_path=None):
+    """
+    Render every variant of the image stored as `source` and record them.
+    `source_path`: a local copy of the original to read instead of the storage
+    (e.g. the upload's temporary file), saving one read of the stored file.
+    Returns the number of variants written.
+    """
+    from PIL import Image, ImageOps
+
+    image_format = getattr(settings, "IMAGE_DERIVATIVE_FORMAT", "WEBP")
+    quality = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", 80)
+    extension = image_format.lower()
+
+    source_file = open(source_path, "rb") if source_path else default_storage.open(source, "rb")
+    with source_file, Image.open(source_file) as image:
+        image = ImageOps.exif_transpose(image)  # phone photos: rotate by EXIF, then drop it
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        rows = [
+            ImageDerivative(
+                source=source, variant=ORIGINAL, name=source, url=default_storage.url(source),
+                width=image.width, height=image.height, size_bytes=default_storage.size(source),
+            )
+        ]
+        for variant, spec in variant_specs().items():
+            if spec.get("crop"):
+                resized = ImageOps.fit(image, spec["size"], Image.LANCZOS)
+            else:
+                resized = image.copy()
+                resized.thumbnail(spec["size"], Image.LANCZOS)  # only ever shrinks
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, quality=quality)
+            name = derivative_name(source, variant, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            rows.append(
+                ImageDerivative(
+                    source=source, variant=variant, name=name, url=default_storage.url(name),
+                    width=resized.width, height=resized.height, size_bytes=buffer.tell(),
+                )
+            )
+
+    ImageDerivative.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["source", "variant"],
+        update_fields=["name", "url", "width", "height", "size_bytes"],
+    )
+    lookups.delete(source)
+    return len(rows) - 1
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+class DerivativePool:
+    """Fire-and-forget process pool with a cap on queued jobs."""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers open their own database connections instead of inheriting ours
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=image_worker.init_worker,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def submit(self, source, source_path=None):
+        """Queue a job; False when too many are waiting (the backfill command catches up)."""
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Image derivative queue full; %s will wait for the backfill.", source)
+            return False
+        future = self._get_executor().submit(image_worker.generate, source, source_path)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def map(self, sources):
+        """Generate many and wait, for the backfill command. Yields (source, variants written)."""
+        executor = self._get_executor()
+        yield from zip(sources, executor.map(image_worker.generate, sources, chunksize=4))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+derivative_pool = DerivativePool(
+    workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2) or 1,
+    max_pending=getattr(settings, "IMAGE_DERIVATIVE_MAX_PENDING", 100),
+)
+atexit.register(derivative_pool.shutdown)
+
+
+def schedule_derivatives(source, source_path=None):
+    """Generate the variants of `source` off the request path (inline with IMAGE_DERIVATIVE_WORKERS = 0)."""
+    if not source:
+        return
+    if not getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2):
+        image_worker.generate(source, source_path)
+        return
+    derivative_pool.submit(source, source_path)
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def _name(file):
+    return getattr(file, "name", file) or None
+
+
+def _rows(names):
+    return ImageDerivative.objects.filter(source__in=names).values_list("source", "variant", "url", "width", "height")
+
+
+def _store(names, rows):
+    found = {name: {} for name in names}
+    for source, variant, url, width, height in rows:
+        found[source][variant] = {"url": url, "width": width, "height": height}
+    for name, variants in found.items():
+        lookups.set(name, variants)  # {} too: not generated yet, don't ask again for a while
+    return found
+
+
+def _load(names):
+    return _store(names, _rows(names))
+
+
+def _missing(files):
+    return list({name for name in map(_name, files) if name and lookups.get(name) is None})
+
+
+def prefetch_image_variants(files):
+    """Load the variants of many images (FieldFiles or names) with one query."""
+    missing = _missing(files)
+    if missing:
+        _load(missing)
+
+
+async def aprefetch_image_variants(files):
+    """prefetch_image_variants() for async views."""
+    missing = _missing(files)
+    if missing:
+        _store(missing, [row async for row in _rows(missing)])
+
+
+def image_variants(file):
+    """{variant: {"url", "width", "height"}} for an image; {} before its derivatives exist."""
+    name = _name(file)
+    if not name:
+        return {}
+    variants = lookups.get(name)
+    if variants is None:
+        variants = _load([name])[name]
+    return variants
+
+
+def variant_url(file, variant):
+    """URL of `variant`, or of the original while derivatives are pending."""
+    found = image_variants(file).get(variant)
+    if found:
+        return found["url"]
+    if not file:
+        return None
+    return file.url if hasattr(file, "url") else default_storage.url(file)
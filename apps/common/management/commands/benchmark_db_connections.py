@@ -0,0 +1,93 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Time what a request pays for its database connection: a new connection per request, "
+        "a persistent one (CONN_MAX_AGE) and, on PostgreSQL with psycopg[pool], a pooled one. "
+        "Each simulated request goes through request_started/request_finished like a real one "
+        "(that is where Django opens and closes connections) and runs --queries small queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--queries", type=int, default=3, help="Queries per request.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        product_pk = Product.objects.using(options["database"]).values_list("pk", flat=True).first()
+        if product_pk is None:
+            raise CommandError("No products to query (seed some, e.g. benchmark_admin --seed).")
+
+        configured = copy.deepcopy(connection.settings_dict)
+        options_without_pool = {key: value for key, value in configured["OPTIONS"].items() if key != "pool"}
+        modes = {
+            "new connection per request": {"CONN_MAX_AGE": 0, "OPTIONS": options_without_pool},
+            "persistent (CONN_MAX_AGE)": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True, "OPTIONS": options_without_pool},
+        }
+        if connection.vendor == "sqlite" and options_without_pool.get("init_command"):
+            without_pragmas = {key: value for key, value in options_without_pool.items() if key != "init_command"}
+            modes["new per request, no pragmas"] = {"CONN_MAX_AGE": 0, "OPTIONS": without_pragmas}
+        if connection.vendor == "postgresql":
+            try:
+                import psycopg_pool  # noqa: F401
+            except ImportError:
+                self.stdout.write("psycopg_pool is not installed, skipping the pooled mode.")
+            else:
+                pool = configured["OPTIONS"].get("pool") or {"min_size": 2, "max_size": 10, "timeout": 10}
+                modes["pooled (OPTIONS pool)"] = {"CONN_MAX_AGE": 0, "OPTIONS": {**options_without_pool, "pool": pool}}
+
+        self.stdout.write(f"{connection.vendor} {connection.settings_dict['NAME']}, {options['requests']} requests")
+        results = {}
+        try:
+            for label, overrides in modes.items():
+                connection.close()
+                connection.settings_dict.update(copy.deepcopy(overrides))
+                results[label] = self.run_mode(connection, options["database"], product_pk, options["requests"], options["queries"])
+                if connection.vendor == "postgresql":
+                    connection.close_pool()
+        finally:
+            connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(configured)
+
+        reused = statistics.median(results["persistent (CONN_MAX_AGE)"][0])
+        for label, (timings, opened) in results.items():
+            timings.sort()
+            median = statistics.median(timings)
+            self.stdout.write(
+                f"  {label:>28}: median {median:7.3f} ms, p95 {timings[int(len(timings) * 0.95)]:7.3f} ms, "
+                f"{opened:5} connections opened, {median - reused:+7.3f} ms/request vs persistent"
+            )
+
+    def run_mode(self, connection, alias, product_pk, requests, queries):
+        opened = 0
+
+        def count(sender, connection, **kwargs):
+            nonlocal opened
+            if connection.alias == alias:
+                opened += 1
+
+        connection_created.connect(count)
+        timings = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                for _ in range(queries):
+                    Product.objects.using(alias).filter(pk=product_pk).values_list("pk", "stock_quantity").first()
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count)
+        return timings, opened
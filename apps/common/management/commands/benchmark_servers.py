@@ -0,0 +1,204 @@
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from apps.products.models import Product
+
+BENCH_EMAIL = "bench-servers@example.com"
+HOST = "127.0.0.1"
+
+# name -> (command line, needs); {port} and {workers} are filled in
+SERVERS = {
+    "wsgi": (
+        "gunicorn core.wsgi:application --bind {host}:{port} --workers {workers} --backlog 2048 --log-level warning",
+        "gunicorn",
+    ),
+    "asgi": (
+        "uvicorn core.asgi:application --host {host} --port {port} --workers {workers} --backlog 2048 "
+        "--no-access-log --log-level warning",
+        "uvicorn",
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app with gunicorn sync workers (WSGI) and with uvicorn (ASGI) in turn, and load each "
+        "endpoint with --connections concurrent keep-alive connections for --duration seconds. "
+        "Reports req/s, latency percentiles and errors. Needs gunicorn and uvicorn installed, a migrated "
+        "database and some published products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint and server.")
+        parser.add_argument("--workers", type=int, default=(os.cpu_count() or 1) * 2 + 1,
+                            help="Processes per server (default: 2 x CPUs + 1).")
+        parser.add_argument("--server", action="append", choices=sorted(SERVERS), help="Server(s) to run (default: all).")
+        parser.add_argument("--url", action="append", help="Endpoint(s) to load (default: the async views).")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a request counts as an error.")
+
+    def handle(self, *args, **options):
+        for name in options["server"] or SERVERS:
+            if shutil.which(SERVERS[name][1]) is None:
+                raise CommandError(f"{SERVERS[name][1]} is not installed (pip install {SERVERS[name][1]}).")
+        product = Product.objects.published().order_by("-created_at", "-id").first()
+        if product is None:
+            raise CommandError("No published product to request (seed some, e.g. benchmark_admin --seed).")
+        urls = options["url"] or [
+            "/", "/products/", f"/products/{product.slug}/", "/users/profile/", "/users/addresses/",
+        ]
+
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"first_name": "Bench"})
+        session = self.login(user)
+        headers = f"Host: {HOST}\r\nCookie: {settings.SESSION_COOKIE_NAME}={session.session_key}\r\n"
+        try:
+            for name in options["server"] or SERVERS:
+                with self.serve(name, options["port"], options["workers"]):
+                    for url in urls:
+                        result = asyncio.run(
+                            load(options["port"], url, headers, options["connections"], options["duration"], options["timeout"])
+                        )
+                        self.report(name, url, result, options["duration"])
+        finally:
+            session.delete()
+            user.delete()
+
+    def login(self, user):
+        """A session for `user`, as django.contrib.auth.login() would store it."""
+        session = import_string(f"{settings.SESSION_ENGINE}.SessionStore")()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    def serve(self, name, port, workers):
+        command, _ = SERVERS[name]
+        return Server(command.format(host=HOST, port=port, workers=workers).split(), port, self.stdout)
+
+    def report(self, name, url, result, duration):
+        latencies, errors, statuses = result
+        if not latencies:
+            self.stdout.write(f"{name:>4} {url:<40} no successful requests, {errors} errors")
+            return
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        bad = {status: count for status, count in statuses.items() if status != 200}
+        self.stdout.write(
+            f"{name:>4} {url:<40} {len(latencies) / duration:8.1f} req/s | "
+            f"p50 {statistics.median(latencies):7.1f} ms, p95 {percentile(0.95):7.1f} ms, "
+            f"p99 {percentile(0.99):7.1f} ms | {errors} errors"
+            + (f", non-200: {bad}" if bad else "")
+        )
+
+
+class Server:
+    """Run a server command for the duration of a `with` block, once it accepts connections."""
+
+    def __init__(self, command, port, stdout):
+        self.command = command
+        self.port = port
+        self.stdout = stdout
+
+    def __enter__(self):
+        self.stdout.write(f"$ {' '.join(self.command)}")
+        self.process = subprocess.Popen(self.command, env={**os.environ, "PYTHONUNBUFFERED": "1"}, start_new_session=True)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"{self.command[0]} exited with {self.process.returncode}.")
+            try:
+                socket.create_connection((HOST, self.port), timeout=1).close()
+                time.sleep(1)  # let every worker finish booting
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"{self.command[0]} did not start listening on port {self.port}.")
+
+    def __exit__(self, *exc_info):
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=15)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            os.killpg(self.process.pid, signal.SIGKILL)
+
+
+async def load(port, url, headers, connections, duration, timeout):
+    """
+    `connections` clients, each sending GET `url` in a loop over its own
+    connection (reconnecting when the server closes it, as gunicorn's sync
+    workers do after every response). Returns (latencies ms, errors, {status: count}).
+    """
+    request = f"GET {url} HTTP/1.1\r\n{headers}\r\n".encode()
+    latencies, statuses = [], {}
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, port), timeout)
+                writer.write(request)
+                status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                await asyncio.sleep(0.05)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, errors, statuses
+
+
+async def read_response(reader):
+    """Read one response; returns (status, whether the connection stays open)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    fields = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            fields[key.strip().lower()] = value.strip().lower()
+    if "content-length" in fields:
+        await reader.readexactly(int(fields["content-length"]))
+    elif fields.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()  # until the server closes
+        return status, False
+    return status, fields.get("connection") != "close"
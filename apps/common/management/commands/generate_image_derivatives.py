@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.common.images import derivative_pool, generate_derivatives, image_fields
+from apps.common.models import ImageDerivative
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized variants (IMAGE_DERIVATIVES) for every image in IMAGE_DERIVATIVE_FIELDS "
+        "that doesn't have them yet: the backfill for existing uploads, and the catch-up for jobs "
+        "dropped while the upload queue was full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have variants.")
+        parser.add_argument("--inline", action="store_true", help="Don't use the worker pool (IMAGE_DERIVATIVE_WORKERS).")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Images looked up and queued at a time.")
+
+    def handle(self, *args, **options):
+        total = failed = 0
+        started = time.perf_counter()
+        for model, field_name in image_fields():
+            names = (
+                model._default_manager.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                .order_by().values_list(field_name, flat=True).distinct()
+            )
+            self.stdout.write(f"{model._meta.label}.{field_name}: {names.count()} images")
+            chunk = []
+            for name in names.iterator(chunk_size=options["chunk_size"]):
+                chunk.append(name)
+                if len(chunk) >= options["chunk_size"]:
+                    done, errors = self.process(chunk, options)
+                    total, failed = total + done, failed + errors
+                    chunk = []
+            if chunk:
+                done, errors = self.process(chunk, options)
+                total, failed = total + done, failed + errors
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated variants for {total} images in {elapsed:.1f}s ({rate:.1f} images/s), {failed} failed."
+        ))
+
+    def process(self, names, options):
+        if not options["force"]:
+            done = set(ImageDerivative.objects.filter(source__in=names).values_list("source", flat=True).distinct())
+            names = [name for name in names if name not in done]
+        if options["inline"]:
+            results = []
+            for name in names:
+                try:
+                    results.append((name, generate_derivatives(name)))
+                except Exception as exc:
+                    self.stderr.write(f"  {name}: {exc}")
+                    results.append((name, 0))
+        else:
+            results = list(derivative_pool.map(names))
+        failed = sum(1 for _, written in results if not written)
+        return len(results) - failed, failed
@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from apps.common.outbox import OutboxWorker, outbox_stats, purge_sent
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued emails (the email outbox) in batches over one mail connection per batch. "
+        "Runs until interrupted; several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Emails per batch (default: EMAIL_OUTBOX_BATCH_SIZE).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Drain what is due now, print stats and exit.")
+        parser.add_argument("--purge", action="store_true", help="Delete old sent emails (EMAIL_OUTBOX_KEEP_DAYS) and exit.")
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            self.stdout.write(f"Deleted {purge_sent()} sent emails.")
+            return
+
+        worker = OutboxWorker(batch_size=options["batch_size"])
+        if options["once"]:
+            while worker.run_once():
+                pass
+        else:
+            stop = threading.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+            self.stdout.write(f"Email worker started (batch size {worker.batch_size}).")
+            worker.run(interval=options["interval"], stop=stop)
+
+        stats = worker.stats()
+        self.stdout.write(
+            f"{stats['sent']} sent, {stats['retried']} retried, {stats['failed']} failed "
+            f"in {stats['batches']} batches, {stats['sent_per_s']} emails/s while busy"
+        )
+        queue = outbox_stats()
+        self.stdout.write(f"queue: {queue['by_status']}, oldest due {queue['oldest_due_age_s']}s")
@@ -1,3 +1,163 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction, IntegrityError
+from django.utils import timezone
+
+from .utils import generate_unique_slug
 
 # Create your models here.
+
+class UniqueSlugMixin:
+    """
+    Model mixin that fills an empty slug from another field on save().
+
+    The slug is allocated with a single query (see `allocate_unique_slugs`). If a
+    concurrent insert grabs the same slug first, the unique constraint fails and the
+    save is retried with a freshly allocated slug, inside a savepoint so the caller's
+    transaction survives.
+
+    Usage:
+        class Tag(UniqueSlugMixin, models.Model):
+            slug_source_field = "name"
+
+    A slug that is only unique together with other fields (a UniqueConstraint)
+    lists them in `slug_unique_with`.
+    """
+    slug_source_field = "name"
+    slug_field = "slug"
+    slug_unique_with = ()
+    slug_save_attempts = 3
+
+    def get_slug_queryset(self):
+        """The rows this instance's slug must differ from."""
+        attnames = [self._meta.get_field(name).attname for name in self.slug_unique_with]
+        return type(self)._default_manager.filter(**{attname: getattr(self, attname) for attname in attnames})
+
+    def save(self, *args, **kwargs):
+        if getattr(self, self.slug_field):
+            return super().save(*args, **kwargs)
+
+        model_class = type(self)
+        for attempt in range(1, self.slug_save_attempts + 1):
+            slug = generate_unique_slug(
+                model_class, getattr(self, self.slug_source_field), slug_field=self.slug_field,
+                queryset=self.get_slug_queryset(),
+            )
+            setattr(self, self.slug_field, slug)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only retry when we lost the race for the slug; anything else (e.g. a
+                # duplicate sku) is a real error for the caller.
+                slug_taken = self.get_slug_queryset().filter(**{self.slug_field: slug}).exists()
+                if attempt == self.slug_save_attempts or not slug_taken:
+                    setattr(self, self.slug_field, "")
+                    raise
+
+
+class OutboxEmail(models.Model):
+    """
+    One email waiting to be sent (or already sent) by the outbox worker.
+    `send_html_email()` only inserts a row here; `python manage.py run_email_worker`
+    renders and delivers them in batches (see common/outbox.py).
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    subject = models.CharField(max_length=255)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=255)
+    # Rendered by the worker, so it must be JSON-serializable (ids, strings, dates; not model instances).
+    context = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set when a worker claims the row; claims older than EMAIL_OUTBOX_CLAIM_TIMEOUT are taken over.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # the worker's "what is due" scan
+            models.Index(fields=['next_attempt_at', 'id'], name='outbox_due_idx', condition=models.Q(status="pending")),
+            # stale claims
+            models.Index(fields=['claimed_at'], name='outbox_claimed_idx', condition=models.Q(status="sending")),
+            # throughput metrics and purging
+            models.Index(fields=['status', 'sent_at'], name='outbox_status_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class Mailing(models.Model):
+    """
+    A bulk send of one template to many recipients (see common/fanout.py).
+    `last_recipient_id` is the checkpoint: recipients are walked in primary-key
+    order, so an interrupted run picks up after the last chunk it delivered.
+    """
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_CHOICES = (
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+    )
+
+    name = models.SlugField(max_length=100, unique=True)
+    subject = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=255)
+    # Shared by every recipient; each one also gets `recipient` (pk, email, names).
+    context = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    last_recipient_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    # handed to the email outbox for retries instead
+    failed_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, {self.sent_count} sent)"
+
+
+class ImageDerivative(models.Model):
+    """
+    One resized variant of an uploaded image (see common/images.py).
+    Rows are keyed by the original's storage name, so any ImageField can use
+    them, and pages read sizes and URLs from here instead of the filesystem.
+    The "original" variant records the upload's own dimensions.
+    """
+    source = models.CharField(max_length=255)
+    variant = models.CharField(max_length=20)
+    name = models.CharField(max_length=255)  # storage name of the derivative
+    url = models.CharField(max_length=500)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # also the index for "all variants of this image"
+            models.UniqueConstraint(fields=['source', 'variant'], name='image_derivative_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} [{self.variant}] {self.width}x{self.height}"
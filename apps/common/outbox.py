@@ -0,0 +1,294 @@
+"""
+Email outbox.
+
+`send_html_email()` doesn't talk to SMTP anymore: it inserts an OutboxEmail row
+(inside the caller's transaction, so a rolled-back registration sends nothing)
+and returns. A separate worker process, `python manage.py run_email_worker`,
+delivers them:
+
+- claims up to EMAIL_OUTBOX_BATCH_SIZE due rows at a time (SKIP LOCKED where the
+  database has it, so several workers can share the queue),
+- renders them with compiled templates cached for the life of the worker,
+- sends the whole batch over one opened connection,
+- reschedules failures with exponential backoff (EMAIL_OUTBOX_RETRY_BACKOFF
+  seconds, doubled per attempt, capped at EMAIL_OUTBOX_RETRY_MAX_BACKOFF) and
+  gives up after EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Rows claimed by a worker that died are picked up again after
+EMAIL_OUTBOX_CLAIM_TIMEOUT seconds, so a message can (rarely) go out twice but
+is never lost. EMAIL_DELIVERY_MODE = "sync" restores the old send-in-request
+behaviour.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=256)
+def compiled_template(template_name):
+    """
+    The compiled template, looked up once per process. Template edits need a
+    worker restart (the web process isn't affected: it no longer renders emails).
+    """
+    return get_template(template_name)
+
+
+def build_message(subject, to_email, template_name, context, from_email=None, connection=None):
+    """The EmailMultiAlternatives for a templated email: the HTML, and a plain-text part from strip_tags."""
+    html_content = compiled_template(template_name).render(context)
+    text_content = strip_tags(html_content)
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content or " ",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[to_email],
+        connection=connection,
+    )
+    if html_content:
+        message.attach_alternative(html_content, "text/html")
+    return message
+
+
+# ---------------------------------------------------------------------------
+# Enqueueing
+# ---------------------------------------------------------------------------
+
+def enqueue(subject, to_email, template_name, context, from_email=None):
+    """Queue one email for the worker. Returns the OutboxEmail row."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        template_name=template_name,
+        context=context or {},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def backoff_delay(attempts):
+    """Seconds to wait before attempt number `attempts + 1`."""
+    base = _setting("EMAIL_OUTBOX_RETRY_BACKOFF", 30)
+    return min(base * 2 ** max(attempts - 1, 0), _setting("EMAIL_OUTBOX_RETRY_MAX_BACKOFF", 3600))
+
+
+class OutboxWorker:
+    """
+    Delivers OutboxEmail rows in batches. `run_once()` handles one batch;
+    `run()` loops until stopped. Counters for this worker are in `stats()`.
+    """
+    def __init__(self, batch_size=None, max_attempts=None, claim_timeout=None):
+        self.batch_size = batch_size or _setting("EMAIL_OUTBOX_BATCH_SIZE", 50)
+        self.max_attempts = max_attempts or _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+        self.claim_timeout = claim_timeout or _setting("EMAIL_OUTBOX_CLAIM_TIMEOUT", 300)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._busy_seconds = 0.0
+        self._batches = 0
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+        self._last_purge = None
+
+    # -- claiming ------------------------------------------------------------
+
+    def release_stale_claims(self):
+        """Put rows claimed by a worker that never finished them back in the queue."""
+        cutoff = timezone.now() - timedelta(seconds=self.claim_timeout)
+        return OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENDING, claimed_at__lt=cutoff).update(
+            status=OutboxEmail.STATUS_PENDING, claimed_at=None
+        )
+
+    def claim_batch(self):
+        """Mark up to `batch_size` due rows as ours and return them, oldest first."""
+        now = timezone.now()
+        with transaction.atomic():
+            due = OutboxEmail.objects.filter(
+                status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now
+            ).order_by("next_attempt_at", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            ids = list(due.values_list("id", flat=True)[: self.batch_size])
+            if not ids:
+                return []
+            # status=pending again: without row locks (SQLite) another worker may have won the race.
+            OutboxEmail.objects.filter(id__in=ids, status=OutboxEmail.STATUS_PENDING).update(
+                status=OutboxEmail.STATUS_SENDING, claimed_at=now
+            )
+        return list(OutboxEmail.objects.filter(id__in=ids, status=OutboxEmail.STATUS_SENDING, claimed_at=now))
+
+    # -- delivery ------------------------------------------------------------
+
+    def deliver(self, emails):
+        """Send `emails` over one connection. Returns (sent, [(email, error), ...])."""
+        sent, failed = [], []
+        mail_connection = get_connection(fail_silently=False)
+        try:
+            mail_connection.open()
+        except Exception as exc:
+            return [], [(email, exc) for email in emails]
+        try:
+            for email in emails:
+                try:
+                    message = build_message(
+                        email.subject, email.to_email, email.template_name, email.context,
+                        from_email=email.from_email, connection=mail_connection,
+                    )
+                except Exception as exc:
+                    failed.append((email, exc))  # template problem, the connection is fine
+                    continue
+                try:
+                    # One message per call so a rejected recipient fails only its own row.
+                    mail_connection.send_messages([message])
+                except Exception as exc:
+                    failed.append((email, exc))
+                    # The connection may be unusable now; start a fresh one for the rest.
+                    mail_connection.close()
+                    try:
+                        mail_connection.open()
+                    except Exception:
+                        pass  # send_messages() opens it again per message
+                else:
+                    sent.append(email)
+        finally:
+            mail_connection.close()
+        return sent, failed
+
+    def record_results(self, sent, failed):
+        now = timezone.now()
+        if sent:
+            OutboxEmail.objects.filter(id__in=[email.id for email in sent]).update(
+                status=OutboxEmail.STATUS_SENT, sent_at=now, claimed_at=None,
+                attempts=F("attempts") + 1, last_error="",
+            )
+        retried = given_up = 0
+        for email, exc in failed:
+            attempts = email.attempts + 1
+            error = f"{type(exc).__name__}: {exc}"
+            if attempts >= self.max_attempts:
+                status, next_attempt_at = OutboxEmail.STATUS_FAILED, email.next_attempt_at
+                given_up += 1
+                logger.error("Giving up on outbox email %s to %s: %s", email.id, email.to_email, error)
+            else:
+                status, next_attempt_at = OutboxEmail.STATUS_PENDING, now + timedelta(seconds=backoff_delay(attempts))
+                retried += 1
+                logger.warning("Outbox email %s to %s failed (attempt %s): %s", email.id, email.to_email, attempts, error)
+            OutboxEmail.objects.filter(id=email.id).update(
+                status=status, attempts=attempts, next_attempt_at=next_attempt_at,
+                claimed_at=None, last_error=error,
+            )
+        return retried, given_up
+
+    def run_once(self):
+        """Claim and deliver one batch. Returns the number of emails handled."""
+        started = time.perf_counter()
+        self.release_stale_claims()
+        emails = self.claim_batch()
+        if not emails:
+            return 0
+        sent, failed = self.deliver(emails)
+        retried, given_up = self.record_results(sent, failed)
+        with self._lock:
+            self._busy_seconds += time.perf_counter() - started
+            self._batches += 1
+            self._sent += len(sent)
+            self._retried += retried
+            self._failed += given_up
+        return len(emails)
+
+    def run(self, interval=1.0, stop=None):
+        """
+        Deliver until `stop` (a threading.Event) is set. Full batches are followed
+        by the next one at once; the worker only sleeps when the queue is drained.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                handled = self.run_once()
+                self.purge_if_due()
+            except Exception:
+                logger.exception("Email outbox batch failed.")
+                handled = 0
+            if handled < self.batch_size:
+                stop.wait(interval)
+
+    def purge_if_due(self):
+        if self._last_purge is not None and time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        purge_sent()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "sent": self._sent,
+                "retried": self._retried,
+                "failed": self._failed,
+                "uptime_s": round(time.monotonic() - self._started, 1),
+                "busy_s": round(self._busy_seconds, 3),
+                # while actually working, i.e. what one worker can push
+                "sent_per_s": round(self._sent / self._busy_seconds, 1) if self._busy_seconds else 0.0,
+            }
+
+
+def purge_sent(keep_days=None, batch_size=1000):
+    """Delete sent emails older than EMAIL_OUTBOX_KEEP_DAYS, a batch of ids at a time. Returns the count."""
+    keep_days = _setting("EMAIL_OUTBOX_KEEP_DAYS", 7) if keep_days is None else keep_days
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    deleted = 0
+    while True:
+        ids = list(
+            OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT, sent_at__lt=cutoff)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += OutboxEmail.objects.filter(id__in=ids).delete()[0]
+
+
+def outbox_stats():
+    """Queue depth and recent throughput, from the table (the worker runs in another process)."""
+    now = timezone.now()
+    counts = dict(OutboxEmail.objects.values_list("status").annotate(n=Count("id")).order_by())
+    oldest_due = OutboxEmail.objects.filter(
+        status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now
+    ).aggregate(oldest=Min("next_attempt_at"))["oldest"]
+    sent = OutboxEmail.objects.filter(
+        status=OutboxEmail.STATUS_SENT, sent_at__gte=now - timedelta(hours=1)
+    ).aggregate(
+        last_minute=Count("id", filter=Q(sent_at__gte=now - timedelta(minutes=1))),
+        last_hour=Count("id"),
+    )
+    return {
+        "mode": _setting("EMAIL_DELIVERY_MODE", "outbox"),
+        "by_status": {status: counts.get(status, 0) for status, _ in OutboxEmail.STATUS_CHOICES},
+        # how far behind the worker(s) are
+        "oldest_due_age_s": round((now - oldest_due).total_seconds(), 1) if oldest_due else 0.0,
+        "sent_last_minute": sent["last_minute"],
+        "sent_last_hour": sent["last_hour"],
+    }
@@ -0,0 +1,236 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+from .cache import LRUCache
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue (or can no longer decode)."""
+
+
+class KeysetPage:
+    """
+    A single page of keyset-paginated results.
+    `next_cursor` is None on the last page.
+    """
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) paginator.
+
+    Unlike Django's Paginator it never runs OFFSET or COUNT(*): every page is
+    "WHERE (k1, k2) > (last_k1, last_k2) ORDER BY k1, k2 LIMIT n", so page 50,000
+    costs the same as page 1 as long as the ordering is backed by an index.
+
+    `ordering` must end with a unique column (usually "id" / "-id") so that
+    the position in the result set is unambiguous.
+    Example:
+        paginator = KeysetPaginator(Product.objects.all(), ordering=("-created_at", "-id"))
+        page = paginator.get_page(request.GET.get("cursor"))
+    """
+    def __init__(self, queryset, ordering, page_size=20, max_page_size=100):
+        if not ordering:
+            raise ValueError("KeysetPaginator needs at least one ordering field.")
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        # (field name, descending?) pairs, e.g. ("created_at", True)
+        self.keys = [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def get_page(self, cursor=None, page_size=None):
+        page_size = self._clamp_page_size(page_size)
+        return self._make_page(list(self._page_queryset(cursor, page_size)), page_size)
+
+    async def aget_page(self, cursor=None, page_size=None):
+        """get_page() for async views."""
+        page_size = self._clamp_page_size(page_size)
+        return self._make_page([row async for row in self._page_queryset(cursor, page_size)], page_size)
+
+    def _page_queryset(self, cursor, page_size):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        # One extra row tells whether another page exists, without a COUNT.
+        return queryset[:page_size + 1]
+
+    def _make_page(self, rows, page_size):
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+    def encode_cursor(self, obj):
+        # isoformat() keeps the microseconds; DjangoJSONEncoder cuts datetimes to
+        # milliseconds, and "created_at < cursor" would then skip the rest of that millisecond.
+        values = [
+            value.isoformat() if isinstance(value, (datetime.datetime, datetime.time)) else value
+            for value in (getattr(obj, name) for name, _ in self.keys)
+        ]
+        raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (ValueError, TypeError) as exc:
+            raise InvalidCursor("Malformed cursor.") from exc
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor("Cursor does not match this ordering.")
+
+        model = self.queryset.model
+        try:
+            # Convert JSON values back to the column's python type (datetime, Decimal, ...)
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.keys, values)
+            ]
+        except ValidationError as exc:
+            raise InvalidCursor("Cursor does not match this ordering.") from exc
+
+    def _after(self, values):
+        """
+        Build the "strictly after this row" condition, expanded into OR-ed terms so it
+        works on every backend:
+            k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+        """
+        condition = Q()
+        for i, (name, descending) in enumerate(self.keys):
+            term = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+            for j, (prev_name, _) in enumerate(self.keys[:i]):
+                term &= Q(**{prev_name: values[j]})
+            condition |= term
+        return condition
+
+    def _clamp_page_size(self, page_size):
+        try:
+            page_size = int(page_size) if page_size else self.page_size
+        except (TypeError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+
+# ---------------------------------------------------------------------------
+# Estimated counts (admin changelists over very large tables)
+# ---------------------------------------------------------------------------
+
+row_estimates = LRUCache(maxsize=256, ttl=getattr(settings, "ROW_ESTIMATE_TTL", 60))
+
+
+def estimate_row_count(model, using="default"):
+    """
+    Approximate number of rows in `model`'s table from the planner statistics
+    (pg_class.reltuples, InnoDB table_rows, SQLite's sqlite_stat1 after ANALYZE).
+    Falls back to MAX(pk) for integer keys. None when there is nothing to go on.
+    """
+    key = (using, model._meta.db_table)
+    estimate = row_estimates.get(key)
+    if estimate is not None:
+        return estimate
+
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            estimate = row[0] if row and row[0] >= 0 else None  # -1: never analyzed
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+        elif connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # stat starts with the row count of the table/index; partial indexes count less.
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                counts = [int(stat.split()[0]) for (stat,) in cursor.fetchall() if stat]
+                estimate = max(counts) if counts else None
+
+    if estimate is None and model._meta.pk.get_internal_type() in ("AutoField", "BigAutoField", "IntegerField", "BigIntegerField"):
+        # One index lookup; overcounts by the rows deleted so far.
+        estimate = model._default_manager.using(using).aggregate(top=Max("pk"))["top"] or 0
+    if estimate is not None:
+        row_estimates.set(key, estimate)
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Django Paginator that avoids COUNT(*) over the whole table.
+
+    - No filters: the planner's row estimate (`estimate_row_count`).
+    - Filtered: an exact count, but only up to `count_limit` rows
+      (COUNT over a LIMITed subquery); past that the count is `count_limit`.
+    - exact=True: the plain COUNT(*), for when someone asks for it.
+
+    `is_estimate` tells templates to say "about N".
+    """
+    count_limit = 10000
+
+    def __init__(self, *args, exact=False, count_limit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+        if count_limit is not None:
+            self.count_limit = count_limit
+        self.is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self.exact or not hasattr(queryset, "query"):
+            return super().count
+        if not queryset.query.where and not queryset.query.distinct:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None:
+                self.is_estimate = True
+                return estimate
+        bounded = queryset.order_by()[: self.count_limit + 1].count()
+        if bounded > self.count_limit:
+            self.is_estimate = True
+            return self.count_limit
+        return bounded
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # The real end may be past the estimated one; an empty page is fine there.
+            if self.is_estimate and int(number) >= 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
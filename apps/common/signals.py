@@ -0,0 +1,45 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+
+from .images import image_fields, schedule_derivatives
+
+# model -> names of its fields in IMAGE_DERIVATIVE_FIELDS
+_derivative_fields = {}
+
+
+def note_new_uploads(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    pre_save of a model in IMAGE_DERIVATIVE_FIELDS: remember which fields hold a
+    file that this save is about to store. Checked on the instance, so saves that
+    don't upload anything cost no query. (A name assigned by hand isn't an upload;
+    the generate_image_derivatives command picks such images up.)
+    """
+    if raw:
+        return
+    instance._image_uploads = [
+        field_name for field_name in _derivative_fields.get(sender, ())
+        if (update_fields is None or field_name in update_fields)
+        and not getattr(getattr(instance, field_name), "_committed", True)
+    ]
+
+
+def schedule_derivatives_on_upload(sender, instance, raw=False, **kwargs):
+    """post_save of a model in IMAGE_DERIVATIVE_FIELDS: queue variants for a new upload."""
+    if raw:
+        return
+    for field_name in instance.__dict__.pop("_image_uploads", ()):
+        name = getattr(instance, field_name).name
+        if name:
+            # After commit: the file and the row are final, and no request waits on it.
+            transaction.on_commit(partial(schedule_derivatives, name))
+
+
+def connect_image_fields():
+    for model, field_name in image_fields():
+        if model not in _derivative_fields:
+            uid = f"image_derivatives_{model._meta.label_lower}"
+            pre_save.connect(note_new_uploads, sender=model, dispatch_uid=uid)
+            post_save.connect(schedule_derivatives_on_upload, sender=model, dispatch_uid=uid)
+        _derivative_fields.setdefault(model, []).append(field_name)
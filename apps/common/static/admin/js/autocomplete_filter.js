@@ -0,0 +1,17 @@
+'use strict';
+{
+    // RelatedAutocompleteFilter (apps/common/admin_performance.py): reload the
+    // changelist filtered on the value picked in the select2 box.
+    const $ = django.jQuery;
+
+    $(function() {
+        $('select[data-filter-param]').on('change', function() {
+            let url = this.dataset.filterUrl;
+            if (this.value) {
+                url += (url.length > 1 ? '&' : '') +
+                    encodeURIComponent(this.dataset.filterParam) + '=' + encodeURIComponent(this.value);
+            }
+            window.location.href = url;
+        });
+    });
+}
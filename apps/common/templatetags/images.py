@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from apps.common.images import ORIGINAL, image_variants, variant_specs, variant_url as _variant_url
+
+register = template.Library()
+
+
+@register.filter
+def variant_url(file, variant):
+    """{{ product.image|variant_url:"small" }}: the derivative's URL, or the original's until it exists."""
+    return _variant_url(file, variant) or ""
+
+
+@register.simple_tag
+def responsive_image(file, variant, alt="", css_class="", sizes=None):
+    """
+    {% responsive_image user.profile_image "small" alt="..." css_class="..." %}
+    An <img> with the variant as src, width/height (no layout shift), a srcset of
+    the uncropped variants and lazy loading. Empty without an image.
+    """
+    if not file:
+        return ""
+    variants = image_variants(file)
+    chosen = variants.get(variant) or variants.get(ORIGINAL)
+    attrs = {"src": _variant_url(file, variant), "alt": alt, "loading": "lazy", "decoding": "async"}
+    if css_class:
+        attrs["class"] = css_class
+    if chosen:
+        attrs["width"], attrs["height"] = chosen["width"], chosen["height"]
+    srcset = [
+        f"{variants[name]['url']} {variants[name]['width']}w"
+        for name, spec in variant_specs().items()
+        if name in variants and not spec.get("crop")
+    ]
+    if srcset and not variant_specs().get(variant, {}).get("crop"):
+        attrs["srcset"] = ", ".join(srcset)
+        attrs["sizes"] = sizes or (f"{attrs['width']}px" if "width" in attrs else "100vw")
+    return format_html("<img {}>", format_html_join(" ", '{}="{}"', attrs.items()))
@@ -1,3 +1,548 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.signals import request_started
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.products.models import Category, Product
+from core.database import database_config
+from core.db_router import ReplicaRouter
+
+from . import images, pagination
+from .cache import VersionedCache
+from .emails import send_html_email
+from .fanout import run_mailing
+from .models import ImageDerivative, Mailing, OutboxEmail
+from .outbox import OutboxWorker, backoff_delay
+from .pagination import EstimatedCountPaginator, InvalidCursor, KeysetPaginator
+from .uploads import ImageUploadField, StreamingUploadHandler, streaming_uploads, upload_errors
+from .utils import _taken_condition, allocate_unique_slugs, generate_unique_slug
+
+TEMPLATE = "base.html"
+
+
+class RejectingBackend(LocmemBackend):
+    """locmem, but refuses anything addressed to bounce@example.com."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "bounce@example.com" in message.to:
+                raise SMTPRecipientsRefused({"bounce@example.com": (550, b"No such user")})
+        return super().send_messages(messages)
+
+
+class FlakyConnectionBackend(LocmemBackend):
+    """locmem, but the connection drops once, on the first message to drop@example.com."""
+    dropped = False
+
+    def send_messages(self, messages):
+        if not FlakyConnectionBackend.dropped and any("drop@example.com" in m.to for m in messages):
+            FlakyConnectionBackend.dropped = True
+            raise SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(TestCase):
+    def test_send_html_email_only_queues(self):
+        send_html_email("Welcome", "a@example.com", TEMPLATE, {"title": "Hi"})
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.to_email), (OutboxEmail.STATUS_PENDING, "a@example.com"))
+
+    @override_settings(EMAIL_DELIVERY_MODE="sync")
+    def test_sync_mode_sends_in_request(self):
+        send_html_email("Welcome", "a@example.com", TEMPLATE, {})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_worker_sends_in_batches(self):
+        for i in range(5):
+            send_html_email(f"Mail {i}", f"user{i}@example.com", TEMPLATE, {})
+        worker = OutboxWorker(batch_size=2)
+
+        self.assertEqual(worker.run_once(), 2)
+        self.assertEqual([m.subject for m in mail.outbox], ["Mail 0", "Mail 1"])
+        while worker.run_once():
+            pass
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT).count(), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertEqual(worker.stats()["sent"], 5)
+
+    @override_settings(EMAIL_BACKEND="apps.common.tests.RejectingBackend")
+    def test_failure_is_retried_with_backoff_then_given_up(self):
+        send_html_email("Hi", "bounce@example.com", TEMPLATE, {})
+        send_html_email("Hi", "ok@example.com", TEMPLATE, {})
+        worker = OutboxWorker(max_attempts=2)
+
+        worker.run_once()
+        self.assertEqual(len(mail.outbox), 1)
+        bounced = OutboxEmail.objects.get(to_email="bounce@example.com")
+        self.assertEqual((bounced.status, bounced.attempts), (OutboxEmail.STATUS_PENDING, 1))
+        self.assertIn("SMTPRecipientsRefused", bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now() + timedelta(seconds=backoff_delay(1) - 5))
+        self.assertEqual(worker.run_once(), 0)  # not due yet
+
+        OutboxEmail.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+        worker.run_once()
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), (OutboxEmail.STATUS_FAILED, 2))
+        self.assertEqual(worker.stats()["failed"], 1)
+
+    def test_stale_claims_are_released(self):
+        send_html_email("Hi", "a@example.com", TEMPLATE, {})
+        OutboxEmail.objects.update(status=OutboxEmail.STATUS_SENDING, claimed_at=timezone.now() - timedelta(hours=1))
+
+        OutboxWorker(claim_timeout=60).run_once()
+
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with self.settings(EMAIL_OUTBOX_RETRY_BACKOFF=10, EMAIL_OUTBOX_RETRY_MAX_BACKOFF=60):
+            self.assertEqual([backoff_delay(n) for n in range(1, 6)], [10, 20, 40, 60, 60])
+
+
+def png_bytes(size=(64, 48)):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class ImageUploadTests(SimpleTestCase):
+    def upload(self, content, name="photo.png"):
+        request = RequestFactory().post("/", {"image": SimpleUploadedFile(name, content)})
+        request.upload_handlers = [StreamingUploadHandler(request)]
+        return request, request.FILES
+
+    def test_image_is_streamed_to_a_temporary_file(self):
+        request, files = self.upload(png_bytes())
+
+        upload = files["image"]
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertEqual(upload.image_format, "PNG")
+        self.assertEqual(upload_errors(request), {})
+        cleaned = ImageUploadField().clean(upload)
+        self.assertEqual((cleaned.image.size, cleaned.content_type), ((64, 48), "image/png"))
+
+    def test_non_image_is_refused_from_its_magic_bytes(self):
+        request, files = self.upload(b"%PDF-1.7 not an image at all" * 100, name="fake.png")
+
+        self.assertNotIn("image", files)
+        self.assertIn("image", upload_errors(request))
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=1000)
+    def test_oversize_file_stops_the_upload(self):
+        request, files = self.upload(png_bytes() + b"\0" * 5000)
+
+        self.assertNotIn("image", files)
+        self.assertIn("too large", upload_errors(request)["image"])
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1000)
+    def test_oversize_request_is_refused_before_reading(self):
+        request = RequestFactory().post("/", {"image": SimpleUploadedFile("big.png", b"\0" * 5000)})
+        request.upload_handlers = [StreamingUploadHandler(request)]
+
+        with self.assertRaises(RequestDataTooBig):
+            request.FILES
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1000)
+    def test_other_views_keep_the_default_handlers(self):
+        request = RequestFactory().post("/", {"document": SimpleUploadedFile("notes.pdf", b"%PDF" * 5000)})
+
+        self.assertEqual(request.FILES["document"].size, 20000)
+
+    def test_streaming_uploads_view_is_still_csrf_protected(self):
+        view = streaming_uploads(lambda request: HttpResponse(type(request.FILES["image"]).__name__))
+
+        request = RequestFactory().post("/", {"image": SimpleUploadedFile("photo.png", png_bytes())})
+        self.assertTrue(view.csrf_exempt)  # for the middleware, which would read the body first
+        self.assertEqual(view(request).status_code, 403)
+
+        request = RequestFactory().post("/", {"image": SimpleUploadedFile("photo.png", png_bytes())})
+        request._dont_enforce_csrf_checks = True
+        self.assertEqual(view(request).content, b"TemporaryUploadedFile")
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_dimensions_come_from_the_header(self):
+        _, files = self.upload(png_bytes(size=(100, 100)))
+
+        with self.assertRaises(ValidationError) as raised:
+            ImageUploadField().clean(files["image"])
+        self.assertEqual(raised.exception.code, "too_many_pixels")
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_postgres_pool_replaces_persistent_connections(self):
+        db = database_config("postgres://shop:secret@db:5432/shop", conn_max_age=600, pool=True, statement_timeout=5000)
+        self.assertEqual(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(db["OPTIONS"]["pool"], {"min_size": 2, "max_size": 10, "timeout": 10})
+        self.assertEqual(db["OPTIONS"]["options"], "-c statement_timeout=5000")
+
+        db = database_config("postgres://shop:secret@db:5432/shop", conn_max_age=600)
+        self.assertEqual((db["CONN_MAX_AGE"], db["CONN_HEALTH_CHECKS"]), (600, True))
+        self.assertNotIn("pool", db["OPTIONS"])
+
+    def test_no_statement_timeout_unless_asked(self):
+        db = database_config("postgres://shop:secret@db:5432/shop")
+        self.assertNotIn("options", db["OPTIONS"])
+
+    def test_sqlite_profile(self):
+        db = database_config("sqlite:////tmp/shop.sqlite3")
+        self.assertIn("PRAGMA journal_mode=WAL", db["OPTIONS"]["init_command"])
+        self.assertEqual(db["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+        db = database_config("sqlite:////tmp/shop.sqlite3", sqlite_immediate=False)
+        self.assertNotIn("transaction_mode", db["OPTIONS"])
+        # The shared-cache in-memory test database can't wait for a lock: no BEGIN IMMEDIATE there.
+        self.assertNotIn("transaction_mode", settings.DATABASES["default"]["OPTIONS"])
+
+    def test_no_persistent_connections_under_asgi(self):
+        env = {key: value for key, value in os.environ.items() if key != "DATABASE_CONN_MAX_AGE"}
+        script = "import core.asgi; from django.conf import settings; print(settings.DATABASES['default']['CONN_MAX_AGE'])"
+        result = subprocess.run(
+            [sys.executable, "-c", script], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "0")
+
+    def test_replica_router_reads_own_writes_from_the_primary(self):
+        router = ReplicaRouter()
+        router.replicas = ["replica1"]
+        request_started.send(sender=None)
+        self.assertEqual(router.db_for_read(Product), "replica1")
+        self.assertEqual(router.db_for_read(Session), "default")
+
+        self.assertEqual(router.db_for_write(Product), "default")
+        self.assertEqual(router.db_for_read(Product), "default")
+
+        request_started.send(sender=None)  # next request
+        self.assertEqual(router.db_for_read(Product), "replica1")
+        self.assertFalse(router.allow_migrate("replica1", "products"))
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Pages")
+        start = timezone.now()
+        cls.products = []
+        for i in range(6):
+            product = Product.objects.create(name=f"Item {i}", sku=f"PAGE-{i}", price=10 + i % 2, category=category)
+            # 100 microseconds apart: all within the same millisecond
+            Product.objects.filter(pk=product.pk).update(created_at=start + timedelta(microseconds=100 * i))
+            cls.products.append(product)
+
+    def walk(self, ordering, page_size=2):
+        paginator = KeysetPaginator(Product.objects.all(), ordering=ordering)
+        ids, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor, page_size)
+            ids += [product.pk for product in page]
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def test_sub_millisecond_timestamps_are_not_skipped(self):
+        self.assertEqual(self.walk(("-created_at", "-id")), [p.pk for p in reversed(self.products)])
+        self.assertEqual(self.walk(("created_at", "id"), page_size=4), [p.pk for p in self.products])
+
+    def test_ties_are_broken_by_the_last_key(self):
+        expected = list(Product.objects.order_by("price", "id").values_list("pk", flat=True))
+        self.assertEqual(self.walk(("price", "id")), expected)
+
+    def test_bad_cursors(self):
+        paginator = KeysetPaginator(Product.objects.all(), ordering=("-created_at", "-id"))
+        with self.assertRaises(InvalidCursor):
+            paginator.get_page("not-a-cursor")
+        other = KeysetPaginator(Product.objects.all(), ordering=("id",)).get_page(page_size=1).next_cursor
+        with self.assertRaises(InvalidCursor):
+            paginator.get_page(other)
+
+
+
+@override_settings(ADMIN_PERFORMANCE_MODE=True)
+class AdminPerformanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser(email="admin@example.com", password="s3cret")
+        cls.shoes = Category.objects.create(name="Shoes")
+        cls.hats = Category.objects.create(name="Hats")
+        for i in range(3):
+            Product.objects.create(name=f"Shoe {i}", sku=f"SHOE-{i}", price=10, category=cls.shoes)
+        Product.objects.create(name="Cap", sku="HAT-0", price=10, category=cls.hats)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:products_product_changelist")
+
+    def test_unfiltered_changelist_shows_the_estimate(self):
+        with mock.patch.object(pagination, "estimate_row_count", return_value=1234) as estimate:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+        estimate.assert_called_once()
+        self.assertTrue(response.context["cl"].paginator.is_estimate)
+        self.assertContains(response, "about 1234 Products")
+        self.assertContains(response, "?exact_count=1")
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+
+    def test_exact_count_param_counts_for_real(self):
+        with mock.patch.object(pagination, "estimate_row_count", return_value=1234) as estimate:
+            response = self.client.get(self.url, {"exact_count": "1"})
+        estimate.assert_not_called()
+        self.assertEqual(response.status_code, 200)  # not rejected as an unknown filter
+        self.assertFalse(response.context["cl"].paginator.is_estimate)
+        self.assertContains(response, "4 Products")
+        self.assertNotContains(response, "about ")
+
+    def test_filtered_count_is_capped(self):
+        paginator = EstimatedCountPaginator(Product.objects.filter(category=self.shoes), 1, count_limit=2)
+        self.assertEqual(paginator.count, 2)
+        self.assertTrue(paginator.is_estimate)
+        # The real last page is past the estimated one.
+        self.assertEqual(len(paginator.page(3)), 1)
+
+    def test_autocomplete_filter_narrows_the_changelist(self):
+        response = self.client.get(self.url, {"category__id__exact": self.hats.pk})
+        changelist = response.context["cl"]
+        self.assertEqual([product.sku for product in changelist.result_list], ["HAT-0"])
+        self.assertFalse(changelist.paginator.is_estimate)
+        self.assertEqual(changelist.result_count, 1)
+        self.assertContains(response, 'data-filter-param="category__id__exact"')
+        # Only the selected category is rendered, not every category.
+        self.assertContains(response, "Hats")
+        self.assertNotContains(response, "Shoes")
+
+
+class VersionedCacheTests(SimpleTestCase):
+    def test_builder_runs_once_per_version(self):
+        cache = VersionedCache("test-versioned")
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cache.get_or_set("key", build), 1)
+        self.assertEqual(cache.get_or_set("key", build), 1)
+        cache.bump()
+        self.assertEqual(cache.get_or_set("key", build), 2)
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["local_hits"], 1)
+
+    def test_a_bump_in_another_worker_drops_the_local_copy(self):
+        worker_a, worker_b = VersionedCache("test-workers"), VersionedCache("test-workers")
+        worker_a.get_or_set("key", lambda: "old")
+        self.assertEqual(worker_b.get_or_set("key", lambda: "rebuilt"), "old")  # shared hit
+
+        worker_b.bump()
+        self.assertEqual(worker_a.get_or_set("key", lambda: "new"), "new")
+
+
+class UniqueSlugTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("T", "T 2", "T-shirt", "Tea", "Toys"):
+            Category.objects.create(name=name)
+
+    def test_collisions_inside_and_outside_the_batch(self):
+        with self.assertNumQueries(1):
+            slugs = allocate_unique_slugs(Category, ["T", "T", "T-shirt", "Lamps", "Lamps"])
+        self.assertEqual(slugs, ["t-3", "t-4", "t-shirt-2", "lamps", "lamps-2"])
+
+    def test_only_the_base_and_its_variants_are_fetched(self):
+        # not t-shirt, tea, toys, ...
+        taken = Category.objects.filter(_taken_condition("slug", "t", 100)).values_list("slug", flat=True)
+        self.assertEqual(sorted(taken), ["t", "t-2"])
+
+    def test_long_names_are_truncated_before_the_suffix(self):
+        long_name = "x" * 150
+        Category.objects.create(name=long_name)
+        slug = allocate_unique_slugs(Category, [long_name + "y"])[0]
+        self.assertEqual(slug, "x" * 98 + "-2")
+
+    def test_save_retries_when_another_writer_took_the_slug(self):
+        with mock.patch("apps.common.models.generate_unique_slug", side_effect=["tea", "tea-2"]):
+            category = Category.objects.create(name="Tea (loose)")
+        self.assertEqual(category.slug, "tea-2")
+
+    def test_other_integrity_errors_are_not_retried(self):
+        with mock.patch("apps.common.models.generate_unique_slug", wraps=generate_unique_slug) as allocate:
+            with self.assertRaises(IntegrityError):
+                Category.objects.create(name="Tea")  # duplicate name, free slug
+        self.assertEqual(allocate.call_count, 1)
+
+
+class MailingFanoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        emails = ["a@example.com", "b@example.com", "bounce@example.com", "drop@example.com", "e@example.com"]
+        cls.users = [User.objects.create_user(email=email, first_name=email[0]) for email in emails]
+        cls.recipients = User.objects.filter(is_active=True)
+
+    def setUp(self):
+        FlakyConnectionBackend.dropped = False
+
+    def mailing(self, **kwargs):
+        return Mailing.objects.create(
+            name="october", subject="News", template_name="users/emails/newsletter.html",
+            context={"headline": "Hello"}, **kwargs,
+        )
+
+    def run_mailing(self, mailing, **kwargs):
+        return run_mailing(mailing, self.recipients, chunk_size=2, workers=0, **kwargs)
+
+    def sent_to(self):
+        return sorted(to for message in mail.outbox for to in message.to)
+
+    def test_mails_everyone_once_in_chunks(self):
+        progress = mock.Mock()
+        mailing = self.run_mailing(self.mailing(), progress=progress)
+
+        self.assertEqual(self.sent_to(), sorted(user.email for user in self.users))
+        self.assertEqual((mailing.status, mailing.sent_count, mailing.failed_count), (Mailing.STATUS_DONE, 5, 0))
+        self.assertEqual(mailing.last_recipient_id, self.users[-1].pk)
+        self.assertEqual(progress.call_count, 3)
+        self.assertIn("Hi a,", mail.outbox[0].alternatives[0][0])
+
+    def test_resumes_after_the_checkpoint(self):
+        mailing = self.run_mailing(self.mailing(last_recipient_id=self.users[1].pk, sent_count=2))
+
+        self.assertEqual(self.sent_to(), sorted(user.email for user in self.users[2:]))
+        self.assertEqual(mailing.sent_count, 5)
+        self.assertEqual(self.run_mailing(mailing).sent_count, 5)  # done: nothing sent again
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_refused_recipient_goes_to_the_outbox_alone(self):
+        mailing = self.run_mailing(self.mailing(), email_backend=f"{__name__}.RejectingBackend")
+
+        # Everyone else exactly once, including the rest of the bounced recipient's chunk.
+        self.assertEqual(self.sent_to(), ["a@example.com", "b@example.com", "drop@example.com", "e@example.com"])
+        self.assertEqual((mailing.sent_count, mailing.failed_count), (4, 1))
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to_email, "bounce@example.com")
+
+    def test_dropped_connection_is_reopened_and_the_message_retried(self):
+        with self.assertLogs("apps.common.fanout", "WARNING"):
+            mailing = self.run_mailing(self.mailing(), email_backend=f"{__name__}.FlakyConnectionBackend")
+
+        self.assertEqual(self.sent_to(), sorted(user.email for user in self.users))
+        self.assertEqual((mailing.sent_count, mailing.failed_count), (5, 0))
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_send_newsletter_command_uses_the_given_backend(self):
+        out = StringIO()
+        call_command(
+            "send_newsletter", "october", subject="News", workers=0, chunk_size=2,
+            email_backend=f"{__name__}.RejectingBackend", stdout=out,
+        )
+        self.assertIn("4 sent, 1 handed to the outbox", out.getvalue())
+        self.assertEqual(len(mail.outbox), 4)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        images.lookups.clear()
+
+    def upload(self, name="Banners", size=(1000, 500)):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Category.objects.create(name=name, image=SimpleUploadedFile("banner.png", png_bytes(size)))
+
+    def test_upload_gets_resized_variants(self):
+        category = self.upload()
+
+        sizes = dict(
+            ImageDerivative.objects.filter(source=category.image.name).values_list("variant", "width")
+        )
+        self.assertEqual(sizes, {"original": 1000, "thumb": 80, "small": 320, "medium": 800, "large": 1000})
+        small = images.image_variants(category.image)["small"]
+        self.assertEqual((small["width"], small["height"]), (320, 160))
+        self.assertTrue(small["url"].endswith(".small.webp"))
+
+    def test_saves_without_a_new_upload_cost_nothing(self):
+        category = self.upload()
+        category.description = "Edited"
+        with mock.patch("apps.common.signals.schedule_derivatives") as schedule:
+            # savepoint, UPDATE, release: no ImageDerivative lookup
+            with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(3):
+                category.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                Category.objects.create(name="No image")
+        schedule.assert_not_called()
+
+    def test_original_is_served_until_variants_exist(self):
+        category = Category.objects.create(name="Pending")
+        Category.objects.filter(pk=category.pk).update(image="categories/pending.png")
+        category.refresh_from_db()
+
+        self.assertEqual(images.variant_url(category.image, "small"), "/media/categories/pending.png")
+        self.assertEqual(images.image_variants(None), {})
+
+    def test_prefetch_is_one_query_for_a_page(self):
+        first, second = self.upload("First"), self.upload("Second")
+        images.lookups.clear()
+
+        with self.assertNumQueries(1):
+            images.prefetch_image_variants([first.image, second.image, None])
+            self.assertIn("thumb", images.image_variants(first.image))
+            self.assertIn("thumb", images.image_variants(second.image))
+
+    def test_template_tags(self):
+        category = self.upload()
+        context = Context({"image": category.image})
+
+        url = Template('{% load images %}{{ image|variant_url:"medium" }}').render(context)
+        self.assertTrue(url.endswith(".medium.webp"))
+        img = Template('{% load images %}{% responsive_image image "small" alt="Banner" %}').render(context)
+        self.assertIn('width="320" height="160"', img)
+        self.assertIn('alt="Banner"', img)
+        self.assertIn("srcset=", img)
+        self.assertIn('sizes="320px"', img)
+        thumb = Template('{% load images %}{% responsive_image image "thumb" %}').render(context)
+        self.assertIn('width="80" height="80"', thumb)
+        self.assertNotIn("srcset=", thumb)  # a crop has no wider versions of itself
+        self.assertEqual(Template('{% load images %}{% responsive_image None "small" %}').render(context), "")
+
+    def test_backfill_command_generates_missing_variants_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name="Old upload")
+        category.image.save("old.png", SimpleUploadedFile("old.png", png_bytes()), save=False)
+        Category.objects.filter(pk=category.pk).update(image=category.image.name)  # predates derivatives
+
+        out = StringIO()
+        call_command("generate_image_derivatives", inline=True, stdout=out)
+        self.assertIn("Generated variants for 1 images", out.getvalue())
+        self.assertEqual(ImageDerivative.objects.filter(source=category.image.name).count(), 5)
+
+        call_command("generate_image_derivatives", inline=True, stdout=out)
+        self.assertIn("Generated variants for 0 images", out.getvalue())
@@ -0,0 +1,220 @@
+"""
+Image uploads without the heavy lifting in the request.
+
+- `StreamingUploadHandler` writes every upload straight to a temporary file,
+  chunk by chunk, never into memory. It only runs in the views that take
+  images: those wrapped in `streaming_uploads` (profile update, registration)
+  and the add/change views of `ImageUploadAdminMixin` admins. Everything else
+  keeps Django's FILE_UPLOAD_HANDLERS.
+  - a request whose Content-Length is over UPLOAD_MAX_REQUEST_SIZE is refused
+    (400) before its body is read,
+  - a file that grows past UPLOAD_MAX_FILE_SIZE stops the upload right there;
+    the rest of the body is read and thrown away, so the client gets the form
+    back instead of a reset connection,
+  - a file that doesn't start with the magic bytes of an allowed image type
+    is skipped after its first chunk.
+  Rejections are kept on the request (`upload_errors(request)`), so the form
+  can say why its file is missing.
+- `ImageUploadField` replaces forms.ImageField. It reads only the image header
+  (format and dimensions, a few KB) instead of letting Pillow verify() the
+  whole file, and refuses more than IMAGE_UPLOAD_MAX_PIXELS.
+- Saving the form moves the temporary file into MEDIA_ROOT (FileSystemStorage
+  renames files that have a temporary_file_path() - keep FILE_UPLOAD_TEMP_DIR
+  on the same filesystem), and the derivatives (common/images.py) are
+  generated from there after commit. The bytes are written once.
+
+Slow clients still hold a worker while they send; buffer request bodies in the
+reverse proxy in front of the app for that.
+"""
+from functools import wraps
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.core.files.uploadhandler import SkipFile, StopUpload, TemporaryFileUploadHandler
+from django.db import models
+from django.template.defaultfilters import filesizeformat
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+HEADER_BYTES = 16
+
+# first bytes -> Pillow format name
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+)
+
+
+def sniff_image_format(header):
+    """Pillow format name from the first bytes of a file, None if it isn't an image we take."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        image_format = "WEBP"
+    else:
+        image_format = next((name for magic, name in MAGIC_NUMBERS if header.startswith(magic)), None)
+    if image_format not in allowed_formats():
+        return None
+    return image_format
+
+
+def allowed_formats():
+    return getattr(settings, "IMAGE_UPLOAD_FORMATS", ("JPEG", "PNG", "GIF", "WEBP"))
+
+
+def max_file_size():
+    return getattr(settings, "UPLOAD_MAX_FILE_SIZE", 10 * 1024 * 1024)
+
+
+def upload_errors(request):
+    """{field name: message} for the files StreamingUploadHandler refused in this request."""
+    return getattr(request, "_upload_errors", {})
+
+
+def add_upload_errors(form, request):
+    """Report the refused files of `request` on a bound form (makes it invalid)."""
+    for field_name, message in upload_errors(request).items():
+        form.add_error(field_name if field_name in form.fields else None, message)
+    return form
+
+
+class StreamingUploadHandler(TemporaryFileUploadHandler):
+    """Streams uploads to disk and refuses oversize and non-image files early."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        limit = getattr(settings, "UPLOAD_MAX_REQUEST_SIZE", None)
+        if limit and content_length > limit:
+            raise RequestDataTooBig(f"Upload of {content_length} bytes exceeds UPLOAD_MAX_REQUEST_SIZE.")
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b""
+
+    def _reject(self, message):
+        errors = upload_errors(self.request)
+        errors[self.field_name] = message
+        self.request._upload_errors = errors
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_file_size():
+            self._reject(f"The file is too large, the maximum is {filesizeformat(max_file_size())}.")
+            raise StopUpload(connection_reset=False)
+        if len(self.header) < HEADER_BYTES:
+            self.header += raw_data[:HEADER_BYTES]
+            if len(self.header) >= HEADER_BYTES:
+                self._check_header()
+        super().receive_data_chunk(raw_data, start)
+
+    def _check_header(self):
+        image_format = sniff_image_format(self.header)
+        if image_format is None:
+            self._reject("Upload a JPEG, PNG, GIF or WebP image.")
+            raise SkipFile()  # the parser drops the temporary file and discards the rest
+        self.file.image_format = image_format
+
+    def file_complete(self, file_size):
+        if len(self.header) < HEADER_BYTES:  # a few bytes in total, never checked
+            try:
+                self._check_header()
+            except SkipFile:
+                self.file.close()
+                return None
+        return super().file_complete(file_size)
+
+
+def streaming_uploads(view_func):
+    """
+    View decorator: parse the request's files with StreamingUploadHandler.
+
+    The handlers have to be set before anything reads request.POST, and
+    CsrfViewMiddleware reads it for the token. So the middleware is skipped
+    (csrf_exempt) and the view is CSRF-checked here, after the handlers are set.
+    """
+    protected = csrf_protect(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [StreamingUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+class ImageUploadField(forms.ImageField):
+    """forms.ImageField that checks the image header only, not the whole image."""
+
+    default_error_messages = {
+        "too_large": "The file is too large, the maximum is %(max)s.",
+        "too_many_pixels": "The image is too large, the maximum is %(max)s megapixels.",
+    }
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)  # skips forms.ImageField's full verify()
+        if f is None:
+            return None
+        if f.size > max_file_size():
+            raise ValidationError(
+                self.error_messages["too_large"], code="too_large", params={"max": filesizeformat(max_file_size())}
+            )
+
+        from PIL import Image
+
+        max_pixels = getattr(settings, "IMAGE_UPLOAD_MAX_PIXELS", 40_000_000)
+        source = f.temporary_file_path() if hasattr(f, "temporary_file_path") else f
+        try:
+            # open() parses the header; pixel data is only decoded on load().
+            with Image.open(source) as image:
+                image_format, (width, height) = image.format, image.size
+            too_many_pixels = width * height > max_pixels
+        except Image.DecompressionBombError:
+            too_many_pixels = True
+        except Exception as exc:
+            raise ValidationError(self.error_messages["invalid_image"], code="invalid_image") from exc
+        if too_many_pixels:
+            raise ValidationError(
+                self.error_messages["too_many_pixels"], code="too_many_pixels",
+                params={"max": round(max_pixels / 1_000_000)},
+            )
+        if image_format not in allowed_formats():
+            raise ValidationError(self.error_messages["invalid_image"], code="invalid_image")
+
+        f.image = image  # closed; format, size and mode stay readable
+        f.content_type = Image.MIME.get(image_format)
+        if hasattr(f, "seek") and callable(f.seek):
+            f.seek(0)
+        return f
+
+
+class ImageUploadAdminMixin:
+    """
+    ModelAdmin mixin: StreamingUploadHandler on the add/change views, ImageUploadField
+    for ImageFields, and refused uploads shown on the form.
+    """
+
+    formfield_overrides = {models.ImageField: {"form_class": ImageUploadField}}
+
+    @method_decorator(streaming_uploads)
+    def add_view(self, request, form_url="", extra_context=None):
+        return super().add_view(request, form_url, extra_context)
+
+    @method_decorator(streaming_uploads)
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form_class = super().get_form(request, obj, **kwargs)
+        errors = upload_errors(request)
+        if not errors:
+            return form_class
+
+        class UploadCheckedForm(form_class):
+            def clean(self):
+                cleaned_data = super().clean()
+                for field_name, message in errors.items():
+                    self.add_error(field_name if field_name in self.fields else None, message)
+                return cleaned_data
+
+        return UploadCheckedForm
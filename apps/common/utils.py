@@ -1,18 +1,81 @@
-import uuid 
-from django.utils.text import slugify 
+import re
+import uuid
+from django.db.models import Q
+from django.utils.text import slugify
 
-def generate_unique_slug(model_class, field_value, slug_field="slug", max_length=250):
+# Characters reserved at the end of a slug for a "-<n>" de-duplication suffix.
+SLUG_SUFFIX_ROOM = 8
+
+
+def _taken_condition(slug_field, base_slug, max_length):
+    """
+    Matches `base_slug` and its "-<n>" variants only: not "t-shirt" for "t", or
+    every slug that merely starts with the same letters. A base too long to take a
+    suffix whole gets truncated variants, so those are matched on the part every
+    variant keeps.
+    """
+    if len(base_slug) > max_length - SLUG_SUFFIX_ROOM:
+        variants = rf"^{re.escape(base_slug[:max_length - SLUG_SUFFIX_ROOM])}.*-[0-9]+$"
+    else:
+        variants = rf"^{re.escape(base_slug)}-[0-9]+$"
+    return Q(**{slug_field: base_slug}) | Q(**{f"{slug_field}__regex": variants})
+
+
+def allocate_unique_slugs(model_class, values, slug_field="slug", max_length=None, chunk_size=200, queryset=None):
+    """
+    Work out a unique slug for every value in `values` (names, titles...) at once.
+
+    Existing slugs equal to a base slug or to one of its "-<n>" variants are fetched
+    in one query per `chunk_size` distinct bases, then collisions are resolved in memory with
+    "-2", "-3"... suffixes. Duplicates inside the batch itself are handled too, so the
+    result can go straight into bulk_create().
+
+    `queryset` narrows where the slugs must be unique (e.g. per parent row);
+    by default that is the whole table.
+
+    Returns the slugs in the same order as `values`.
+    Another writer can still take a slug between this query and the INSERT; callers
+    that save one row at a time should go through UniqueSlugMixin, which retries.
+    """
+    if max_length is None:
+        max_length = model_class._meta.get_field(slug_field).max_length
+
+    bases = [slugify(value)[:max_length].rstrip("-") or generate_uuid()[:8] for value in values]
+
+    taken = set()
+    distinct_bases = sorted(set(bases))
+    for i in range(0, len(distinct_bases), chunk_size):
+        condition = Q()
+        for base_slug in distinct_bases[i:i + chunk_size]:
+            condition |= _taken_condition(slug_field, base_slug, max_length)
+        rows = queryset if queryset is not None else model_class._default_manager
+        taken.update(rows.filter(condition).values_list(slug_field, flat=True))
+
+    slugs = []
+    next_suffix = {}  # base slug -> next number to try, so repeated bases don't rescan from 2
+    for base_slug in bases:
+        slug = base_slug
+        number = next_suffix.get(base_slug, 2)
+        while slug in taken:
+            suffix = f"-{number}"
+            # Ensure final slug length stays within limit
+            slug = f"{base_slug[:max_length - len(suffix)].rstrip('-')}{suffix}"
+            number += 1
+        next_suffix[base_slug] = number
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def generate_unique_slug(model_class, field_value, slug_field="slug", max_length=None, queryset=None):
     """
     Generate a unique slug for a model instance based on a field value.
-    Uses short UUIDs for uniqueness when needed.
-    """
-    base_slug = slugify(field_value)[:max_length]  # truncate base
-    slug = base_slug
-    while model_class.objects.filter(**{slug_field: slug}).exists():
-        suffix = uuid.uuid4().hex[:8]
-        # Ensure final slug length stays within limit
-        slug = f"{base_slug[:max_length - len(suffix) - 1]}-{suffix}"
-    return slug
+    Costs a single query, however many similar slugs already exist.
+    `max_length` defaults to the slug field's own max_length.
+    """
+    return allocate_unique_slugs(
+        model_class, [field_value], slug_field=slug_field, max_length=max_length, queryset=queryset,
+    )[0]
 
 def generate_uuid():
     """
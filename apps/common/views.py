@@ -1,3 +1,19 @@
 from django.shortcuts import render
+from django.http import JsonResponse
+
+from .cache import registry
+from .outbox import outbox_stats
+from .decorators import superuser_required
 
 # Create your views here.
+
+@superuser_required
+def cache_stats_view(request):
+    """Hit/miss counters of every VersionedCache in this worker process, as JSON."""
+    return JsonResponse({namespace: cache.stats() for namespace, cache in registry.items()})
+
+
+@superuser_required
+def outbox_stats_view(request):
+    """Email outbox depth by status, how far behind the workers are, and emails sent recently."""
+    return JsonResponse(outbox_stats())
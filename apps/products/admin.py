@@ -1,14 +1,42 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import Category, Tag, Product
+
+from apps.common.admin_performance import PerformanceAdminMixin, cached_file_url
+from apps.common.images import image_variants
+from apps.common.uploads import ImageUploadAdminMixin
+from . import inventory
+from .models import Category, Tag, Product, StockReservation
+
+
+def thumbnail(image):
+    """
+    Small preview <img> for changelists, '-' without an image.
+    Uses the 80x80 "thumb" derivative (prefetched per page through
+    list_image_fields), or the original until it has been generated; the image
+    loads lazily, so a long page doesn't fetch every thumbnail up front.
+    """
+    if not image:
+        return "-"
+    thumb = image_variants(image).get("thumb")
+    return format_html(
+        '<img src="{}" loading="lazy" width="40" height="40" style="object-fit:cover; border-radius:4px;" />',
+        thumb["url"] if thumb else cached_file_url(image),
+    )
+
+
 # Register your models here.
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(PerformanceAdminMixin, ImageUploadAdminMixin, admin.ModelAdmin):
     # Columns to display in the category list view in the admin
     list_display = ('name', 'parent', 'is_active', 'created_at', 'updated_at', 'image_preview')
     
     # Filters shown in the sidebar for easy filtering of categories
+    # (in performance mode `parent` is an autocomplete box, see PerformanceAdminMixin)
     list_filter = ('is_active', 'created_at', 'updated_at', 'parent')
+
+    # `parent` is nullable, so Django's default select_related() would skip it (one query per row)
+    list_select_related = ('parent',)
+    list_image_fields = ('image',)
     
     # Fields searchable by text in the search box on top
     search_fields = ('name', 'slug', 'description')
@@ -33,14 +61,8 @@ class CategoryAdmin(admin.ModelAdmin):
         Display a small preview thumbnail of the category image in the list view.
         Shows a placeholder '-' if no image is set.
         """
-        if obj.image:
-            return format_html(
-                '<img src="{}" style="width:40px; height:40px; object-fit:cover; border-radius:4px;" />',
-                obj.image.url
-            )
-        return "-"
+        return thumbnail(obj.image)
     image_preview.short_description = "Image"  # Column header name in the admin
-    image_preview.allow_tags = True
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -53,4 +75,68 @@ class TagAdmin(admin.ModelAdmin):
     # Auto-fill slug field from name in forms
     prepopulated_fields = {'slug': ('name',)}
 
-    
+
+@admin.register(Product)
+class ProductAdmin(PerformanceAdminMixin, ImageUploadAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'sku', 'category', 'price', 'stock_quantity', 'status', 'is_active', 'created_at', 'image_preview')
+    list_filter = ('status', 'is_active', 'is_featured', 'created_at', 'category')
+    list_select_related = ('category',)
+    list_image_fields = ('image',)
+
+    # exact sku (unique index) or name prefix; a %term% scan of millions of rows is what made search slow
+    search_fields = ('=sku', '^name')
+
+    # newest first, walking the created_at index (the `id` tiebreak keeps Django from adding `-pk`)
+    ordering = ('-created_at', '-id')
+
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('created_at', 'updated_at', 'views', 'purchases_count', 'created_by', 'updated_by')
+    autocomplete_fields = ('category', 'tags')
+    list_per_page = 50
+
+    def image_preview(self, obj):
+        return thumbnail(obj.image)
+    image_preview.short_description = "Image"
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'stock_quantity':
+            formfield.show_hidden_initial = True  # posts back the stock the form showed, see save_model()
+        return formfield
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        obj.updated_by = request.user
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        # Checkouts move the stock while the form is open: save everything else, and
+        # apply a stock edit as the difference to what the form showed (see inventory.py).
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name not in ('stock_quantity', 'is_in_stock')
+        ])
+        if 'stock_quantity' in form.changed_data:
+            shown = form['stock_quantity']
+            delta = obj.stock_quantity - shown.field.to_python(form.data.get(shown.html_initial_name, shown.initial))
+            if not inventory.adjust_stock(obj.pk, delta):
+                self.message_user(request, f"Stock not changed: removing {-delta} would go below zero.", messages.WARNING)
+        obj.refresh_from_db(fields=['stock_quantity', 'is_in_stock'])
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(PerformanceAdminMixin, admin.ModelAdmin):
+    # Written by products/inventory.py only; editing a row here would desync the stock.
+    list_display = ('reference', 'product', 'quantity', 'status', 'expires_at', 'created_at', 'closed_at')
+    list_filter = ('status',)
+    list_select_related = ('product',)
+    search_fields = ('=reference',)
+    ordering = ('-id',)
+    readonly_fields = [field.name for field in StockReservation._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'products'
+    name = 'apps.products'
+    verbose_name = "Product Catalog"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects cache invalidation receivers)
@@ -0,0 +1,112 @@
+"""
+Attribute filtering over product variants ("Color=Red AND Size=XL").
+
+VariantAttributeValue is an inverted index: the (value, variant) index is the
+posting list of variants having one value. A filter like
+(Color in {Red, Blue}) AND (Size = XL) becomes one indexed query that reads
+only those posting lists and keeps the variants that hit every attribute:
+
+    SELECT variant_id FROM products_variantattributevalue
+     WHERE value_id IN (red, blue, xl)
+     GROUP BY variant_id
+    HAVING COUNT(DISTINCT attribute_id) = 2
+
+so the cost depends on the size of the posting lists involved, not on the
+number of attributes or variants in the catalog.
+"""
+from django.db.models import Count, Q
+
+from apps.common.cache import get_versioned_cache
+
+attribute_cache = get_versioned_cache("catalog-attributes")
+
+
+def _models():
+    # Imported lazily: models.py imports this module.
+    from .models import ProductAttributeValue, ProductVariant, VariantAttributeValue
+    return ProductAttributeValue, ProductVariant, VariantAttributeValue
+
+
+def parse_attribute_params(params):
+    """["color:red", "color:blue", "size:xl"] -> {"color": ["red", "blue"], "size": ["xl"]}"""
+    filters = {}
+    for param in params:
+        attribute, _, value = param.partition(":")
+        if not attribute or not value:
+            raise ValueError(f"Invalid attribute filter '{param}' (expected attribute:value).")
+        filters.setdefault(attribute.strip(), []).append(value.strip())
+    return filters
+
+
+def resolve_attribute_filters(filters):
+    """
+    {"color": ["red"], "size": ["xl"]} (slugs) -> {color_id: [red_id], size_id: [xl_id]} in one query.
+    Returns None when an attribute has none of the requested values, i.e. nothing can match.
+    """
+    ProductAttributeValue, _, _ = _models()
+    if not filters:
+        return {}
+    condition = Q()
+    for attribute_slug, value_slugs in filters.items():
+        condition |= Q(attribute__slug=attribute_slug, slug__in=value_slugs)
+    resolved = {}
+    for value_id, attribute_id in ProductAttributeValue.objects.filter(condition).values_list("id", "attribute_id"):
+        resolved.setdefault(attribute_id, []).append(value_id)
+    if len(resolved) < len(filters):
+        return None
+    return resolved
+
+
+def matching_variants(value_ids_by_attribute, in_stock=False):
+    """Active variants matching every attribute (any of its values). See module docstring."""
+    _, ProductVariant, VariantAttributeValue = _models()
+    if value_ids_by_attribute is None:
+        return ProductVariant.objects.none()
+    variants = ProductVariant.objects.filter(is_active=True)
+    if in_stock:
+        variants = variants.filter(stock_quantity__gt=0)
+    if not value_ids_by_attribute:
+        return variants
+    value_ids = [value_id for ids in value_ids_by_attribute.values() for value_id in ids]
+    hits = (
+        VariantAttributeValue.objects.filter(value_id__in=value_ids)
+        .values("variant_id")
+        .annotate(matched=Count("attribute_id", distinct=True))
+        .filter(matched=len(value_ids_by_attribute))
+        .values("variant_id")
+    )
+    return variants.filter(pk__in=hits)
+
+
+def build_attribute_values(category=None):
+    """
+    Values offered by visible products' active variants in `category`'s subtree
+    (or the whole catalog), with product counts, for filter UIs:
+    [{"name", "slug", "values": [{"value", "slug", "count"}, ...]}, ...]
+    """
+    _, _, VariantAttributeValue = _models()
+    links = VariantAttributeValue.objects.filter(
+        variant__is_active=True,
+        variant__product__status="published",
+        variant__product__is_active=True,
+    )
+    if category is not None:
+        links = links.filter(variant__product__category__ancestor_links__ancestor=category)
+    rows = (
+        links.values("attribute__name", "attribute__slug", "value__value", "value__slug")
+        .annotate(count=Count("variant__product_id", distinct=True))
+        .order_by("attribute__name", "value__value")
+    )
+    attributes = {}
+    for row in rows:
+        attribute = attributes.setdefault(
+            row["attribute__slug"], {"name": row["attribute__name"], "slug": row["attribute__slug"], "values": []}
+        )
+        attribute["values"].append({"value": row["value__value"], "slug": row["value__slug"], "count": row["count"]})
+    return list(attributes.values())
+
+
+def get_attribute_values(category=None):
+    """Cached build_attribute_values(); invalidated by products/signals.py."""
+    key = f"category-{category.pk}" if category is not None else "all"
+    return attribute_cache.get_or_set(key, lambda: build_attribute_values(category))
@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .navigation import get_category_tree, get_tag_index
+
+
+def navigation(request):
+    """
+    Expose `nav_categories` and `nav_tags` to every template.
+    Lazy, so pages that don't render the navigation never touch the cache;
+    async views load it up front with `aload_navigation()`.
+    """
+    loaded = getattr(request, "_navigation", None)
+    if loaded is not None:
+        return loaded
+    return {
+        "nav_categories": SimpleLazyObject(get_category_tree),
+        "nav_tags": SimpleLazyObject(get_tag_index),
+    }
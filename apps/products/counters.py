@@ -0,0 +1,154 @@
+"""
+Buffered engagement counters for Product (views, purchases_count, review_count).
+
+Incrementing a counter only touches a dict in memory. Pending deltas are written
+back periodically as a single UPDATE per flush:
+
+    UPDATE products_product
+       SET views = views + CASE WHEN id = 1 THEN 12 WHEN id = 7 THEN 3 ELSE 0 END, ...
+     WHERE id IN (1, 7)
+
+so a page view never costs a row write, never rewrites the other columns or
+`updated_at`, and concurrent workers can't lose each other's increments.
+If a flush fails, its deltas are put back and retried on the next flush
+(at-least-once totals); a flush that falls due during incr() never turns
+the page view into an error.
+
+Usage:
+    from apps.products.counters import product_counters
+    product_counters.incr(product.pk, "views")
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """
+    In-process buffer of integer counter deltas for one model.
+
+    `flush_interval`: max seconds a delta waits in memory before being written.
+    `max_pending`: flush early once this many rows have pending deltas.
+    `background`: flush from a timer thread when traffic stops, instead of only on the next incr().
+    """
+    def __init__(self, model, fields, flush_interval=10, max_pending=1000, batch_size=500, background=True):
+        self.model = model
+        self.fields = tuple(fields)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.background = background
+        self._pending = defaultdict(lambda: defaultdict(int))  # pk -> field -> delta
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def incr(self, pk, field, amount=1):
+        if self._add(pk, field, amount):
+            self.flush_quietly()
+
+    async def aincr(self, pk, field, amount=1):
+        """incr() for async views: a flush that falls due runs in a thread, off the event loop."""
+        if self._add(pk, field, amount):
+            await sync_to_async(self.flush_quietly)()
+
+    def _add(self, pk, field, amount):
+        """Buffer a delta. True when a flush is due right now."""
+        if field not in self.fields:
+            raise ValueError(f"'{field}' is not a buffered counter of {self.model.__name__}.")
+        with self._lock:
+            self._pending[pk][field] += amount
+            pending_rows = len(self._pending)
+        if pending_rows >= self.max_pending or time.monotonic() - self._last_flush >= self.flush_interval:
+            return True
+        if self.background:
+            self._arm_timer()
+        return False
+
+    def pending(self, pk, field):
+        """Delta not yet written for this row (add it to the DB value for a live total)."""
+        with self._lock:
+            return self._pending.get(pk, {}).get(field, 0)
+
+    def flush(self):
+        """Write every pending delta. Returns the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+                self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                return self._write(batch)
+            except Exception:
+                # Put the deltas back so the next flush retries them.
+                with self._lock:
+                    for pk, deltas in batch.items():
+                        for field, amount in deltas.items():
+                            self._pending[pk][field] += amount
+                logger.exception("Flushing %s counters failed; will retry.", self.model.__name__)
+                raise
+
+    def flush_quietly(self):
+        """flush() for callers that must not fail (requests, timers, exit): errors are logged and retried later."""
+        try:
+            return self.flush()
+        except Exception:
+            return 0
+
+    def _write(self, batch):
+        updated = 0
+        pks = sorted(batch)  # stable lock order across workers
+        with transaction.atomic():
+            for i in range(0, len(pks), self.batch_size):
+                chunk = pks[i:i + self.batch_size]
+                assignments = {}
+                for field in self.fields:
+                    whens = [When(pk=pk, then=Value(batch[pk][field])) for pk in chunk if batch[pk].get(field)]
+                    if whens:
+                        delta = Case(*whens, default=Value(0), output_field=PositiveIntegerField())
+                        assignments[field] = F(field) + delta
+                if assignments:
+                    updated += self.model._default_manager.filter(pk__in=chunk).update(**assignments)
+        return updated
+
+    def _arm_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush_quietly()
+        finally:
+            # The timer thread got its own DB connection; don't leak it.
+            connection.close()
+
+
+product_counters = CounterBuffer(
+    Product,
+    fields=("views", "purchases_count", "review_count"),
+    flush_interval=getattr(settings, "PRODUCT_COUNTER_FLUSH_INTERVAL", 10),
+    max_pending=getattr(settings, "PRODUCT_COUNTER_MAX_PENDING", 1000),
+    background=getattr(settings, "PRODUCT_COUNTER_BACKGROUND_FLUSH", True),
+)
+
+if getattr(settings, "FLUSH_BUFFERS_ON_EXIT", True):
+    atexit.register(product_counters.flush_quietly)
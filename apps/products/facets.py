@@ -0,0 +1,241 @@
+"""
+Facet counts for the product filter sidebar: per category, per tag (grouped by
+Tag.tag_type) and per price band.
+
+Two modes, same output:
+- `compute_facets(queryset)`: live, for any filtered result set. 3 grouped queries.
+- `precomputed_facets(category)`: read from ProductFacetCount, which is kept up
+  to date incrementally by signals (products/signals.py). 3 small grouped queries
+  over the category subtree, independent of the number of products. Only valid
+  when the result set is "visible products in this category subtree" (no tag or
+  price filter on top).
+
+Bulk paths that skip signals (importer, queryset.update()) should end with
+`rebuild_facet_counts()` (or the rebuild_facet_counts command), limited to the
+categories they touched when they know them.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+# (min inclusive, max exclusive); None = open-ended. Changing these requires a rebuild.
+PRICE_BANDS = [
+    (Decimal("0"), Decimal("25")),
+    (Decimal("25"), Decimal("50")),
+    (Decimal("50"), Decimal("100")),
+    (Decimal("100"), Decimal("250")),
+    (Decimal("250"), Decimal("500")),
+    (Decimal("500"), None),
+]
+FACET_STATE_FIELDS = ("status", "is_active", "category_id", "price")
+
+
+def _models():
+    # Imported lazily: models.py imports this module.
+    from .models import Product, ProductFacetCount
+    return Product, ProductFacetCount
+
+
+def price_band(price):
+    """Index in PRICE_BANDS for a price, or None."""
+    if price is None:
+        return None
+    price = Decimal(str(price))
+    for index, (low, high) in enumerate(PRICE_BANDS):
+        if price >= low and (high is None or price < high):
+            return index
+    return None
+
+
+def _band_condition(index):
+    low, high = PRICE_BANDS[index]
+    condition = Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+# ---------------------------------------------------------------------------
+# Output formatting (shared by both modes)
+# ---------------------------------------------------------------------------
+
+def _format(category_rows, tag_rows, band_counts):
+    tags = {}
+    for row in sorted(tag_rows, key=lambda row: (-row["count"], row["tag__name"])):
+        tags.setdefault(row["tag__tag_type"] or "Other", []).append(
+            {"name": row["tag__name"], "slug": row["tag__slug"], "count": row["count"]}
+        )
+    return {
+        "categories": [
+            {"id": row["category_id"], "name": row["category__name"], "slug": row["category__slug"], "count": row["count"]}
+            for row in sorted(category_rows, key=lambda row: (-row["count"], row["category__name"]))
+            if row["count"]
+        ],
+        "tags": tags,
+        "price": [
+            {
+                "band": index,
+                "min": str(low),
+                "max": str(high) if high is not None else None,
+                "count": band_counts.get(index, 0),
+            }
+            for index, (low, high) in enumerate(PRICE_BANDS)
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Live mode
+# ---------------------------------------------------------------------------
+
+def compute_facets(queryset):
+    """Facet counts for an arbitrary Product queryset, in three grouped queries."""
+    Product, _ = _models()
+    queryset = queryset.order_by()
+    category_rows = (
+        queryset.values("category_id", "category__name", "category__slug")
+        .annotate(count=Count("pk"))
+    )
+    tag_rows = (
+        Product.tags.through.objects
+        .filter(product_id__in=queryset.values("pk"))
+        .values("tag_id", "tag__name", "tag__slug", "tag__tag_type")
+        .annotate(count=Count("product_id"))
+    )
+    band_counts = queryset.aggregate(**{
+        f"band_{index}": Count("pk", filter=_band_condition(index))
+        for index in range(len(PRICE_BANDS))
+    })
+    band_counts = {index: band_counts[f"band_{index}"] for index in range(len(PRICE_BANDS))}
+    return _format(list(category_rows), list(tag_rows), band_counts)
+
+
+# ---------------------------------------------------------------------------
+# Precomputed mode
+# ---------------------------------------------------------------------------
+
+def precomputed_facets(category=None):
+    """Facet counts of visible products in `category`'s subtree (or the whole catalog)."""
+    _, ProductFacetCount = _models()
+    rows = ProductFacetCount.objects.filter(count__gt=0)
+    if category is not None:
+        rows = rows.filter(category__ancestor_links__ancestor=category)
+    category_rows = (
+        rows.filter(tag__isnull=True, price_band__isnull=True)
+        .values("category_id", "category__name", "category__slug")
+        .annotate(count=Sum("count"))
+    )
+    tag_rows = (
+        rows.filter(tag__isnull=False)
+        .values("tag_id", "tag__name", "tag__slug", "tag__tag_type")
+        .annotate(count=Sum("count"))
+    )
+    band_rows = rows.filter(price_band__isnull=False).values("price_band").annotate(count=Sum("count"))
+    band_counts = {row["price_band"]: row["count"] for row in band_rows}
+    return _format(list(category_rows), list(tag_rows), band_counts)
+
+
+def facet_state(product):
+    """
+    What a product contributes to the facet table: (category_id, price_band) when it is
+    visible on the storefront, (None, None) when it isn't, or None when the instance was
+    loaded with deferred fields and we can't tell without a query.
+    """
+    values = product.__dict__
+    if any(name not in values for name in FACET_STATE_FIELDS):
+        return None
+    if values["status"] != "published" or not values["is_active"] or values["category_id"] is None:
+        return (None, None)
+    return (values["category_id"], price_band(values["price"]))
+
+
+def load_facet_state(product_id):
+    """facet_state() read from the database, for instances loaded with deferred fields."""
+    Product, _ = _models()
+    row = Product.objects.filter(pk=product_id).values(*FACET_STATE_FIELDS).first()
+    if row is None:
+        return (None, None)
+    if row["status"] != "published" or not row["is_active"]:
+        return (None, None)
+    return (row["category_id"], price_band(row["price"]))
+
+
+def contributions(state, tag_ids, sign=1, tags_only=False):
+    """
+    Counter of facet keys -> delta for one product in `state` with `tag_ids`.
+    `tags_only` leaves out the category total and price band (for tag add/remove).
+    """
+    deltas = Counter()
+    if not state or state[0] is None:
+        return deltas
+    category_id, band = state
+    if not tags_only:
+        deltas[(category_id, None, None)] += sign
+        if band is not None:
+            deltas[(category_id, None, band)] += sign
+    for tag_id in tag_ids:
+        deltas[(category_id, tag_id, None)] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Apply {(category_id, tag_id, price_band): delta} to ProductFacetCount with F() updates."""
+    _, ProductFacetCount = _models()
+    for (category_id, tag_id, band), delta in sorted(deltas.items(), key=lambda item: tuple(-1 if v is None else v for v in item[0])):
+        if not delta:
+            continue
+        rows = ProductFacetCount.objects.filter(
+            category_id=category_id,
+            tag_id=tag_id,  # None -> IS NULL
+            price_band=band,
+        )
+        if rows.update(count=F("count") + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ProductFacetCount.objects.create(category_id=category_id, tag_id=tag_id, price_band=band, count=delta)
+        except IntegrityError:
+            # Someone created the row in between: add to it instead.
+            rows.update(count=F("count") + delta)
+
+
+def rebuild_facet_counts(category_ids=None, batch_size=5000):
+    """
+    Recompute ProductFacetCount from scratch (after bulk imports or queryset.update()).
+    With `category_ids`, only the rows of those categories (their own products, not
+    their subtrees) are recomputed.
+    """
+    Product, ProductFacetCount = _models()
+    visible = Product.objects.published().order_by()
+    existing = ProductFacetCount.objects.all()
+    if category_ids is not None:
+        visible = visible.filter(category_id__in=category_ids)
+        existing = existing.filter(category_id__in=category_ids)
+    band_case = Case(
+        *[When(_band_condition(index), then=Value(index)) for index in range(len(PRICE_BANDS))],
+        default=None,
+        output_field=IntegerField(),
+    )
+    rows = [
+        ProductFacetCount(category_id=row["category_id"], count=row["count"])
+        for row in visible.values("category_id").annotate(count=Count("pk"))
+    ]
+    rows += [
+        ProductFacetCount(category_id=row["category_id"], price_band=row["band"], count=row["count"])
+        for row in visible.annotate(band=band_case).filter(band__isnull=False).values("category_id", "band").annotate(count=Count("pk"))
+    ]
+    rows += [
+        ProductFacetCount(category_id=row["product__category_id"], tag_id=row["tag_id"], count=row["count"])
+        for row in (
+            Product.tags.through.objects
+            .filter(product_id__in=visible.values("pk"))
+            .values("product__category_id", "tag_id")
+            .annotate(count=Count("product_id"))
+        )
+    ]
+    with transaction.atomic():
+        existing.delete()
+        ProductFacetCount.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
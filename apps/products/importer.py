@@ -0,0 +1,358 @@
+"""
+Bulk product import from CSV / JSONL supplier feeds.
+
+The file is streamed in chunks; each chunk costs a fixed number of queries
+whatever its size:
+    1 SELECT   existing products by sku
+    1 SELECT   slug allocation for new products
+    1 INSERT   new products          (bulk_create)
+    1 UPDATE   existing products     (bulk_update)
+    1 SELECT   ids of the chunk's products by sku
+    1 DELETE + 1 INSERT   Product.tags through table
+Categories and tags are resolved by slug from in-memory maps loaded once.
+Rows are upserted on `sku`. A row's tags replace the product's tags only when
+the row names at least one known tag; without a `tags` value (or with only
+unknown slugs) the current tags are kept. A line that is not valid JSON
+counts as a row error, like a row with bad values, and so does a value too
+long for its column. A blank status or flag keeps the default / current value.
+Nothing here calls Product.save(), so per-row signals do not fire: refresh the
+facet counts of `result.category_ids` and the search index of
+`result.product_ids` afterwards (the import_products command does).
+
+Usage:
+    from apps.products.importer import ProductImporter
+    result = ProductImporter(chunk_size=2000).import_file("feed.jsonl")
+    print(result.summary())
+"""
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.common.utils import allocate_unique_slugs
+from .models import Category, Product, Tag
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"invalid decimal {value!r}")
+
+
+def _to_optional_decimal(value):
+    return _to_decimal(value) if value not in (None, "") else None
+
+
+def _to_int(value):
+    return int(value) if value not in (None, "") else 0
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    return value in ("1", "true", "yes", "y") if value else None
+
+
+def _to_str(value):
+    return "" if value is None else str(value).strip()
+
+
+# Feed column -> converter. Anything not listed here is ignored.
+# `sku`, `name`, `price` and `category` (a category slug) are required.
+FIELD_CONVERTERS = {
+    "name": _to_str,
+    "description": _to_str,
+    "price": _to_decimal,
+    "discount_price": _to_optional_decimal,
+    "currency": _to_str,
+    "stock_quantity": _to_int,
+    "barcode": lambda value: _to_str(value) or None,
+    "status": _to_str,
+    "is_active": _to_bool,
+    "is_featured": _to_bool,
+    "is_new": _to_bool,
+    "is_bestseller": _to_bool,
+    "is_on_sale": _to_bool,
+    "meta_title": _to_str,
+    "meta_description": _to_str,
+    "meta_keywords": _to_str,
+}
+REQUIRED_FIELDS = ("sku", "name", "price", "category")
+# A blank cell in these columns keeps the model default / current value.
+KEEP_WHEN_BLANK = ("status", "is_active", "is_featured", "is_new", "is_bestseller", "is_on_sale")
+VALID_STATUSES = {choice for choice, _ in Product._meta.get_field("status").choices}
+# Checked per row: SQLite would store an oversize value, PostgreSQL would fail the whole chunk.
+MAX_LENGTHS = {
+    field: Product._meta.get_field(field).max_length
+    for field in ("sku", *FIELD_CONVERTERS)
+    if getattr(Product._meta.get_field(field), "max_length", None)
+}
+
+
+class MalformedRow:
+    """Yielded by read_rows() for a line it cannot parse, so the import can count it and go on."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(path, file_format=None):
+    """Yield one dict per product from a .csv or .jsonl file, without loading it all."""
+    path = Path(path)
+    file_format = (file_format or path.suffix.lstrip(".")).lower()
+    with path.open(newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            yield from csv.DictReader(handle)
+        elif file_format in ("jsonl", "ndjson"):
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield MalformedRow(f"invalid JSON ({exc})")
+                    continue
+                yield row if isinstance(row, dict) else MalformedRow("expected a JSON object")
+        else:
+            raise ValueError(f"Unsupported import format '{file_format}' (expected csv or jsonl).")
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _split_tags(value):
+    """Tags come as a list (JSONL) or a "red|xl" / "red,xl" string (CSV)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace("|", ",").split(",")
+    return [slug.strip() for slug in value if slug and slug.strip()]
+
+
+def peak_memory_mb():
+    """Process memory high-water mark in MB (None where `resource` is unavailable)."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class ImportResult:
+    """Counters collected while importing a feed."""
+    max_errors_kept = 50
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.unknown_tags = set()
+        self.product_ids = set()  # created or updated
+        self.category_ids = set()  # categories those products are in, or were moved out of
+        self.errors = []  # first `max_errors_kept` "(line) message" strings
+        self.elapsed = 0.0
+        self.peak_memory_mb = None
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def add_error(self, line_number, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors_kept:
+            self.errors.append(f"row {line_number}: {message}")
+
+    def summary(self):
+        return (
+            f"{self.rows} rows in {self.elapsed:.1f}s ({self.rows_per_second} rows/sec): "
+            f"{self.created} created, {self.updated} updated, {self.skipped} skipped. "
+            f"Peak memory: {self.peak_memory_mb} MB."
+        )
+
+
+class ProductImporter:
+    """Streams a product feed into the database in chunks, upserting on sku."""
+
+    def __init__(self, chunk_size=1000, update_existing=True):
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+        self.category_ids = {}
+        self.tag_ids = {}
+
+    def import_file(self, path, file_format=None):
+        return self.import_rows(read_rows(path, file_format))
+
+    def import_rows(self, rows):
+        """Import an iterable of row dicts; returns an ImportResult."""
+        result = ImportResult()
+        started = time.perf_counter()
+
+        # In-memory slug -> id maps, loaded once for the whole run.
+        self.category_ids = dict(Category.objects.values_list("slug", "id"))
+        self.tag_ids = dict(Tag.objects.values_list("slug", "id"))
+
+        line_number = 0
+        for chunk in _chunked(rows, self.chunk_size):
+            parsed = []
+            for row in chunk:
+                line_number += 1
+                result.rows += 1
+                try:
+                    if isinstance(row, MalformedRow):
+                        raise ValueError(row.message)
+                    parsed.append(self.parse_row(row, result))
+                except (KeyError, ValueError) as exc:
+                    result.add_error(line_number, str(exc))
+            if parsed:
+                self.write_chunk(parsed, result)
+
+        result.elapsed = time.perf_counter() - started
+        result.peak_memory_mb = peak_memory_mb()
+        return result
+
+    def parse_row(self, row, result):
+        """
+        Convert one raw row into (sku, field values, tag ids). Raises ValueError on bad data.
+        Tag ids are None when the row has no known tags: the product keeps the ones it has.
+        """
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+
+        category_slug = _to_str(row["category"])
+        if category_slug not in self.category_ids:
+            raise ValueError(f"unknown category '{category_slug}'")
+
+        sku = _to_str(row["sku"])
+        values = {
+            field: converter(row[field])
+            for field, converter in FIELD_CONVERTERS.items()
+            if field in row and row[field] is not None
+        }
+        for field in KEEP_WHEN_BLANK:
+            if values.get(field, True) in ("", None):
+                del values[field]
+        for field, value in (("sku", sku), *values.items()):
+            if field in MAX_LENGTHS and isinstance(value, str) and len(value) > MAX_LENGTHS[field]:
+                raise ValueError(f"{field} is longer than {MAX_LENGTHS[field]} characters")
+        if "status" in values and values["status"] not in VALID_STATUSES:
+            raise ValueError(f"invalid status '{values['status']}'")
+        if "stock_quantity" in values:
+            if values["stock_quantity"] < 0:
+                raise ValueError("stock_quantity cannot be negative")
+            # Same rule as Product.save()
+            values["is_in_stock"] = values["stock_quantity"] > 0
+        values["category_id"] = self.category_ids[category_slug]
+
+        tag_ids = []
+        for slug in _split_tags(row.get("tags")):
+            if slug in self.tag_ids:
+                tag_ids.append(self.tag_ids[slug])
+            else:
+                result.unknown_tags.add(slug)
+        return sku, values, tag_ids or None
+
+    @transaction.atomic
+    def write_chunk(self, parsed, result):
+        # Last occurrence of a sku within a chunk wins.
+        by_sku = {sku: (values, tag_ids) for sku, values, tag_ids in parsed}
+        existing = {
+            product.sku: product
+            # Full rows (no .only()): bulk_update reads every updated field, and deferred
+            # fields would cost a query per product.
+            for product in Product.objects.filter(sku__in=by_sku)
+        }
+
+        new_skus = [sku for sku in by_sku if sku not in existing]
+        to_create = self.create_products(new_skus, by_sku)
+        result.created += len(to_create)
+        result.category_ids.update(product.category_id for product in to_create)
+        if any(product.pk is None for product in to_create):
+            # Backends that can't return ids from a bulk INSERT (MySQL)
+            result.product_ids.update(Product.objects.filter(sku__in=new_skus).values_list("pk", flat=True))
+        else:
+            result.product_ids.update(product.pk for product in to_create)
+
+        synced_skus = list(new_skus)
+        if self.update_existing and existing:
+            now = timezone.now()
+            update_fields = set()
+            for sku, product in existing.items():
+                result.category_ids.add(product.category_id)  # before a move, too
+                values = by_sku[sku][0]
+                for field, value in values.items():
+                    setattr(product, field, value)
+                # bulk_update() skips auto_now, so set it by hand.
+                product.updated_at = now
+                update_fields.update(values)
+                result.category_ids.add(product.category_id)
+                result.product_ids.add(product.pk)
+            update_fields.add("updated_at")
+            Product.objects.bulk_update(existing.values(), sorted(update_fields), batch_size=self.chunk_size)
+            result.updated += len(existing)
+            synced_skus += list(existing)
+        elif existing:
+            result.skipped += len(existing)
+
+        self.write_tags(by_sku, synced_skus)
+
+    def create_products(self, skus, by_sku):
+        """
+        bulk_create the new products. Like UniqueSlugMixin, a slug taken by another
+        writer since it was allocated gets the INSERT retried with fresh slugs.
+        """
+        if not skus:
+            return []
+        for attempt in range(1, Product.slug_save_attempts + 1):
+            slugs = allocate_unique_slugs(Product, [by_sku[sku][0]["name"] for sku in skus])
+            products = []
+            for sku, slug in zip(skus, slugs):
+                product = Product(sku=sku, slug=slug, **by_sku[sku][0])
+                product.is_in_stock = product.stock_quantity > 0
+                products.append(product)
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(products, batch_size=self.chunk_size)
+                return products
+            except IntegrityError:
+                # Anything but a lost slug race (e.g. a duplicate barcode) is a real error.
+                slug_taken = Product.objects.filter(slug__in=slugs).exists()
+                if attempt == Product.slug_save_attempts or not slug_taken:
+                    raise
+
+    def write_tags(self, by_sku, skus):
+        """
+        Replace the tags of the given products that have tags in the feed, with two
+        statements on the through table. The others keep their tags.
+        """
+        skus = [sku for sku in skus if by_sku[sku][1] is not None]
+        if not skus:
+            return
+        Through = Product.tags.through
+        product_ids = dict(Product.objects.filter(sku__in=skus).values_list("sku", "id"))
+        Through.objects.filter(product_id__in=product_ids.values()).delete()
+        links = [
+            Through(product_id=product_ids[sku], tag_id=tag_id)
+            for sku in skus
+            for tag_id in set(by_sku[sku][1])
+        ]
+        Through.objects.bulk_create(links, batch_size=self.chunk_size, ignore_conflicts=True)
@@ -0,0 +1,192 @@
+"""
+Stock reservations for checkout.
+
+    reference = reserve({product_id: quantity, ...})  # hold the stock while the customer pays
+    commit(reference)                                  # paid: the stock stays gone
+    release(reference)                                 # cancelled: the stock goes back
+    reap_expired()                                     # holds nobody settled in time (reap_reservations)
+
+Stock is never read into Python, changed and saved back (which is how two
+checkouts that both loaded stock_quantity=1 both sold it). Every change is one
+conditional UPDATE:
+
+    UPDATE products_product
+       SET is_in_stock = CASE WHEN stock_quantity > 2 THEN true ELSE false END,
+           stock_quantity = stock_quantity - 2
+     WHERE id = 7 AND stock_quantity >= 2
+
+No matching row means not enough stock, and the whole reservation rolls back.
+is_in_stock is set by the same statement, from the pre-update value (that is
+what PostgreSQL and SQLite use on the right-hand side; MySQL applies SET
+clauses left to right, hence is_in_stock comes first).
+
+Locking: the products of a reservation are updated in ascending id order, and
+stock is given back in the same order (after SELECT ... FOR UPDATE on
+backends that have it). Every row lock is held until commit, so two carts
+sharing products queue behind each other instead of deadlocking. SQLite has
+a single writer; the first write of a transaction waits for it.
+
+One reserve() per reference: release, reap and commit always act on every
+held item of a reference. Product.save() still writes whatever stock_quantity
+the instance holds; change stock with adjust_stock() outside of forms.
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available  # None: no such product
+        super().__init__(f"Product {product_id}: {requested} requested, {available} available.")
+
+
+class ReservationNotHeld(Exception):
+    """commit() of a reference with nothing held (released, expired or already committed)."""
+
+
+def _take(product_id, quantity):
+    """Remove `quantity` from a product's stock if it has that much. True on success."""
+    return bool(
+        Product.objects.filter(pk=product_id, stock_quantity__gte=quantity).update(
+            # is_in_stock first, see the module docstring
+            is_in_stock=Case(When(stock_quantity__gt=quantity, then=Value(True)), default=Value(False)),
+            stock_quantity=F("stock_quantity") - quantity,
+        )
+    )
+
+
+def _restock(quantities):
+    """Give back {product_id: quantity} with one UPDATE, rows locked in id order."""
+    product_ids = sorted(pk for pk, quantity in quantities.items() if quantity)
+    if not product_ids:
+        return
+    if connection.features.has_select_for_update:
+        list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk").values_list("pk"))
+    Product.objects.filter(pk__in=product_ids).update(
+        stock_quantity=F("stock_quantity") + Case(
+            *[When(pk=pk, then=Value(quantities[pk])) for pk in product_ids],
+            default=Value(0),
+            output_field=PositiveIntegerField(),
+        ),
+        is_in_stock=Value(True),
+    )
+
+
+def reserve(items, reference=None, ttl=None):
+    """
+    Hold stock for every item, or for none of them.
+
+    `items`: {product_id: quantity} or [(product_id, quantity), ...] (repeats are added up).
+    `ttl`: seconds until the hold expires (default INVENTORY_RESERVATION_TTL).
+    Returns the reference (a new one unless given). Raises InsufficientStock.
+    """
+    if isinstance(items, dict):
+        items = items.items()
+    quantities = defaultdict(int)
+    for product_id, quantity in items:
+        if quantity <= 0:
+            raise ValueError(f"Product {product_id}: quantity must be positive, got {quantity}.")
+        quantities[product_id] += quantity
+    if not quantities:
+        raise ValueError("Nothing to reserve.")
+
+    reference = reference or uuid.uuid4().hex
+    ttl = ttl if ttl is not None else getattr(settings, "INVENTORY_RESERVATION_TTL", 900)
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    with transaction.atomic():
+        for product_id in sorted(quantities):  # the same lock order for every transaction
+            if not _take(product_id, quantities[product_id]):
+                available = Product.objects.filter(pk=product_id).values_list("stock_quantity", flat=True).first()
+                raise InsufficientStock(product_id, quantities[product_id], available)
+        StockReservation.objects.bulk_create(
+            StockReservation(reference=reference, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in quantities.items()
+        )
+    return reference
+
+
+def commit(reference):
+    """Turn the held items of `reference` into sales. Returns their number; raises ReservationNotHeld."""
+    committed = StockReservation.objects.filter(reference=reference, status=StockReservation.STATUS_HELD).update(
+        status=StockReservation.STATUS_COMMITTED, closed_at=timezone.now()
+    )
+    if not committed:
+        raise ReservationNotHeld(reference)
+    return committed
+
+
+def _close(held, status):
+    """
+    Close the `held` reservations (whole references) as `status` and give their
+    stock back. Must run inside a transaction. Returns the number closed.
+    """
+    now = timezone.now()
+    held = held.filter(status=StockReservation.STATUS_HELD).order_by("pk")
+    if connection.features.has_select_for_update_skip_locked:
+        # Rows another transaction is settling right now are its business.
+        held = held.select_for_update(skip_locked=True)
+    references = {reference for reference, in held.values_list("reference")}
+    if not references:
+        return 0
+    closing = StockReservation.objects.filter(reference__in=references, status=StockReservation.STATUS_HELD)
+    # Only rows still held change: without row locks (SQLite) a commit may have won the race.
+    closed_ids = list(closing.values_list("pk", flat=True))
+    StockReservation.objects.filter(pk__in=closed_ids, status=StockReservation.STATUS_HELD).update(
+        status=status, closed_at=now
+    )
+    quantities = defaultdict(int)
+    closed = 0
+    for product_id, quantity in StockReservation.objects.filter(
+        pk__in=closed_ids, status=status, closed_at=now
+    ).values_list("product_id", "quantity"):
+        quantities[product_id] += quantity
+        closed += 1
+    _restock(quantities)
+    return closed
+
+
+def release(reference):
+    """Give back the stock held for `reference` (cancelled checkout). Returns the items released."""
+    with transaction.atomic():
+        return _close(StockReservation.objects.filter(reference=reference), StockReservation.STATUS_RELEASED)
+
+
+def reap_expired(batch_size=None):
+    """
+    Give back the stock of expired holds, `batch_size` references' worth of
+    items per transaction, until none are left. Returns the items expired.
+    """
+    batch_size = batch_size or getattr(settings, "INVENTORY_REAP_BATCH_SIZE", 500)
+    total = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.filter(
+                status=StockReservation.STATUS_HELD, expires_at__lte=timezone.now()
+            ).order_by("expires_at", "pk")
+            ids = list(expired.values_list("pk", flat=True)[:batch_size])
+            closed = _close(StockReservation.objects.filter(pk__in=ids), StockReservation.STATUS_EXPIRED) if ids else 0
+        total += closed
+        if not closed:
+            return total
+
+
+def adjust_stock(product_id, delta):
+    """
+    Add `delta` units (restock) or remove -delta units (write-off) without
+    reading the stock first. False if removing would go below zero.
+    """
+    if delta >= 0:
+        with transaction.atomic():
+            _restock({product_id: delta})
+        return True
+    return _take(product_id, -delta)
@@ -0,0 +1,99 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.products.models import Category, Product
+
+BENCH_EMAIL = "bench-admin@example.com"
+BENCH_SKU = "BENCH-{}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the product and category admin changelists with ADMIN_PERFORMANCE_MODE off and on. "
+        "--seed N first fills the products table with synthetic BENCH-* products (kept for reruns)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Have at least this many products in the table.")
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--skip-slow", action="store_true", help="Only run performance mode.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"], options["batch_size"])
+
+        User = get_user_model()
+        admin_user, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"is_staff": True, "is_superuser": True})
+        category = Category.objects.order_by("pk").first()
+        pages = {
+            "products": "/admin/products/product/",
+            "products p.50": "/admin/products/product/?p=50",
+            "products status": "/admin/products/product/?status__exact=published",
+            "categories": "/admin/products/category/",
+        }
+        if category is not None:
+            pages["products category"] = f"/admin/products/product/?category__id__exact={category.pk}"
+        modes = [True] if options["skip_slow"] else [False, True]
+        try:
+            for performance_mode in modes:
+                self.stdout.write(f"ADMIN_PERFORMANCE_MODE = {performance_mode}")
+                with override_settings(
+                    ADMIN_PERFORMANCE_MODE=performance_mode, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+                ):
+                    client = Client()
+                    client.force_login(admin_user)
+                    for name, url in pages.items():
+                        self.run_page(client, name, url, options["iterations"])
+        finally:
+            admin_user.delete()
+
+    def run_page(self, client, name, url, iterations):
+        client.get(url)  # warm-up
+        timings = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            self.stderr.write(f"  {name}: HTTP {response.status_code}")
+            return
+        self.stdout.write(
+            f"  {name:>18}: median {statistics.median(timings):8.1f} ms, max {max(timings):8.1f} ms, {len(queries)} queries"
+        )
+
+    def seed(self, total, batch_size):
+        existing = Product.objects.count()
+        if existing >= total:
+            return
+        categories = list(Category.objects.values_list("pk", flat=True)) or [Category.objects.create(name="Bench").pk]
+        start = Product.objects.filter(sku__startswith="BENCH-").count()
+        self.stdout.write(f"Seeding {total - existing} products...")
+        started = time.perf_counter()
+        for offset in range(start, start + total - existing, batch_size):
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f"Bench product {i}", slug=f"bench-product-{i}", sku=BENCH_SKU.format(i),
+                        price=Decimal(i % 500 + 1), stock_quantity=i % 20, category_id=categories[i % len(categories)],
+                        status="published" if i % 3 else "draft",
+                    )
+                    for i in range(offset, min(offset + batch_size, start + total - existing))
+                ],
+                batch_size=batch_size,
+            )
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+            elif connection.vendor == "postgresql":
+                cursor.execute(f"ANALYZE {Product._meta.db_table}")
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s (run rebuild_facet_counts / rebuild_search_index if you need them).")
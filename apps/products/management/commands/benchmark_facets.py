@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.products.facets import compute_facets, precomputed_facets
+from apps.products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Compare live facet computation with the precomputed ProductFacetCount table on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", help="Category slug to scope the result set to (default: whole catalog).")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        category = None
+        queryset = Product.objects.published()
+        if options["category"]:
+            category = Category.objects.filter(slug=options["category"]).first()
+            if category is None:
+                raise CommandError(f"Unknown category '{options['category']}'.")
+            queryset = queryset.filter(category__ancestor_links__ancestor=category)
+
+        modes = {
+            "live": lambda: compute_facets(queryset),
+            "precomputed": lambda: precomputed_facets(category),
+        }
+        results = {}
+        for name, run in modes.items():
+            with CaptureQueriesContext(connection) as queries:
+                results[name] = run()
+            timings = []
+            for _ in range(options["iterations"]):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:>12}: median {statistics.median(timings):8.2f} ms, "
+                f"max {max(timings):8.2f} ms, {len(queries)} queries"
+            )
+
+        if results["live"] != results["precomputed"]:
+            self.stderr.write(self.style.WARNING(
+                "Live and precomputed facets differ; run rebuild_facet_counts if products were bulk-loaded."
+            ))
@@ -0,0 +1,32 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from apps.products.inventory import reap_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Give the stock of expired reservations back to their products. "
+        "Runs once, or every --interval seconds with --loop (run it from cron otherwise)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Reservations per transaction (default: INVENTORY_REAP_BATCH_SIZE).")
+        parser.add_argument("--loop", action="store_true", help="Keep running until interrupted.")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between passes with --loop.")
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            self.stdout.write(f"Expired {reap_expired(options['batch_size'])} reservations.")
+            return
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+        while not stop.is_set():
+            expired = reap_expired(options["batch_size"])
+            if expired:
+                self.stdout.write(f"Expired {expired} reservations.")
+            stop.wait(options["interval"])
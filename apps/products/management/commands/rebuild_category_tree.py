@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.tree import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CategoryClosure table from Category.parent (run after bulk imports that skip save())."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT batch.")
+
+    def handle(self, *args, **options):
+        count = rebuild_closure(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt category tree for {count} categories."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed ProductFacetCount table (run after bulk imports or queryset.update())."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT batch.")
+
+    def handle(self, *args, **options):
+        count = rebuild_facet_counts(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} facet count rows."))
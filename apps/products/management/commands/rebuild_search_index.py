@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.search import get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from all published, active products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Products indexed per batch.")
+
+    def handle(self, *args, **options):
+        if not get_backend().has_index:
+            self.stdout.write(self.style.WARNING("This database has no full-text index support; nothing to rebuild."))
+            return
+        count = rebuild_search_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
@@ -0,0 +1,167 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(blank=True, max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(blank=True, max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.ImageField(blank=True, help_text='Category banner or icon', null=True, upload_to='categories/')),
+                ('is_active', models.BooleanField(default=True)),
+                ('meta_title', models.CharField(blank=True, max_length=255)),
+                ('meta_description', models.TextField(blank=True)),
+                ('meta_keywords', models.CharField(blank=True, max_length=255)),
+                ('position', models.PositiveIntegerField(default=0, help_text='Manual sort order')),
+                ('featured', models.BooleanField(default=False, help_text='Highlight this category on homepage')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='products.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Categories',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(blank=True, max_length=200, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('currency', models.CharField(default='USD', max_length=10)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('is_in_stock', models.BooleanField(default=True)),
+                ('sku', models.CharField(max_length=50, unique=True)),
+                ('barcode', models.CharField(blank=True, max_length=100, null=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('purchases_count', models.PositiveIntegerField(default=0)),
+                ('rating', models.PositiveIntegerField(default=5, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('is_new', models.BooleanField(default=False)),
+                ('is_bestseller', models.BooleanField(default=False)),
+                ('is_on_sale', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('published', 'Published'), ('archived', 'Archived')], default='draft', max_length=20)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='products/')),
+                ('is_active', models.BooleanField(default=True)),
+                ('meta_title', models.CharField(blank=True, max_length=255)),
+                ('meta_description', models.TextField(blank=True)),
+                ('meta_keywords', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='products.category')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_products', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='updated_products', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Products',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductAttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=100)),
+                ('attribute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='products.productattribute')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='products/gallery/')),
+                ('alt_text', models.CharField(blank=True, max_length=255)),
+                ('caption', models.CharField(blank=True, max_length=255)),
+                ('is_default', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='products.product')),
+            ],
+            options={
+                'ordering': ['-is_default', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(blank=True, unique=True)),
+                ('tag_type', models.CharField(blank=True, help_text='Optional: e.g., Color, Size, Feature', max_length=50)),
+                ('meta_title', models.CharField(blank=True, max_length=255)),
+                ('meta_keywords', models.CharField(blank=True, max_length=255)),
+                ('meta_description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Tags',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['slug'], name='products_ta_slug_d1be68_idx'), models.Index(fields=['created_at'], name='products_ta_created_e8384b_idx'), models.Index(fields=['name'], name='products_ta_name_47ebf2_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='products', to='products.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['slug'], name='products_ca_slug_da4386_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['created_at'], name='products_ca_created_c2504d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name'], name='products_ca_name_693421_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['is_active'], name='products_ca_is_acti_a2d000_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['slug'], name='products_pr_slug_3edc0c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at'], name='products_pr_created_52f0d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name'], name='products_pr_name_9ff0a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active'], name='products_pr_is_acti_ca4d9a_idx'),
+        ),
+    ]
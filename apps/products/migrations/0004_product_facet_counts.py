@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_band', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='products.category')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='products.tag')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('price_band__isnull', True), ('tag__isnull', True)), fields=('category',), name='unique_facet_category_total'), models.UniqueConstraint(condition=models.Q(('tag__isnull', False)), fields=('category', 'tag'), name='unique_facet_category_tag'), models.UniqueConstraint(condition=models.Q(('price_band__isnull', False)), fields=('category', 'price_band'), name='unique_facet_category_price_band')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Creates the backend-specific full-text search tables (see apps/products/search.py).
+# Existing products are not indexed here: run `manage.py rebuild_search_index` after migrating.
+# The DDL is frozen here rather than taken from search.py, so later changes there don't
+# change what this migration does.
+
+from django.db import migrations
+
+CREATE_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_search "
+        "USING fts5(name, keywords, categories, description, tokenize='porter unicode61')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_search_names "
+        "USING fts5(name, tokenize='unicode61', prefix='2 3')",
+    ],
+    'postgresql': [
+        # No foreign key to products_product: it would make TRUNCATE of the product table
+        # (flush, TransactionTestCase) fail. Deleted products are removed by signals, and
+        # results are loaded as published products, so a leftover row never shows.
+        "CREATE TABLE IF NOT EXISTS products_search ("
+        " product_id bigint PRIMARY KEY,"
+        " document tsvector NOT NULL,"
+        " name_document tsvector)",
+        "CREATE INDEX IF NOT EXISTS products_search_document_gin ON products_search USING GIN (document)",
+        "CREATE INDEX IF NOT EXISTS products_search_name_gin ON products_search USING GIN (name_document)",
+    ],
+}
+DROP_SQL = {
+    'sqlite': [
+        "DROP TABLE IF EXISTS products_search",
+        "DROP TABLE IF EXISTS products_search_names",
+    ],
+    'postgresql': [
+        "DROP TABLE IF EXISTS products_search",
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases have no index (search falls back to icontains).
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_facet_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def populate_value_slugs(apps, schema_editor):
+    ProductAttributeValue = apps.get_model('products', 'ProductAttributeValue')
+    taken = set()
+    values = list(ProductAttributeValue.objects.order_by('attribute_id', 'id'))
+    for value in values:
+        base = slugify(value.value)[:90] or 'value'
+        slug, n = base, 2
+        while (value.attribute_id, slug) in taken:
+            slug, n = f'{base}-{n}', n + 1
+        taken.add((value.attribute_id, slug))
+        value.slug = slug
+    ProductAttributeValue.objects.bulk_update(values, ['slug'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=50, unique=True)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VariantAttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='productattributevalue',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(populate_value_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productattributevalue',
+            constraint=models.UniqueConstraint(fields=('attribute', 'slug'), name='unique_attribute_value_slug'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='products.product'),
+        ),
+        migrations.AddField(
+            model_name='variantattributevalue',
+            name='attribute',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variant_links', to='products.productattribute'),
+        ),
+        migrations.AddField(
+            model_name='variantattributevalue',
+            name='value',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variant_links', to='products.productattributevalue'),
+        ),
+        migrations.AddField(
+            model_name='variantattributevalue',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_links', to='products.productvariant'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='attribute_values',
+            field=models.ManyToManyField(blank=True, related_name='variants', through='products.VariantAttributeValue', to='products.productattributevalue'),
+        ),
+        migrations.AddIndex(
+            model_name='variantattributevalue',
+            index=models.Index(fields=['value', 'variant'], name='products_va_value_i_8f118f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='variantattributevalue',
+            constraint=models.UniqueConstraint(fields=('variant', 'attribute'), name='unique_variant_attribute'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'is_active'], name='products_pr_product_66459e_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
 from django.urls import reverse
 from django.conf import settings
 from django.utils import timezone
@@ -6,11 +7,31 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 import uuid
 
-from common.utils import generate_unique_slug, generate_uuid
+from apps.common.models import UniqueSlugMixin
+from apps.common.utils import generate_uuid
+from . import attributes, facets, tree
 # Create your models here.
 USER = settings.AUTH_USER_MODEL
 
-class Category(models.Model):
+
+class CategoryQuerySet(models.QuerySet):
+    def with_subtree_product_counts(self, published_only=True):
+        """
+        Annotate `subtree_product_count`: products in each category *and all its descendants*.
+        One query for the whole result set, via the closure table.
+        """
+        product_filter = Q()
+        if published_only:
+            product_filter = Q(
+                descendant_links__descendant__products__is_active=True,
+                descendant_links__descendant__products__status="published",
+            )
+        return self.annotate(
+            subtree_product_count=Count("descendant_links__descendant__products", filter=product_filter)
+        )
+
+
+class Category(UniqueSlugMixin, models.Model):
     """Product Category Model wiht Parent-child relationship.
     Represents a product category with support for:
     - Parent-child hierarchy (e.g., Electronics → Mobiles → Smartphones)
@@ -40,6 +61,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         # Proper plural name for django admin interfaces
         verbose_name_plural = 'Categories'
@@ -59,15 +82,51 @@ class Category(models.Model):
         Returns the category name.
         """
         return self.name
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Remember the parent/name we were loaded with so save() and signals can tell a
+        # move or rename from a plain edit. Read from __dict__ so deferred fields stay
+        # deferred (DEFERRED = unknown, looked up on save).
+        self._original_parent_id = self.__dict__.get('parent_id', models.DEFERRED)
+        self._original_name = self.__dict__.get('name', models.DEFERRED)
+
     def save(self, *args, **kwargs):
         """
-        Override save method to auto-generate slug if not provided.
-        Uses a helper function `generate_unique_slug` to ensure uniqueness.
+        Override save method to keep the CategoryClosure table in sync when a category
+        is created or moved. An empty slug is generated from `name` by UniqueSlugMixin.
         """
-        if not self.slug:
-            self.slug = generate_unique_slug(Category, self.name, slug_field='slug')
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        if not adding and models.DEFERRED in (self._original_parent_id, self._original_name):
+            self._original_parent_id, self._original_name = (
+                Category.objects.filter(pk=self.pk).values_list('parent_id', 'name').first() or (None, None)
+            )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                tree.insert_node(self)
+            elif self.parent_id != self._original_parent_id:
+                tree.move_node(self, self._original_parent_id)
+        self._original_parent_id = self.parent_id
+        self._original_name = self.name
+
+    def get_ancestors(self, include_self=False):
+        """Breadcrumb trail from the root down to this category, in one query."""
+        queryset = Category.objects.filter(descendant_links__descendant=self)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset.order_by('-descendant_links__depth')
+
+    def get_descendants(self, include_self=False):
+        """Every category below this one (any depth), in one query."""
+        queryset = Category.objects.filter(ancestor_links__ancestor=self)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def get_subtree_products(self):
+        """All products in this category and its descendants, as a single join."""
+        return Product.objects.filter(category__ancestor_links__ancestor=self)
     def get_absolute_url(self):
         """
         Returns the URL for this category instance.
@@ -77,7 +136,30 @@ class Category(models.Model):
         """
         return reverse('category_detail', kwargs={'slug': self.slug})
     
-class Tag(models.Model):
+class CategoryClosure(models.Model):
+    """
+    Closure table for the Category tree: one row per (ancestor, descendant) pair,
+    including a depth-0 row from each category to itself.
+    Maintained by Category.save() (see products/tree.py); never edit by hand.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField(help_text="Distance between ancestor and descendant (0 = same node)")
+
+    class Meta:
+        verbose_name_plural = 'Category closure'
+        constraints = [
+            # Also serves "all descendants of X" lookups (leading column = ancestor)
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_category_closure_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth']), # breadcrumbs / ancestor lookups
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+class Tag(UniqueSlugMixin, models.Model):
     """Product Tag Model.
     Represents a tag that can be associated with products.
     Tags are used for categorization and filtering products."""
@@ -104,15 +186,28 @@ class Tag(models.Model):
     def __str__(self):
         """String representation for admin panel and shell."""
         return self.name
-    
-    def save(self, *args, **kwargs):
-        """Override save method to auto-generate slug if not provided.
-        Uses a helper function `generate_unique_slug` to ensure uniqueness."""
-        if not self.slug:
-            self.slug = generate_unique_slug(Tag, self.name, slug_field='slug')
-        super().save(*args, **kwargs)
 
-class Product(models.Model):
+
+# Rows the storefront may show. Partial indexes on Product are built on this condition,
+# so storefront queries must filter on exactly these values (use Product.objects.published()).
+STOREFRONT_VISIBLE = Q(status="published", is_active=True)
+
+
+class ProductQuerySet(models.QuerySet):
+    def published(self):
+        """Products visible on the storefront."""
+        return self.filter(STOREFRONT_VISIBLE)
+
+    def with_attributes(self, value_ids_by_attribute, in_stock=False):
+        """
+        Products having at least one active variant that matches every attribute,
+        e.g. {color_id: [red_id, blue_id], size_id: [xl_id]} = (Red OR Blue) AND XL.
+        Resolve slugs to ids with `attributes.resolve_attribute_filters()`.
+        """
+        return self.filter(pk__in=attributes.matching_variants(value_ids_by_attribute, in_stock=in_stock).values('product_id'))
+
+
+class Product(UniqueSlugMixin, models.Model):
     """Product Model.
     Represents a product with:
     - Name, description, price, stock quantity
@@ -172,27 +267,56 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Products'
         ordering = ['name']
+        # Storefront queries always filter on STOREFRONT_VISIBLE, so most indexes are
+        # partial: they only contain published/active rows and stay small.
+        # Every sort key is followed by `id` so keyset pagination is index-only ordered.
+        # `slug` needs no extra index: unique=True already creates one.
         indexes = [
-            models.Index(fields=['slug']),
+            # admin changelist sorting (all rows)
             models.Index(fields=['created_at']),
             models.Index(fields=['name']),
-            models.Index(fields=['is_active']),
+            # admin changelist filtered by category, newest first (ProductAdmin.ordering)
+            models.Index(fields=['category', '-created_at', '-id'], name='product_admin_cat_newest_idx'),
+            # whole-catalog listings
+            models.Index(fields=['-created_at', '-id'], condition=STOREFRONT_VISIBLE, name='product_newest_idx'),
+            models.Index(fields=['name', 'id'], condition=STOREFRONT_VISIBLE, name='product_name_idx'),
+            models.Index(fields=['price', 'id'], condition=STOREFRONT_VISIBLE, name='product_price_idx'),
+            models.Index(fields=['-purchases_count', '-id'], condition=STOREFRONT_VISIBLE, name='product_bestselling_idx'),
+            # category listings: category_id = ? ORDER BY <sort key>
+            models.Index(fields=['category', '-created_at', '-id'], condition=STOREFRONT_VISIBLE, name='product_cat_newest_idx'),
+            models.Index(fields=['category', 'name', 'id'], condition=STOREFRONT_VISIBLE, name='product_cat_name_idx'),
+            models.Index(fields=['category', 'price', 'id'], condition=STOREFRONT_VISIBLE, name='product_cat_price_idx'),
+            models.Index(fields=['category', '-purchases_count', '-id'], condition=STOREFRONT_VISIBLE, name='product_cat_bestselling_idx'),
+            # promotion rails (homepage "featured", "on sale", "bestsellers"), newest first
+            models.Index(fields=['-created_at', '-id'], condition=STOREFRONT_VISIBLE & Q(is_featured=True), name='product_featured_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=STOREFRONT_VISIBLE & Q(is_on_sale=True), name='product_on_sale_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=STOREFRONT_VISIBLE & Q(is_bestseller=True), name='product_bestseller_idx'),
         ]
     
     def __str__(self):
         """String representation for admin panel and shell."""
         return self.name
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (visible, category_id, price_band) as loaded, so facet counts can be moved on save.
+        self._facet_state = facets.facet_state(self)
+
     def save(self, *args, **kwargs):
-        """Override save method to auto-generate slug if not provided.
-        Uses a helper function `generate_unique_slug` to ensure uniqueness."""
+        """Override save method to keep `is_in_stock` in line with `stock_quantity`.
+        An empty slug is generated from `name` by UniqueSlugMixin.
+        The pre-save facet state is kept for the post_save facet-count receiver."""
         self.is_in_stock = self.stock_quantity > 0
-        if not self.slug:
-            self.slug = generate_unique_slug(Product, self.name, slug_field="slug")
+        if self._facet_state is None and not self._state.adding:
+            # Loaded with deferred fields: read the old facet state before overwriting it.
+            self._facet_state = facets.load_facet_state(self.pk)
         super().save(*args, **kwargs)
+        self._facet_state = facets.facet_state(self)
     
     def get_code(self):
         return slugify(self.name)[:3].upper()
@@ -204,6 +328,29 @@ class Product(models.Model):
     
 
 
+class ProductFacetCount(models.Model):
+    """
+    Precomputed facet counts of storefront-visible products, per category.
+    One row per category with both `tag` and `price_band` empty holds the category total;
+    other rows hold the count for one tag or one price band (see products/facets.py).
+    Maintained incrementally by signals; `rebuild_facet_counts` recomputes it from scratch.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facet_counts')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=True, blank=True, related_name='facet_counts')
+    price_band = models.PositiveSmallIntegerField(null=True, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category'], condition=Q(tag__isnull=True, price_band__isnull=True), name='unique_facet_category_total'),
+            models.UniqueConstraint(fields=['category', 'tag'], condition=Q(tag__isnull=False), name='unique_facet_category_tag'),
+            models.UniqueConstraint(fields=['category', 'price_band'], condition=Q(price_band__isnull=False), name='unique_facet_category_price_band'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.tag_id or '-'}/{self.price_band if self.price_band is not None else '-'}: {self.count}"
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="images") # product.images.all()   # returns all gallery images
 
@@ -219,10 +366,47 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"Image for {self.product.name}"
 
+
+class StockReservation(models.Model):
+    """
+    Stock set aside for one checkout (`reference`), see products/inventory.py.
+    The quantity leaves Product.stock_quantity when the hold is made; it is
+    given back when the hold is released or expires, and stays gone once
+    the hold is committed.
+    """
+    STATUS_HELD = "held"
+    STATUS_COMMITTED = "committed"
+    STATUS_RELEASED = "released"
+    STATUS_EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (STATUS_HELD, "Held"),
+        (STATUS_COMMITTED, "Committed"),
+        (STATUS_RELEASED, "Released"),
+        (STATUS_EXPIRED, "Expired"),
+    ]
+
+    reference = models.CharField(max_length=64)  # cart / checkout id, groups the items of one order
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)  # committed, released or expired
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reference', 'status'], name='reservation_reference_idx'),
+            # the reaper's "held and past expires_at" scan
+            models.Index(fields=['expires_at'], condition=Q(status='held'), name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reference}: {self.quantity} x {self.product_id} ({self.status})"
+
 # ----------------------------
 # Product Attributes & Values
 # ----------------------------
-class ProductAttribute(models.Model):
+class ProductAttribute(UniqueSlugMixin, models.Model):
     """Product attribute type (e.g., Color, Size)."""
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
@@ -230,18 +414,93 @@ class ProductAttribute(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_unique_slug(ProductAttribute, self.name, slug_field='slug')
-        super().save(*args, **kwargs)
-
 
 
-class ProductAttributeValue(models.Model):
+class ProductAttributeValue(UniqueSlugMixin, models.Model):
     """Specific value for a product attribute (e.g., Red, XL)."""
+    slug_source_field = "value"
+    slug_unique_with = ("attribute",)
+
     attribute = models.ForeignKey(ProductAttribute, on_delete=models.CASCADE, related_name="values")
     value = models.CharField(max_length=100)
+    # URL/filter-friendly form of `value`, unique per attribute (e.g. "xl" for "XL")
+    slug = models.SlugField(max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attribute', 'slug'], name='unique_attribute_value_slug'),
+        ]
 
     def __str__(self):
         return f"{self.attribute.name}: {self.value}"
 
+
+class ProductVariant(models.Model):
+    """
+    A purchasable variant of a product (e.g. "T-shirt, Red, XL") with its own SKU,
+    price and stock. Described by one ProductAttributeValue per attribute.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="variants")
+    sku = models.CharField(max_length=50, unique=True)
+    # Empty price = same as the product's price
+    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    stock_quantity = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    attribute_values = models.ManyToManyField(ProductAttributeValue, through="VariantAttributeValue", related_name="variants", blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=['product', 'is_active']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.sku})"
+
+    @property
+    def effective_price(self):
+        return self.price if self.price is not None else self.product.price
+
+    def set_attribute_values(self, values):
+        """
+        Replace this variant's attribute values (one per attribute) in two statements.
+        The way to link values: `attribute_values.add()` can't fill the copied attribute column.
+        """
+        with transaction.atomic():
+            VariantAttributeValue.objects.filter(variant=self).delete()
+            VariantAttributeValue.objects.bulk_create([
+                VariantAttributeValue(variant=self, value=value, attribute_id=value.attribute_id) for value in values
+            ])
+            # bulk_create sends no post_save, so the signal receivers never see it.
+            transaction.on_commit(attributes.attribute_cache.bump)
+
+
+class VariantAttributeValue(models.Model):
+    """
+    Variant <-> attribute value link. `attribute` is copied from `value` so that
+    - a variant can hold only one value per attribute (unique constraint), and
+    - multi-attribute filters can group by attribute without an extra join.
+    The (value, variant) index is the posting list "variants having value X".
+    """
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name="attribute_links")
+    value = models.ForeignKey(ProductAttributeValue, on_delete=models.CASCADE, related_name="variant_links")
+    attribute = models.ForeignKey(ProductAttribute, on_delete=models.CASCADE, related_name="variant_links")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['variant', 'attribute'], name='unique_variant_attribute'),
+        ]
+        indexes = [
+            models.Index(fields=['value', 'variant']),
+        ]
+
+    def __str__(self):
+        return f"{self.variant_id}: {self.value_id}"
+
+    def save(self, *args, **kwargs):
+        self.attribute_id = self.value.attribute_id
+        super().save(*args, **kwargs)
+
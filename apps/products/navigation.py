@@ -0,0 +1,61 @@
+"""
+Cached navigation data: the active category tree and the tag index.
+
+Both are rebuilt from the database only when a Category or Tag changes
+(see products/signals.py); otherwise they are served from the per-process
+copy of `navigation_cache`.
+"""
+from asgiref.sync import sync_to_async
+
+from apps.common.cache import get_versioned_cache
+
+from .models import Category, Tag
+
+navigation_cache = get_versioned_cache("catalog-nav")
+
+
+def build_category_tree():
+    """
+    Nested list of active categories, ordered by name, built from a single query:
+    [{"id", "name", "slug", "children": [...]}, ...]
+    Children of an inactive category are hidden along with it.
+    """
+    rows = Category.objects.filter(is_active=True).order_by("name").values("id", "name", "slug", "parent_id")
+    nodes = {row["id"]: {"id": row["id"], "name": row["name"], "slug": row["slug"], "children": []} for row in rows}
+    roots = []
+    for row in rows:
+        node = nodes[row["id"]]
+        if row["parent_id"] is None:
+            roots.append(node)
+        elif row["parent_id"] in nodes:
+            nodes[row["parent_id"]]["children"].append(node)
+    return roots
+
+
+def build_tag_index():
+    """All tags ordered by name: [{"name", "slug", "type"}, ...]"""
+    return [
+        {"name": name, "slug": slug, "type": tag_type}
+        for name, slug, tag_type in Tag.objects.order_by("name").values_list("name", "slug", "tag_type")
+    ]
+
+
+def get_category_tree():
+    return navigation_cache.get_or_set("category-tree", build_category_tree)
+
+
+def get_tag_index():
+    return navigation_cache.get_or_set("tag-index", build_tag_index)
+
+
+def load_navigation():
+    return {"nav_categories": get_category_tree(), "nav_tags": get_tag_index()}
+
+
+async def aload_navigation(request):
+    """
+    For async views (see apps/common/async_views.py): load the navigation before
+    rendering; the `navigation` context processor then reads it from the request.
+    """
+    request._navigation = await sync_to_async(load_navigation)()
+    return request._navigation
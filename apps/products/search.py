@@ -0,0 +1,332 @@
+"""
+Full-text product search.
+
+Each storefront-visible product gets one search document built from its name,
+meta_keywords, tag names, category names (the category and all its ancestors)
+and description. Storage and ranking depend on the database:
+
+- SQLite:     FTS5 virtual table (porter stemming, bm25 ranking), rowid = product id.
+- PostgreSQL: table of weighted `tsvector`s with a GIN index, ranked by ts_rank_cd.
+- Others:     no index; falls back to icontains (slow, dev only).
+
+The tables are created by migration 0005_product_search_index.
+
+Autocomplete matches what has been typed so far against the product names, as
+prefixes. Stemmed terms can't serve that ("running" is indexed as "run", so
+"runn" matches nothing), so names are also indexed unstemmed: a second FTS5
+table (unicode61, with prefix indexes) on SQLite, a `simple`-config tsvector
+column on PostgreSQL.
+
+The index is updated on commit when products, their tags, categories or tags
+change (products/signals.py) and can be rebuilt in bulk with the
+rebuild_search_index command. A category or tag rename can touch thousands of
+products, so those are reindexed in a background thread (`schedule_reindex()`).
+
+Usage:
+    from apps.products.search import search_products, autocomplete
+    ids_and_ranks = search_products("red running shoes", limit=20)
+    suggestions = autocomplete("runn")
+"""
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "products_search"
+MAX_QUERY_TOKENS = 10
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _models():
+    # Imported lazily: signals import this module while models are loading.
+    from .models import CategoryClosure, Product
+    return CategoryClosure, Product
+
+
+def _tokens(query):
+    return TOKEN_RE.findall((query or "").lower())[:MAX_QUERY_TOKENS]
+
+
+# ---------------------------------------------------------------------------
+# Documents
+# ---------------------------------------------------------------------------
+
+def _category_names(category_ids):
+    """{category_id: "Electronics Mobiles Smartphones"} for the given categories, in one query."""
+    CategoryClosure, _ = _models()
+    names = {}
+    rows = (
+        CategoryClosure.objects.filter(descendant_id__in=set(category_ids))
+        .order_by("descendant_id", "-depth")
+        .values_list("descendant_id", "ancestor__name")
+    )
+    for category_id, name in rows:
+        names.setdefault(category_id, []).append(name)
+    return {category_id: " ".join(parts) for category_id, parts in names.items()}
+
+
+def build_documents(products):
+    """
+    Search documents for products loaded with `category` and prefetched `tags`:
+    [(product_id, name, keywords, categories, description), ...]
+    """
+    products = list(products)
+    categories = _category_names(product.category_id for product in products)
+    documents = []
+    for product in products:
+        keywords = " ".join([product.meta_keywords] + [tag.name for tag in product.tags.all()])
+        documents.append((
+            product.id,
+            product.name,
+            keywords,
+            categories.get(product.category_id, ""),
+            product.description,
+        ))
+    return documents
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class FallbackSearchBackend:
+    """No index at all: icontains over name/keywords. Only for databases without FTS support."""
+    has_index = False
+
+    def write(self, cursor, documents):
+        pass
+
+    def remove(self, cursor, product_ids):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def search(self, cursor, tokens, limit, prefix):
+        _, Product = _models()
+        queryset = Product.objects.published()
+        for token in tokens:
+            queryset = queryset.filter(Q(name__icontains=token) | Q(meta_keywords__icontains=token))
+        return [(pk, 0.0) for pk in queryset.values_list("pk", flat=True)[:limit]]
+
+    def suggest(self, cursor, tokens, limit):
+        _, Product = _models()
+        queryset = Product.objects.published()
+        for token in tokens:
+            queryset = queryset.filter(name__icontains=token)
+        return [(pk, 0.0) for pk in queryset.values_list("pk", flat=True)[:limit]]
+
+
+class SQLiteSearchBackend(FallbackSearchBackend):
+    has_index = True
+    # bm25 column weights: name, keywords, categories, description
+    weights = (10.0, 4.0, 3.0, 1.0)
+    names_table = f"{SEARCH_TABLE}_names"
+
+    def write(self, cursor, documents):
+        self.remove(cursor, [document[0] for document in documents])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, keywords, categories, description) VALUES (%s, %s, %s, %s, %s)",
+            documents,
+        )
+        cursor.executemany(
+            f"INSERT INTO {self.names_table} (rowid, name) VALUES (%s, %s)",
+            [document[:2] for document in documents],
+        )
+
+    def remove(self, cursor, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            for table in (SEARCH_TABLE, self.names_table):
+                cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", product_ids)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"DELETE FROM {self.names_table}")
+
+    def search(self, cursor, tokens, limit, prefix):
+        # Quote every token so user input can't inject FTS5 query syntax.
+        terms = [f'"{token}"' for token in tokens]
+        if prefix:
+            terms[-1] += "*"
+        return self._match(cursor, SEARCH_TABLE, ", ".join(str(weight) for weight in self.weights), terms, limit)
+
+    def suggest(self, cursor, tokens, limit):
+        return self._match(cursor, self.names_table, "1.0", [f'"{token}"*' for token in tokens], limit)
+
+    def _match(self, cursor, table, weights, terms, limit):
+        cursor.execute(
+            f"SELECT rowid, bm25({table}, {weights}) AS rank FROM {table} "
+            f"WHERE {table} MATCH %s ORDER BY rank LIMIT %s",
+            [" ".join(terms), limit],
+        )
+        # bm25: lower is better; flip the sign so higher rank = more relevant everywhere.
+        return [(pk, -rank) for pk, rank in cursor.fetchall()]
+
+
+class PostgresSearchBackend(FallbackSearchBackend):
+    has_index = True
+    config = "english"
+
+    def write(self, cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document, name_document) VALUES (%s, "
+            f" setweight(to_tsvector('{self.config}', %s), 'A') ||"
+            f" setweight(to_tsvector('{self.config}', %s), 'B') ||"
+            f" setweight(to_tsvector('{self.config}', %s), 'B') ||"
+            f" setweight(to_tsvector('{self.config}', %s), 'C'),"
+            " to_tsvector('simple', %s))"
+            " ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document, name_document = EXCLUDED.name_document",
+            [document + (document[1],) for document in documents],
+        )
+
+    def remove(self, cursor, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [product_ids])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def search(self, cursor, tokens, limit, prefix):
+        # \w+ tokens are safe to join into tsquery syntax.
+        terms = list(tokens)
+        if prefix:
+            terms[-1] += ":*"
+        return self._match(cursor, "document", self.config, terms, limit)
+
+    def suggest(self, cursor, tokens, limit):
+        return self._match(cursor, "name_document", "simple", [f"{token}:*" for token in tokens], limit)
+
+    def _match(self, cursor, column, config, terms, limit):
+        cursor.execute(
+            f"SELECT product_id, ts_rank_cd({column}, query) AS rank "
+            f"FROM {SEARCH_TABLE}, to_tsquery('{config}', %s) AS query "
+            f"WHERE {column} @@ query ORDER BY rank DESC, product_id LIMIT %s",
+            [" & ".join(terms), limit],
+        )
+        return cursor.fetchall()
+
+
+def get_backend(conn=None):
+    vendor = (conn or connection).vendor
+    if vendor == "sqlite":
+        return SQLiteSearchBackend()
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    return FallbackSearchBackend()
+
+
+# ---------------------------------------------------------------------------
+# Index maintenance
+# ---------------------------------------------------------------------------
+
+def _indexable(queryset):
+    return queryset.published().select_related("category").prefetch_related("tags").order_by("pk")
+
+
+def index_products(product_ids, batch_size=2000):
+    """(Re)index the given products; ones that are no longer visible are removed."""
+    _, Product = _models()
+    backend = get_backend()
+    product_ids = sorted(set(product_ids))
+    if not product_ids or not backend.has_index:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(product_ids), batch_size):
+            batch = set(product_ids[i:i + batch_size])
+            documents = build_documents(_indexable(Product.objects.filter(pk__in=batch)))
+            backend.remove(cursor, batch - {document[0] for document in documents})
+            if documents:
+                backend.write(cursor, documents)
+
+
+def remove_products(product_ids):
+    backend = get_backend()
+    if backend.has_index:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, product_ids)
+
+
+_reindex_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-reindex")
+_reindex_slots = threading.BoundedSemaphore(getattr(settings, "SEARCH_REINDEX_MAX_PENDING", 20))
+
+
+def schedule_reindex(product_ids):
+    """
+    index_products() off the request path, for changes that touch many products.
+    `product_ids` may be a lazy values_list() queryset: it is read by the job.
+    Past SEARCH_REINDEX_MAX_PENDING waiting jobs, new ones are dropped with a
+    warning; `manage.py rebuild_search_index` catches up.
+    """
+    if not getattr(settings, "SEARCH_REINDEX_IN_BACKGROUND", True):
+        index_products(product_ids)
+        return
+    if not _reindex_slots.acquire(blocking=False):
+        logger.warning("Search reindex queue full; run `manage.py rebuild_search_index` to catch up.")
+        return
+    _reindex_executor.submit(_reindex_in_background, product_ids)
+
+
+def _reindex_in_background(product_ids):
+    try:
+        index_products(product_ids)
+    except Exception:
+        logger.exception("Reindexing products for search failed.")
+    finally:
+        _reindex_slots.release()
+        # The worker thread got its own DB connection; don't leak it.
+        connection.close()
+
+
+def rebuild_search_index(batch_size=2000):
+    """Rebuild the whole index from visible products. Returns the number indexed."""
+    _, Product = _models()
+    backend = get_backend()
+    if not backend.has_index:
+        return 0
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        last_pk = 0
+        # Keyset batches: constant memory, no OFFSET.
+        while True:
+            batch = list(_indexable(Product.objects.filter(pk__gt=last_pk))[:batch_size])
+            if not batch:
+                break
+            backend.write(cursor, build_documents(batch))
+            total += len(batch)
+            last_pk = batch[-1].pk
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def search_products(query, limit=20, prefix=False):
+    """[(product_id, rank), ...] best match first. Empty query -> []."""
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    with connection.cursor() as cursor:
+        return get_backend().search(cursor, tokens, limit, prefix)
+
+
+def autocomplete(query, limit=8):
+    """Name suggestions for a partially typed query: every word is matched as the start of a word of the name."""
+    _, Product = _models()
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    with connection.cursor() as cursor:
+        ids = [pk for pk, _ in get_backend().suggest(cursor, tokens, limit)]
+    rows = {pk: (name, slug) for pk, name, slug in Product.objects.filter(pk__in=ids).values_list("pk", "name", "slug")}
+    return [{"name": rows[pk][0], "slug": rows[pk][1]} for pk in ids if pk in rows]
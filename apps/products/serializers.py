@@ -0,0 +1,147 @@
+"""
+Plain-dict serializers for the catalog JSON API.
+
+These functions never touch the database: callers must hand them products
+loaded through `catalog_queryset()` (select_related + prefetch_related) and
+call `prefetch_product_images()` on them, so a page of N products always costs
+the same fixed number of queries.
+"""
+from django.db.models import Prefetch
+
+from apps.common.images import aprefetch_image_variants, image_variants, prefetch_image_variants
+
+from .models import Product, ProductImage, ProductVariant, Tag
+
+
+def catalog_queryset():
+    """
+    Published, active products with every relation the serializers read.
+    main query (+ category, created_by joins) + 1 query for tags + 1 query for images.
+    """
+    return (
+        Product.objects
+        .published()
+        .select_related("category", "created_by")
+        .prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.only("id", "name", "slug", "tag_type")),
+            Prefetch("images", queryset=ProductImage.objects.order_by("-is_default", "id")),
+        )
+    )
+
+
+def product_detail_queryset():
+    """catalog_queryset() + 1 query for active variants and their attribute values (+ attribute join)."""
+    return catalog_queryset().prefetch_related(
+        Prefetch(
+            "variants",
+            queryset=ProductVariant.objects.filter(is_active=True).prefetch_related("attribute_values__attribute"),
+        ),
+    )
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+def _product_images(products):
+    return [product.image for product in products] + [
+        image.image for product in products for image in product.images.all()
+    ]
+
+
+def prefetch_product_images(products):
+    """Load the derivatives (resized variants) of every image of `products`: 1 query."""
+    prefetch_image_variants(_product_images(products))
+
+
+async def aprefetch_product_images(products):
+    """prefetch_product_images() for async views."""
+    await aprefetch_image_variants(_product_images(products))
+
+
+def serialize_category(category):
+    return {
+        "id": category.id,
+        "name": category.name,
+        "slug": category.slug,
+    }
+
+
+def serialize_tag(tag):
+    return {
+        "name": tag.name,
+        "slug": tag.slug,
+        "type": tag.tag_type,
+    }
+
+
+def serialize_image(image):
+    return {
+        "url": _file_url(image.image),
+        "variants": image_variants(image.image),
+        "alt_text": image.alt_text,
+        "caption": image.caption,
+        "is_default": image.is_default,
+    }
+
+
+def serialize_user(user):
+    if user is None:
+        return None
+    # Never expose email addresses in a public API.
+    return {
+        "id": user.id,
+        "name": f"{user.first_name} {user.last_name}".strip(),
+    }
+
+
+def serialize_variant(variant, product):
+    return {
+        "sku": variant.sku,
+        # variant.product would be a query per variant; the parent is already at hand.
+        "price": str(variant.price if variant.price is not None else product.price),
+        "stock_quantity": variant.stock_quantity,
+        "attributes": {value.attribute.slug: value.value for value in variant.attribute_values.all()},
+    }
+
+
+def serialize_product(product, detail=False):
+    """Serialize a product for the list endpoint, or the full record when `detail=True`."""
+    data = {
+        "id": product.id,
+        "name": product.name,
+        "slug": product.slug,
+        "sku": product.sku,
+        "price": str(product.price),
+        "discount_price": str(product.discount_price) if product.discount_price is not None else None,
+        "currency": product.currency,
+        "is_in_stock": product.is_in_stock,
+        "rating": product.rating,
+        "image": _file_url(product.image),
+        # {"thumb"|"small"|"medium"|"large"|"original": {url, width, height}}; empty until generated
+        "image_variants": image_variants(product.image),
+        "is_featured": product.is_featured,
+        "is_new": product.is_new,
+        "is_bestseller": product.is_bestseller,
+        "is_on_sale": product.is_on_sale,
+        "category": serialize_category(product.category),
+        # .all() on a prefetched relation reads from the prefetch cache, no query.
+        "tags": [serialize_tag(tag) for tag in product.tags.all()],
+        "images": [serialize_image(image) for image in product.images.all()],
+        "created_by": serialize_user(product.created_by),
+        "created_at": product.created_at.isoformat(),
+    }
+    if detail:
+        data.update({
+            "description": product.description,
+            "barcode": product.barcode,
+            "stock_quantity": product.stock_quantity,
+            "review_count": product.review_count,
+            "meta_title": product.meta_title,
+            "meta_description": product.meta_description,
+            "meta_keywords": product.meta_keywords,
+            "updated_at": product.updated_at.isoformat(),
+            # Only products loaded through product_detail_queryset() have variants prefetched.
+            "variants": [serialize_variant(variant, product) for variant in product.variants.all()],
+        })
+    return data
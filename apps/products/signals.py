@@ -0,0 +1,179 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import facets, search
+from .attributes import attribute_cache
+from .models import (
+    Category, Product, ProductAttribute, ProductAttributeValue, ProductVariant, Tag, VariantAttributeValue,
+)
+from .navigation import navigation_cache
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_navigation_cache(sender, **kwargs):
+    # Bump only once the write is visible to other workers, otherwise one of them
+    # could rebuild the cache from the old rows under the new version.
+    transaction.on_commit(navigation_cache.bump)
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=VariantAttributeValue)
+@receiver(post_delete, sender=VariantAttributeValue)
+def invalidate_attribute_cache(sender, **kwargs):
+    # Per-category attribute values (see products/attributes.py). Same on_commit rule as above.
+    transaction.on_commit(attribute_cache.bump)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_attribute_cache_on_product_save(sender, instance, created, raw=False, **kwargs):
+    # The values only depend on whether the product is visible, and in which category.
+    # A new product has no variants yet, and deleting one deletes its variants (bumped above).
+    if created or raw:
+        return
+    old_state = instance._facet_state
+    new_state = facets.facet_state(instance) or facets.load_facet_state(instance.pk)
+    if old_state[0] != new_state[0]:
+        transaction.on_commit(attribute_cache.bump)
+
+
+@receiver(m2m_changed, sender=ProductVariant.attribute_values.through)
+def block_attribute_value_add(sender, action, **kwargs):
+    # Through rows added by the related managers would miss the copied `attribute` column.
+    if action == "pre_add":
+        raise TypeError("Link attribute values with ProductVariant.set_attribute_values(), not attribute_values.add().")
+
+
+# ---------------------------------------------------------------------------
+# Incremental ProductFacetCount maintenance (see products/facets.py)
+# ---------------------------------------------------------------------------
+
+def _tag_ids(product):
+    return list(Product.tags.through.objects.filter(product_id=product.pk).values_list("tag_id", flat=True))
+
+
+@receiver(post_save, sender=Product)
+def update_facets_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: run rebuild_facet_counts afterwards
+    old_state = (None, None) if created else instance._facet_state
+    new_state = facets.facet_state(instance) or facets.load_facet_state(instance.pk)
+    if old_state == new_state:
+        return
+    # A new product has no tags yet; they arrive through m2m_changed.
+    tag_ids = [] if created else _tag_ids(instance)
+    deltas = facets.contributions(old_state, tag_ids, sign=-1)
+    deltas.update(facets.contributions(new_state, tag_ids))
+    facets.apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Product)
+def stash_facets_before_delete(sender, instance, **kwargs):
+    # The through rows are gone (without m2m_changed) by the time post_delete runs.
+    state = instance._facet_state or facets.load_facet_state(instance.pk)
+    instance._facet_deltas = facets.contributions(state, _tag_ids(instance), sign=-1)
+
+
+@receiver(post_delete, sender=Product)
+def update_facets_on_delete(sender, instance, **kwargs):
+    facets.apply_deltas(getattr(instance, "_facet_deltas", {}))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def update_facets_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    sign = 1 if action == "post_add" else -1
+
+    if action == "pre_clear":
+        # Remember what is about to be cleared; post_clear gets no pk_set.
+        field = "tag_id" if not reverse else "product_id"
+        lookup = {"product_id": instance.pk} if not reverse else {"tag_id": instance.pk}
+        instance._facet_cleared = set(sender.objects.filter(**lookup).values_list(field, flat=True))
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_facet_cleared", set())
+    if not pk_set:
+        return
+
+    deltas = Counter()
+    if not reverse:
+        # product.tags.add(...): pk_set holds tag ids
+        state = instance._facet_state or facets.load_facet_state(instance.pk)
+        deltas = facets.contributions(state, pk_set, sign=sign, tags_only=True)
+    else:
+        # tag.products.add(...): pk_set holds product ids
+        for category_id in Product.objects.published().filter(pk__in=pk_set).values_list("category_id", flat=True):
+            deltas[(category_id, instance.pk, None)] += sign
+    facets.apply_deltas(deltas)
+
+
+# ---------------------------------------------------------------------------
+# Incremental full-text index maintenance (see products/search.py)
+# ---------------------------------------------------------------------------
+
+def _reindex_on_commit(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: search.index_products(product_ids))
+
+
+def _reindex_in_background_on_commit(product_ids):
+    # For changes that can touch thousands of products: a lazy queryset is read by the job.
+    transaction.on_commit(lambda: search.schedule_reindex(product_ids))
+
+
+@receiver(post_save, sender=Product)
+def reindex_product_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reindex_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: search.remove_products([product_id]))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_products_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        _reindex_on_commit([instance.pk])
+    elif action == "post_clear":
+        # product ids captured by the facet receiver on pre_clear
+        _reindex_on_commit(getattr(instance, "_facet_cleared", ()))
+    else:
+        _reindex_on_commit(pk_set or ())
+
+
+@receiver(post_save, sender=Category)
+def reindex_subtree_on_category_change(sender, instance, created, raw=False, **kwargs):
+    # Documents include the names of the category and all its ancestors.
+    if created or raw:
+        return
+    if instance.name != instance._original_name or instance.parent_id != instance._original_parent_id:
+        _reindex_in_background_on_commit(instance.get_subtree_products().values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tagged_products_on_tag_save(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        _reindex_in_background_on_commit(instance.products.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def reindex_tagged_products_on_tag_delete(sender, instance, **kwargs):
+    # Read now: the links are gone once the tag is deleted.
+    _reindex_in_background_on_commit(list(instance.products.values_list("pk", flat=True)))
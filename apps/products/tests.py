@@ -1,3 +1,609 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import attributes, facets, inventory, search, tree
+from .counters import CounterBuffer
+from .navigation import get_category_tree, navigation_cache
+from .importer import ProductImporter
+from .models import (
+    Category, CategoryClosure, Product, ProductAttribute, ProductAttributeValue, ProductFacetCount, ProductVariant,
+    StockReservation, Tag,
+)
 
 # Create your tests here.
+
+class StorefrontIndexTests(TestCase):
+    """
+    The canonical storefront listing queries must be served by the partial indexes
+    declared in Product.Meta.indexes (checked with EXPLAIN, SQLite or PostgreSQL).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Electronics")
+        for i in range(30):
+            Product.objects.create(
+                name=f"Phone {i}",
+                sku=f"SKU-{i}",
+                price=Decimal(100 + i),
+                stock_quantity=i,
+                category=cls.category,
+                status="published" if i % 3 else "draft",
+                is_featured=i % 5 == 0,
+            )
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Tiny test tables always look cheaper to scan; make the planner show its index choice.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            elif connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in plan:\n{plan}")
+
+    def test_category_listing_sorts_use_category_indexes(self):
+        listings = Product.objects.published().filter(category=self.category)
+        cases = {
+            ("price", "id"): "product_cat_price_idx",
+            ("-price", "-id"): "product_cat_price_idx",
+            ("-created_at", "-id"): "product_cat_newest_idx",
+            ("name", "id"): "product_cat_name_idx",
+            ("-purchases_count", "-id"): "product_cat_bestselling_idx",
+        }
+        for ordering, index_name in cases.items():
+            with self.subTest(ordering=ordering):
+                self.assertUsesIndex(listings.order_by(*ordering)[:20], index_name)
+
+    def test_catalog_listing_uses_newest_index(self):
+        self.assertUsesIndex(Product.objects.published().order_by("-created_at", "-id")[:20], "product_newest_idx")
+
+    def test_promotion_rail_uses_flag_index(self):
+        featured = Product.objects.published().filter(is_featured=True).order_by("-created_at", "-id")[:8]
+        self.assertUsesIndex(featured, "product_featured_idx")
+
+
+class CategoryTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothing = Category.objects.create(name="Clothing")
+        cls.shoes = Category.objects.create(name="Shoes", parent=cls.clothing)
+        cls.boots = Category.objects.create(name="Boots", parent=cls.shoes)
+        cls.outdoor = Category.objects.create(name="Outdoor")
+        cls.hiking = Product.objects.create(
+            name="Hiking boot", sku="HIKE", price=Decimal(120), category=cls.boots, status="published"
+        )
+
+    def closure(self):
+        return set(CategoryClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+
+    def test_ancestors_descendants_and_subtree_products(self):
+        self.assertEqual(list(self.boots.get_ancestors()), [self.clothing, self.shoes])
+        self.assertEqual(set(self.clothing.get_descendants()), {self.shoes, self.boots})
+        self.assertEqual(list(self.clothing.get_subtree_products()), [self.hiking])
+        counts = dict(Category.objects.with_subtree_product_counts().values_list("name", "subtree_product_count"))
+        self.assertEqual(counts, {"Clothing": 1, "Shoes": 1, "Boots": 1, "Outdoor": 0})
+
+    def test_moving_a_category_moves_its_subtree(self):
+        self.shoes.parent = self.outdoor
+        self.shoes.save()
+
+        self.assertEqual(list(self.boots.get_ancestors()), [self.outdoor, self.shoes])
+        self.assertEqual(list(self.clothing.get_descendants()), [])
+        self.assertEqual(list(self.outdoor.get_subtree_products()), [self.hiking])
+
+        self.shoes.parent = None
+        self.shoes.save()
+        self.assertEqual(list(self.boots.get_ancestors()), [self.shoes])
+
+    def test_cannot_move_under_own_descendant(self):
+        self.clothing.parent = self.boots
+        with self.assertRaises(ValueError):
+            self.clothing.save()
+
+    def test_navigation_tree_is_rebuilt_after_a_commit(self):
+        navigation_cache.bump()  # rolled-back tests never bump it
+        self.assertEqual([node["name"] for node in get_category_tree()], ["Clothing", "Outdoor"])
+        with self.assertNumQueries(0):
+            get_category_tree()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Garden")
+        self.assertEqual([node["name"] for node in get_category_tree()], ["Clothing", "Garden", "Outdoor"])
+        self.assertEqual(get_category_tree()[0]["children"][0]["children"][0]["name"], "Boots")
+
+    def test_navbar_renders_the_cached_tree(self):
+        navigation_cache.bump()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, f'{reverse("product_list")}?category=shoes"')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("home"))
+        self.assertFalse([query for query in queries if 'FROM "products_category"' in query["sql"]])
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        expected = self.closure()
+        CategoryClosure.objects.all().delete()
+
+        self.assertEqual(tree.rebuild_closure(), 4)
+        self.assertEqual(self.closure(), expected)
+
+
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Shoes")
+        cls.red = Tag.objects.create(name="Red")
+        cls.sale = Tag.objects.create(name="Sale")
+
+    def row(self, **extra):
+        return {"sku": "SH-1", "name": "Runner", "price": "59.90", "category": "shoes", **extra}
+
+    def tags(self):
+        return set(Product.objects.get(sku="SH-1").tags.values_list("slug", flat=True))
+
+    def test_reimport_keeps_tags_unless_the_row_names_known_ones(self):
+        ProductImporter().import_rows([self.row(tags="red|sale")])
+        self.assertEqual(self.tags(), {"red", "sale"})
+
+        result = ProductImporter().import_rows([self.row(price="49.90")])  # no tags column
+        self.assertEqual((result.updated, self.tags()), (1, {"red", "sale"}))
+
+        result = ProductImporter().import_rows([self.row(tags="blue|green")])  # only unknown slugs
+        self.assertEqual((result.unknown_tags, self.tags()), ({"blue", "green"}, {"red", "sale"}))
+
+        ProductImporter().import_rows([self.row(tags=["sale"])])
+        self.assertEqual(self.tags(), {"sale"})
+
+    def test_malformed_jsonl_line_is_a_row_error(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8") as feed:
+            feed.write(json.dumps(self.row()) + "\n")
+            feed.write('{"sku": "SH-2", "name": \n')
+            feed.write("[1, 2]\n")
+            feed.write(json.dumps(self.row(sku="SH-3")) + "\n")
+            feed.flush()
+            result = ProductImporter().import_file(feed.name)
+
+        self.assertEqual((result.rows, result.created, result.skipped), (4, 2, 2))
+        self.assertTrue(result.errors[0].startswith("row 2: invalid JSON"))
+        self.assertEqual(result.errors[1], "row 3: expected a JSON object")
+
+    def test_oversize_values_are_row_errors(self):
+        result = ProductImporter().import_rows([self.row(name="x" * 201), self.row(sku="S" * 51), self.row(sku="SH-2")])
+        self.assertEqual((result.created, result.skipped), (1, 2))
+        self.assertEqual(result.errors, ["row 1: name is longer than 200 characters", "row 2: sku is longer than 50 characters"])
+
+    def test_blank_flags_keep_the_default_or_current_value(self):
+        ProductImporter().import_rows([self.row(is_active="", status="")])
+        product = Product.objects.get(sku="SH-1")
+        self.assertEqual((product.is_active, product.status), (True, "draft"))
+
+        Product.objects.filter(sku="SH-1").update(is_active=False)
+        ProductImporter().import_rows([self.row(is_active=" ")])
+        self.assertFalse(Product.objects.get(sku="SH-1").is_active)
+        ProductImporter().import_rows([self.row(is_active="yes")])
+        self.assertTrue(Product.objects.get(sku="SH-1").is_active)
+
+    def test_slug_taken_by_another_writer_is_retried(self):
+        Product.objects.create(name="Runner", sku="OTHER", price=Decimal(10), category=self.shoes)
+        with mock.patch("apps.products.importer.allocate_unique_slugs", side_effect=[["runner"], ["runner-2"]]):
+            result = ProductImporter().import_rows([self.row()])
+        self.assertEqual((result.created, Product.objects.get(sku="SH-1").slug), (1, "runner-2"))
+
+    def test_command_refreshes_only_the_imported_products(self):
+        bags = Category.objects.create(name="Bags")
+        tote = Product.objects.create(name="Tote", sku="BAG-1", price=Decimal(30), category=bags, status="published")
+        # Out of date on purpose: a full rebuild would fix both.
+        ProductFacetCount.objects.filter(category=bags).update(count=99)
+        search.remove_products([tote.pk])
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8") as feed:
+            feed.write("sku,name,price,category,status\nSH-1,Trail runner,59.90,shoes,published\n")
+            feed.flush()
+            call_command("import_products", feed.name, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(
+            facets.precomputed_facets(self.shoes),
+            facets.compute_facets(Product.objects.published().filter(category=self.shoes)),
+        )
+        self.assertEqual(set(ProductFacetCount.objects.filter(category=bags).values_list("count", flat=True)), {99})
+        self.assertEqual([pk for pk, _ in search.search_products("trail")], [Product.objects.get(sku="SH-1").pk])
+        self.assertEqual(search.search_products("tote"), [])
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Shoes")
+        cls.boots = Category.objects.create(name="Boots", parent=cls.shoes)
+        cls.red = Tag.objects.create(name="Red", tag_type="Color")
+        cls.waterproof = Tag.objects.create(name="Waterproof", tag_type="Feature")
+        cls.products = []
+        for i, (category, price) in enumerate([(cls.shoes, 20), (cls.boots, 75), (cls.boots, 120), (cls.shoes, 600)]):
+            product = Product.objects.create(
+                name=f"Shoe {i}", sku=f"FACET-{i}", price=Decimal(price), category=category, status="published"
+            )
+            product.tags.add(cls.red, *([cls.waterproof] if i % 2 else []))
+            cls.products.append(product)
+        Product.objects.create(name="Draft", sku="FACET-D", price=Decimal(30), category=cls.boots, status="draft")
+
+    def assertFacetsInSync(self, category=None):
+        queryset = Product.objects.published()
+        if category is not None:
+            queryset = queryset.filter(category__ancestor_links__ancestor=category)
+        self.assertEqual(facets.precomputed_facets(category), facets.compute_facets(queryset))
+
+    def test_live_counts(self):
+        result = facets.compute_facets(Product.objects.published().filter(category=self.boots))
+        self.assertEqual(result["categories"], [{"id": self.boots.pk, "name": "Boots", "slug": "boots", "count": 2}])
+        self.assertEqual(result["tags"]["Color"], [{"name": "Red", "slug": "red", "count": 2}])
+        self.assertEqual([band["count"] for band in result["price"]], [0, 0, 1, 1, 0, 0])
+
+    def test_precomputed_counts_follow_every_change(self):
+        self.assertFacetsInSync()
+        self.assertFacetsInSync(self.boots)
+
+        first, second, third, _ = self.products
+        first.price = Decimal(300)
+        first.save()
+        second.status = "draft"
+        second.save()
+        third.tags.remove(self.red)
+        third.tags.add(self.waterproof)
+        first.tags.clear()
+        self.products[3].delete()
+
+        self.assertFacetsInSync()
+        self.assertFacetsInSync(self.shoes)
+        self.assertFacetsInSync(self.boots)
+
+    def test_rebuild_matches_incremental_counts(self):
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal(60))  # no signals
+        facets.rebuild_facet_counts()
+        self.assertFacetsInSync()
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Sport")
+        cls.shoes = Product.objects.create(name="Running shoes", sku="RUN", price=Decimal(90), category=cls.category, status="published")
+        cls.jacket = Product.objects.create(
+            name="Rain jacket", sku="RAIN", price=Decimal(120), category=cls.category, status="published",
+            description="Light enough for running in the rain.",
+        )
+        search.rebuild_search_index()
+
+    def names(self, results):
+        return [result["name"] for result in results]
+
+    def test_autocomplete_matches_partial_words(self):
+        for typed in ("r", "ru", "runn", "runni", "running", "Running sh", "sho"):
+            with self.subTest(typed=typed):
+                self.assertIn("Running shoes", self.names(search.autocomplete(typed)))
+        self.assertEqual(self.names(search.autocomplete("runs")), [])  # prefixes, not stems
+        self.assertEqual(search.autocomplete("  "), [])
+
+    def test_search_is_stemmed_and_ranks_names_first(self):
+        ranked = [pk for pk, _ in search.search_products("runs")]
+        self.assertEqual(ranked, [self.shoes.pk, self.jacket.pk])
+
+    def test_index_follows_product_changes(self):
+        self.jacket.status = "draft"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jacket.save()
+        self.assertEqual([pk for pk, _ in search.search_products("rain")], [])
+        self.assertEqual(search.autocomplete("rain"), [])
+
+    def test_category_rename_is_reindexed_in_the_background(self):
+        self.category.name = "Trail"
+        with mock.patch.object(search, "_reindex_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.category.save()
+        (job, product_ids), _ = executor.submit.call_args
+        search._reindex_slots.release()  # the mocked executor never ran the job
+        self.assertEqual(job, search._reindex_in_background)
+        self.assertEqual(search.search_products("trail"), [])
+
+        search.index_products(product_ids)
+        self.assertEqual({pk for pk, _ in search.search_products("trail")}, {self.shoes.pk, self.jacket.pk})
+
+
+class AttributeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts")
+        cls.shirt = Product.objects.create(name="Shirt", sku="SHIRT", price=Decimal(25), category=category, status="published")
+        cls.hat = Product.objects.create(name="Hat", sku="HAT", price=Decimal(15), category=category, status="published")
+        color = ProductAttribute.objects.create(name="Color")
+        size = ProductAttribute.objects.create(name="Size")
+        cls.values = {
+            slug: ProductAttributeValue.objects.create(attribute=attribute, value=slug.upper())
+            for attribute, slugs in ((color, ("red", "blue")), (size, ("s", "xl")))
+            for slug in slugs
+        }
+        cls.red_xl = cls.variant(cls.shirt, "SHIRT-RXL", "red", "xl", stock=2)
+        cls.blue_s = cls.variant(cls.shirt, "SHIRT-BS", "blue", "s")
+        cls.red_s = cls.variant(cls.hat, "HAT-RS", "red", "s", stock=1)
+
+    @classmethod
+    def variant(cls, product, sku, *slugs, stock=0):
+        variant = ProductVariant.objects.create(product=product, sku=sku, stock_quantity=stock)
+        variant.set_attribute_values([cls.values[slug] for slug in slugs])
+        return variant
+
+    def matching(self, filters, in_stock=False):
+        resolved = attributes.resolve_attribute_filters(filters)
+        return set(attributes.matching_variants(resolved, in_stock=in_stock))
+
+    def test_values_are_or_ed_within_an_attribute_and_and_ed_across(self):
+        self.assertEqual(self.matching({"color": ["red", "blue"], "size": ["s"]}), {self.blue_s, self.red_s})
+        self.assertEqual(self.matching({"color": ["red"], "size": ["xl"]}), {self.red_xl})
+        self.assertEqual(self.matching({"color": ["red"]}, in_stock=True), {self.red_xl, self.red_s})
+        self.assertEqual(self.matching({"color": ["green"], "size": ["s"]}), set())
+
+    def offered(self):
+        return {value["slug"]: value["count"] for attribute in attributes.get_attribute_values() for value in attribute["values"]}
+
+    def test_value_list_is_refreshed_after_set_attribute_values(self):
+        variant = ProductVariant.objects.create(product=self.hat, sku="HAT-BXL")
+        attributes.attribute_cache.bump()  # rolled-back tests never bump it
+        self.assertEqual(self.offered(), {"blue": 1, "red": 2, "s": 2, "xl": 1})
+
+        # Nothing to delete first: only bulk_create runs.
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.set_attribute_values([self.values["blue"], self.values["xl"]])
+        self.assertEqual(self.offered(), {"blue": 2, "red": 2, "s": 2, "xl": 2})
+
+    def test_value_slugs_are_unique_per_attribute(self):
+        color, size = self.values["red"].attribute, self.values["s"].attribute
+        self.assertEqual(ProductAttributeValue.objects.create(attribute=color, value="red!").slug, "red-2")
+        self.assertEqual(ProductAttributeValue.objects.create(attribute=size, value="Red").slug, "red")
+
+    def test_only_visibility_and_category_changes_invalidate_the_values(self):
+        with mock.patch.object(attributes.attribute_cache, "bump") as bump:
+            self.hat.price = Decimal(12)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.hat.save()
+            bump.assert_not_called()
+
+            self.hat.status = "draft"
+            with self.captureOnCommitCallbacks(execute=True):
+                self.hat.save()
+            bump.assert_called_once()
+
+    def test_related_manager_add_is_refused(self):
+        with self.assertRaises(TypeError), transaction.atomic():
+            self.red_xl.attribute_values.add(self.values["blue"])
+        with self.assertRaises(TypeError), transaction.atomic():
+            self.values["blue"].variants.add(self.red_s)
+
+
+class CounterBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Bags")
+        cls.tote = Product.objects.create(name="Tote", sku="TOTE", price=Decimal(30), category=category, views=5)
+        cls.pack = Product.objects.create(name="Pack", sku="PACK", price=Decimal(80), category=category)
+
+    def buffer(self, **kwargs):
+        return CounterBuffer(Product, fields=("views", "purchases_count"), background=False, **kwargs)
+
+    def counts(self, product):
+        product.refresh_from_db()
+        return product.views, product.purchases_count
+
+    def test_increments_are_buffered_then_written_together(self):
+        counters = self.buffer(flush_interval=3600)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                counters.incr(self.tote.pk, "views")
+            counters.incr(self.pack.pk, "purchases_count", 2)
+        self.assertEqual(counters.pending(self.tote.pk, "views"), 3)
+
+        self.assertEqual(counters.flush(), 2)
+        self.assertEqual(self.counts(self.tote), (8, 0))
+        self.assertEqual(self.counts(self.pack), (0, 2))
+        self.assertEqual(counters.pending(self.tote.pk, "views"), 0)
+
+    def test_max_pending_triggers_a_flush(self):
+        counters = self.buffer(flush_interval=3600, max_pending=2)
+        counters.incr(self.tote.pk, "views")
+        counters.incr(self.pack.pk, "views")
+        self.assertEqual(self.counts(self.pack), (1, 0))
+
+    def test_failed_flush_during_incr_is_logged_and_retried(self):
+        counters = self.buffer(flush_interval=0)
+        with mock.patch.object(counters, "_write", side_effect=DatabaseError("down")):
+            with self.assertLogs("apps.products.counters", "ERROR"):
+                counters.incr(self.tote.pk, "views")  # must not raise
+        self.assertEqual(counters.pending(self.tote.pk, "views"), 1)
+
+        counters.incr(self.tote.pk, "views")
+        self.assertEqual(self.counts(self.tote), (7, 0))
+
+    def test_unknown_counter(self):
+        with self.assertRaises(ValueError):
+            self.buffer().incr(self.tote.pk, "stock_quantity")
+
+
+class AsyncStorefrontViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Lamps")
+        for i in range(5):
+            Product.objects.create(
+                name=f"Lamp {i}", sku=f"LAMP-{i}", price=Decimal(20 + i), stock_quantity=1,
+                category=category, status="published",
+            )
+
+    async def test_listing_pages_with_a_cursor(self):
+        response = await self.async_client.get("/products/", {"page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual(len(first["results"]), 3)
+
+        response = await self.async_client.get("/products/", {"page_size": 3, "cursor": first["next_cursor"]})
+        second = response.json()
+        self.assertEqual(len(second["results"]), 2)
+        self.assertIsNone(second["next_cursor"])
+
+        response = await self.async_client.get("/products/", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_detail_and_missing_product(self):
+        product = await Product.objects.afirst()
+        response = await self.async_client.get(f"/products/{product.slug}/")
+        self.assertEqual(response.json()["sku"], product.sku)
+
+        response = await self.async_client.get("/products/no-such-lamp/")
+        self.assertEqual(response.status_code, 404)
+
+
+class InventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shoes")
+        cls.boots = Product.objects.create(name="Boots", sku="BOOT", price=Decimal(90), stock_quantity=3, category=category)
+        cls.socks = Product.objects.create(name="Socks", sku="SOCK", price=Decimal(5), stock_quantity=1, category=category)
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock_quantity, product.is_in_stock
+
+    def test_reserve_takes_stock_and_updates_is_in_stock(self):
+        inventory.reserve({self.boots.pk: 2, self.socks.pk: 1})
+
+        self.assertEqual(self.stock(self.boots), (1, True))
+        self.assertEqual(self.stock(self.socks), (0, False))
+
+    def test_reservation_is_all_or_nothing(self):
+        with self.assertRaises(inventory.InsufficientStock) as raised:
+            inventory.reserve([(self.boots.pk, 2), (self.socks.pk, 1), (self.socks.pk, 1)])
+
+        self.assertEqual((raised.exception.product_id, raised.exception.available), (self.socks.pk, 1))
+        self.assertEqual(self.stock(self.boots), (3, True))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_and_commit(self):
+        released = inventory.reserve({self.socks.pk: 1})
+        self.assertEqual(inventory.release(released), 1)
+        self.assertEqual(self.stock(self.socks), (1, True))
+
+        sold = inventory.reserve({self.socks.pk: 1})
+        self.assertEqual(inventory.commit(sold), 1)
+        self.assertEqual(inventory.release(sold), 0)
+        self.assertEqual(self.stock(self.socks), (0, False))
+        with self.assertRaises(inventory.ReservationNotHeld):
+            inventory.commit(released)
+
+    def test_expired_reservations_are_reaped_in_bulk(self):
+        for _ in range(3):
+            inventory.reserve({self.boots.pk: 1}, ttl=-1)
+        kept = inventory.reserve({self.socks.pk: 1})
+
+        self.assertEqual(inventory.reap_expired(batch_size=2), 3)
+        self.assertEqual(self.stock(self.boots), (3, True))
+        self.assertEqual(StockReservation.objects.filter(status=StockReservation.STATUS_EXPIRED).count(), 3)
+        self.assertEqual(inventory.commit(kept), 1)
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    """
+    Many threads, each on its own database connection, fight over little stock.
+    Runs against whatever DATABASES points at; on SQLite the threads take turns
+    for the single write lock, on PostgreSQL they contend on row locks.
+    """
+    THREADS = 8
+    ATTEMPTS = 25
+
+    def setUp(self):
+        category = Category.objects.create(name="Flash sale")
+        self.products = [
+            Product.objects.create(name=f"Item {i}", sku=f"ITEM-{i}", price=Decimal(10), stock_quantity=20, category=category)
+            for i in range(4)
+        ]
+
+    def retry_locked(self, fn, *args, **kwargs):
+        # The SQLite test database is shared-cache in-memory: a busy table fails at once instead
+        # of waiting out the busy timeout. Every inventory call is one transaction, so retry it.
+        for _ in range(200):
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as exc:
+                if connection.vendor != "sqlite" or "locked" not in str(exc):
+                    raise
+                time.sleep(0.001)
+        return fn(*args, **kwargs)
+
+    def run_threads(self, target):
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(self.ATTEMPTS):
+                    target(rng)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_stock_is_never_oversold(self):
+        ids = [product.pk for product in self.products]
+        sold_out = []
+
+        def checkout(rng):
+            # Random multi-item carts in random order: lock ordering must prevent deadlocks.
+            items = [(pk, rng.randint(1, 3)) for pk in rng.sample(ids, rng.randint(1, len(ids)))]
+            try:
+                reference = self.retry_locked(inventory.reserve, items, ttl=rng.choice([-1, 900]))
+            except inventory.InsufficientStock:
+                sold_out.append(items)
+                return
+            action = rng.random()
+            if action < 0.5:
+                try:
+                    self.retry_locked(inventory.commit, reference)
+                except inventory.ReservationNotHeld:
+                    pass  # expired (ttl=-1) and reaped by another thread first
+            elif action < 0.8:
+                self.retry_locked(inventory.release, reference)
+            else:
+                self.retry_locked(inventory.reap_expired, batch_size=5)
+
+        self.run_threads(checkout)
+        inventory.reap_expired()
+
+        self.assertTrue(sold_out)  # the stock did run out
+        for product in self.products:
+            product.refresh_from_db()
+            sold = sum(
+                StockReservation.objects.filter(
+                    product=product, status__in=[StockReservation.STATUS_COMMITTED, StockReservation.STATUS_HELD]
+                ).values_list("quantity", flat=True)
+            )
+            self.assertEqual(product.stock_quantity + sold, 20, product.name)
+            self.assertEqual(product.is_in_stock, product.stock_quantity > 0)
+        self.assertFalse(
+            StockReservation.objects.filter(status=StockReservation.STATUS_HELD, expires_at__lte=timezone.now()).exists()
+        )
@@ -0,0 +1,90 @@
+"""
+Closure-table maintenance for the Category hierarchy.
+
+`CategoryClosure` stores one row per (ancestor, descendant) pair, including a
+depth-0 row linking every category to itself. With it:
+- breadcrumbs            -> one indexed query  (rows where descendant = X)
+- whole subtree          -> one indexed query  (rows where ancestor = X)
+- products in a subtree  -> one join          (product.category -> closure.descendant)
+instead of walking `children` one level (or one node) at a time.
+
+`Category.save()` calls `insert_node` / `move_node`; deletes are covered by the
+ON DELETE CASCADE on both closure foreign keys. Paths that bypass save()
+(bulk_create, raw SQL, fixtures) should finish with `rebuild_closure()`.
+"""
+from django.db import transaction
+
+
+def _closure_model():
+    # Imported lazily so models.py can import this module without a cycle.
+    from .models import CategoryClosure
+    return CategoryClosure
+
+
+def insert_node(category):
+    """Add closure rows for a freshly created (leaf) category."""
+    CategoryClosure = _closure_model()
+    rows = [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id:
+        parent_links = CategoryClosure.objects.filter(descendant_id=category.parent_id).values_list("ancestor_id", "depth")
+        rows += [
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in parent_links
+        ]
+    CategoryClosure.objects.bulk_create(rows)
+
+
+def move_node(category, old_parent_id):
+    """
+    Re-attach `category` and its whole subtree under `category.parent_id`.
+    Detaches the subtree from its old ancestors, then links it to the new ones.
+    """
+    CategoryClosure = _closure_model()
+    subtree = list(CategoryClosure.objects.filter(ancestor_id=category.pk).values_list("descendant_id", "depth"))
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+    if category.parent_id in subtree_ids:
+        raise ValueError("A category cannot be moved under itself or one of its descendants.")
+
+    if old_parent_id:
+        # Every link from a node above `category` into its subtree goes away.
+        old_ancestor_ids = CategoryClosure.objects.filter(descendant_id=category.pk).exclude(ancestor_id=category.pk).values("ancestor_id")
+        CategoryClosure.objects.filter(descendant_id__in=subtree_ids, ancestor_id__in=old_ancestor_ids).delete()
+
+    if category.parent_id:
+        new_ancestors = list(CategoryClosure.objects.filter(descendant_id=category.parent_id).values_list("ancestor_id", "depth"))
+        CategoryClosure.objects.bulk_create([
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+            for ancestor_id, ancestor_depth in new_ancestors
+            for descendant_id, depth in subtree
+        ])
+
+
+def build_closure_rows(parent_map):
+    """
+    Compute every (ancestor_id, descendant_id, depth) triple from a {id: parent_id} map.
+    Pure python; migration 0002 keeps its own frozen copy.
+    """
+    rows = []
+    for node_id in parent_map:
+        ancestor_id, depth, seen = node_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append((ancestor_id, node_id, depth))
+            ancestor_id = parent_map.get(ancestor_id)
+            depth += 1
+    return rows
+
+
+def rebuild_closure(batch_size=5000):
+    """Recompute the whole closure table from `Category.parent` in a single transaction."""
+    from .models import Category
+    CategoryClosure = _closure_model()
+    parent_map = dict(Category.objects.values_list("id", "parent_id"))
+    with transaction.atomic():
+        CategoryClosure.objects.all().delete()
+        CategoryClosure.objects.bulk_create(
+            (CategoryClosure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in build_closure_rows(parent_map)),
+            batch_size=batch_size,
+        )
+    return len(parent_map)
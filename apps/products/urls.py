@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .views import (
+    ProductListView, ProductDetailView, ProductSearchView, ProductAutocompleteView, ProductAttributeValuesView,
+)
+
+urlpatterns = [
+    # Catalog (read-only JSON API)
+    path("", ProductListView.as_view(), name="product_list"),
+    # must come before the slug route
+    path("search/", ProductSearchView.as_view(), name="product_search"),
+    path("attributes/", ProductAttributeValuesView.as_view(), name="product_attributes"),
+    path("autocomplete/", ProductAutocompleteView.as_view(), name="product_autocomplete"),
+    path("<slug:slug>/", ProductDetailView.as_view(), name="product_detail"),
+]
@@ -1,3 +1,197 @@
-from django.shortcuts import render
+import asyncio
+from decimal import Decimal, InvalidOperation
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, Http404
+from django.views import View
+
+from apps.common.pagination import KeysetPaginator, InvalidCursor
+from .attributes import get_attribute_values, parse_attribute_params, resolve_attribute_filters
+from .counters import product_counters
+from .facets import compute_facets, precomputed_facets
+from .models import Category
+from .search import autocomplete, search_products
+from .serializers import (
+    aprefetch_product_images, catalog_queryset, prefetch_product_images, product_detail_queryset, serialize_product,
+)
+
+# Public sort keys -> keyset ordering. Every ordering ends with the primary key
+# so the cursor position is always unique.
+# Each one is backed by a partial index on Product (see Product.Meta.indexes).
+PRODUCT_ORDERINGS = {
+    "newest": ("-created_at", "-id"),
+    "name": ("name", "id"),
+    "price_asc": ("price", "id"),
+    "price_desc": ("-price", "-id"),
+    "bestselling": ("-purchases_count", "-id"),
+}
+DEFAULT_ORDERING = "newest"
+
+
+class ProductListView(View):
+    """
+    Read-only, cursor-paginated product list.
+    GET /products/?ordering=<PRODUCT_ORDERINGS key>&page_size=20&cursor=<next_cursor>
+    Filters: category=<slug> (whole subtree), tag=<slug> (repeatable, all must match),
+    min_price / max_price, attr=<attribute>:<value> (repeatable; values of the same
+    attribute are OR-ed, attributes are AND-ed, all matched by a single active variant),
+    in_stock=1 (with attr: the matching variant must be in stock).
+    facets=1 adds sidebar facet counts for the filtered set.
+    Async: under ASGI it runs on the event loop; the page and the facet counts
+    are queried concurrently.
+    """
+    page_size = 20
+    max_page_size = 100
+
+    async def aget_filters(self):
+        """Parse the filter params. Raises ValueError on bad input."""
+        params = self.request.GET
+        filters = {
+            "category": None,
+            "tags": params.getlist("tag"),
+            "min_price": None,
+            "max_price": None,
+            "attributes": parse_attribute_params(params.getlist("attr")),
+            "in_stock": params.get("in_stock") in ("1", "true"),
+        }
+        if params.get("category"):
+            filters["category"] = await Category.objects.filter(slug=params["category"]).afirst()
+            if filters["category"] is None:
+                raise ValueError(f"Unknown category '{params['category']}'.")
+        for name in ("min_price", "max_price"):
+            if params.get(name):
+                try:
+                    filters[name] = Decimal(params[name])
+                except InvalidOperation:
+                    raise ValueError(f"Invalid {name} '{params[name]}'.")
+        return filters
+
+    async def aget_queryset(self, filters):
+        queryset = catalog_queryset()
+        if filters["category"]:
+            # Category and all of its descendants, through the closure table (single join).
+            queryset = queryset.filter(category__ancestor_links__ancestor=filters["category"])
+        for tag in filters["tags"]:
+            queryset = queryset.filter(tags__slug=tag)
+        if filters["min_price"] is not None:
+            queryset = queryset.filter(price__gte=filters["min_price"])
+        if filters["max_price"] is not None:
+            queryset = queryset.filter(price__lte=filters["max_price"])
+        if filters["attributes"]:
+            value_ids = await sync_to_async(resolve_attribute_filters)(filters["attributes"])
+            queryset = queryset.with_attributes(value_ids, in_stock=filters["in_stock"])
+        elif filters["in_stock"]:
+            queryset = queryset.filter(is_in_stock=True)
+        return queryset
+
+    async def aget_facets(self, queryset, filters):
+        # The precomputed table only knows "visible products per category subtree".
+        only_category = (
+            not filters["tags"] and not filters["attributes"] and not filters["in_stock"]
+            and filters["min_price"] is None and filters["max_price"] is None
+        )
+        if only_category and getattr(settings, "PRODUCT_FACETS_PRECOMPUTED", True):
+            return await sync_to_async(precomputed_facets)(filters["category"])
+        return await sync_to_async(compute_facets)(queryset)
+
+    async def get(self, request, *args, **kwargs):
+        ordering_key = request.GET.get("ordering", DEFAULT_ORDERING)
+        if ordering_key not in PRODUCT_ORDERINGS:
+            return JsonResponse(
+                {"error": f"Unknown ordering '{ordering_key}'.", "choices": sorted(PRODUCT_ORDERINGS)},
+                status=400,
+            )
+        try:
+            filters = await self.aget_filters()
+        except ValueError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+        queryset = await self.aget_queryset(filters)
+        paginator = KeysetPaginator(
+            queryset,
+            ordering=PRODUCT_ORDERINGS[ordering_key],
+            page_size=self.page_size,
+            max_page_size=self.max_page_size,
+        )
+        with_facets = request.GET.get("facets") in ("1", "true")
+        try:
+            page, facets = await asyncio.gather(
+                paginator.aget_page(request.GET.get("cursor"), request.GET.get("page_size")),
+                self.aget_facets(queryset, filters) if with_facets else _none(),
+            )
+        except InvalidCursor as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+        await aprefetch_product_images(page)
+        data = {
+            "results": [serialize_product(product) for product in page],
+            "next_cursor": page.next_cursor,
+        }
+        if with_facets:
+            data["facets"] = facets
+        return JsonResponse(data)
+
+
+async def _none():
+    return None
+
+
+class ProductDetailView(View):
+    """Read-only product detail, looked up by slug. GET /products/<slug>/ (async)"""
+
+    async def get(self, request, slug, *args, **kwargs):
+        product = await product_detail_queryset().filter(slug=slug).afirst()
+        if product is None:
+            raise Http404("Product not found.")
+        # Buffered: written back in batches, never a row write per page view.
+        await product_counters.aincr(product.pk, "views")
+        await aprefetch_product_images([product])
+        return JsonResponse(serialize_product(product, detail=True))
+
+
+class ProductAttributeValuesView(View):
+    """
+    Attribute values available for filtering, with product counts.
+    GET /products/attributes/?category=<slug> (whole subtree; omit for the whole catalog)
+    """
+
+    def get(self, request, *args, **kwargs):
+        category = None
+        if request.GET.get("category"):
+            category = Category.objects.filter(slug=request.GET["category"]).first()
+            if category is None:
+                return JsonResponse({"error": f"Unknown category '{request.GET['category']}'."}, status=400)
+        return JsonResponse({"attributes": get_attribute_values(category)})
+
+
+class ProductSearchView(View):
+    """
+    Full-text search, best match first. GET /products/search/?q=<text>&limit=20
+    Ranked by relevance, so results are capped by `limit` rather than cursor-paginated.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "")
+        try:
+            limit = min(int(request.GET.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        ranked = search_products(query, limit=max(limit, 1))
+        products = catalog_queryset().in_bulk([pk for pk, _ in ranked])
+        prefetch_product_images(products.values())
+        results = []
+        for pk, rank in ranked:
+            if pk in products:
+                results.append({**serialize_product(products[pk]), "rank": rank})
+        return JsonResponse({"query": query, "results": results})
+
+
+class ProductAutocompleteView(View):
+    """Search-as-you-type suggestions. GET /products/autocomplete/?q=<partial text>"""
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({"suggestions": autocomplete(request.GET.get("q", ""))})
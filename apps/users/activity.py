@@ -0,0 +1,205 @@
+"""
+Throttled login / last-seen tracking.
+
+Django's default `update_last_login` does a full `user.save(update_fields=...)`
+on every login, and `last_login` used to be `auto_now`, so any save rewrote it.
+Instead, the recorder here:
+
+- writes `last_login` on every login right away, but as a single-column UPDATE:
+  PasswordResetTokenGenerator hashes it, and a login must invalidate the reset
+  tokens issued before it, so it can be neither throttled nor delayed,
+- writes `last_seen` at most once per `USER_ACTIVITY_INTERVAL` seconds per user
+  (the value already on the loaded user counts, so the throttle holds across
+  workers too),
+- buffers those writes in memory and flushes them as one single-column UPDATE
+  per batch:
+
+      UPDATE users_customuser
+         SET last_seen = CASE WHEN id = 1 THEN '...' WHEN id = 7 THEN '...' END
+       WHERE id IN (1, 7)
+
+- appends every login to the narrow LoginEvent table with one bulk INSERT per flush.
+
+Usage:
+    from apps.users.activity import user_activity
+    user_activity.record_login(user, ip="203.0.113.7")   # wired to user_logged_in
+    user_activity.touch(user)                            # LastSeenMiddleware
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+from .models import LoginEvent
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FIELDS = ("last_seen",)
+
+
+class ActivityRecorder:
+    """
+    In-process buffer of last_seen timestamps and login events.
+
+    `interval`: min seconds between two recorded timestamps of the same field for one user.
+    `flush_interval`: max seconds a pending write waits in memory.
+    `max_pending`: flush early once this many users have pending writes.
+    `background`: flush from a timer thread when traffic stops, instead of only on the next call.
+    """
+    def __init__(self, interval=300, flush_interval=10, max_pending=1000, batch_size=500, background=True):
+        self.interval = timedelta(seconds=interval)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.background = background
+        self._pending = {field: {} for field in ACTIVITY_FIELDS}  # field -> user_id -> timestamp
+        self._events = []  # LoginEvent instances not written yet
+        self._recorded = {}  # (user_id, field) -> last timestamp we queued, for the throttle
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def record_login(self, user, ip=None):
+        now = timezone.now()
+        get_user_model()._default_manager.filter(pk=user.pk).update(last_login=now)
+        user.last_login = now
+        with self._lock:
+            self._events.append(LoginEvent(user_id=user.pk, created_at=now, ip_address=ip or None))
+            for field in ACTIVITY_FIELDS:
+                self._queue(user, field, now)
+        self._maybe_flush()
+
+    def touch(self, user):
+        """Note that `user` is active right now (cheap; usually a no-op)."""
+        now = timezone.now()
+        with self._lock:
+            queued = self._queue(user, "last_seen", now)
+        if queued:
+            self._maybe_flush()
+
+    async def atouch(self, user):
+        """touch() for async middleware: a flush that falls due runs in a thread."""
+        now = timezone.now()
+        with self._lock:
+            queued = self._queue(user, "last_seen", now)
+        if queued and self._flush_due():
+            await sync_to_async(self.flush_quietly)()
+
+    def _queue(self, user, field, now):
+        # Called with self._lock held.
+        known = [value for value in (user.__dict__.get(field), self._recorded.get((user.pk, field))) if value]
+        if known and now - max(known) < self.interval:
+            return False
+        self._recorded[(user.pk, field)] = now
+        self._pending[field][user.pk] = now
+        # Keep the loaded instance consistent with what will be written.
+        setattr(user, field, now)
+        return True
+
+    def _maybe_flush(self):
+        if self._flush_due():
+            self.flush_quietly()
+
+    def _flush_due(self):
+        """True when pending writes should go out now; otherwise make sure the timer will."""
+        with self._lock:
+            pending_users = max(len(values) for values in self._pending.values())
+        if pending_users >= self.max_pending or time.monotonic() - self._last_flush >= self.flush_interval:
+            return True
+        if self.background:
+            self._arm_timer()
+        return False
+
+    def flush(self):
+        """Write every pending timestamp and login event. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {field: {} for field in ACTIVITY_FIELDS}
+                events, self._events = self._events, []
+                self._last_flush = time.monotonic()
+                # Entries older than the interval no longer throttle anything.
+                cutoff = timezone.now() - self.interval
+                self._recorded = {key: value for key, value in self._recorded.items() if value > cutoff}
+            if not events and not any(pending.values()):
+                return 0
+            try:
+                return self._write(pending, events)
+            except Exception:
+                # Put everything back (newer values win) so the next flush retries.
+                with self._lock:
+                    for field, values in pending.items():
+                        for user_id, value in values.items():
+                            self._pending[field].setdefault(user_id, value)
+                    self._events[:0] = events
+                logger.exception("Flushing user activity failed; will retry.")
+                raise
+
+    def flush_quietly(self):
+        """flush() for callers that must not fail (requests, timers, exit): errors are logged and retried later."""
+        try:
+            return self.flush()
+        except Exception:
+            return 0
+
+    def _write(self, pending, events):
+        User = get_user_model()
+        written = 0
+        with transaction.atomic():
+            for field, values in pending.items():
+                user_ids = sorted(values)  # stable lock order across workers
+                for i in range(0, len(user_ids), self.batch_size):
+                    chunk = user_ids[i:i + self.batch_size]
+                    whens = [When(pk=user_id, then=Value(values[user_id])) for user_id in chunk]
+                    written += User._default_manager.filter(pk__in=chunk).update(
+                        **{field: Case(*whens, default=F(field), output_field=DateTimeField())}
+                    )
+            if events:
+                # Users deleted since their login would violate the FK.
+                existing = set(User._default_manager.filter(pk__in={event.user_id for event in events}).values_list("pk", flat=True))
+                events = [event for event in events if event.user_id in existing]
+                written += len(LoginEvent.objects.bulk_create(events, batch_size=self.batch_size))
+        return written
+
+    def _arm_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush_quietly()
+        finally:
+            # The timer thread got its own DB connection; don't leak it.
+            connection.close()
+
+
+def prune_login_history(days=None):
+    """Delete LoginEvent rows older than `days` (LOGIN_HISTORY_RETENTION_DAYS). Returns the count."""
+    days = days if days is not None else getattr(settings, "LOGIN_HISTORY_RETENTION_DAYS", 90)
+    deleted, _ = LoginEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+user_activity = ActivityRecorder(
+    interval=getattr(settings, "USER_ACTIVITY_INTERVAL", 300),
+    flush_interval=getattr(settings, "USER_ACTIVITY_FLUSH_INTERVAL", 10),
+    max_pending=getattr(settings, "USER_ACTIVITY_MAX_PENDING", 1000),
+    background=getattr(settings, "USER_ACTIVITY_BACKGROUND_FLUSH", True),
+)
+
+if getattr(settings, "FLUSH_BUFFERS_ON_EXIT", True):
+    atexit.register(user_activity.flush_quietly)
@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from apps.common.uploads import ImageUploadAdminMixin
 from .models import CustomUser, Address
 
 # Register your models here.
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ImageUploadAdminMixin, UserAdmin):
     model = CustomUser
     list_display = ('email', 'first_name', 'last_name', 'is_staff','is_superuser',  'is_active')
     list_filter = ('is_staff', 'is_active', 'is_superuser')
@@ -12,8 +13,10 @@ class CustomUserAdmin(UserAdmin):
         (None, {'fields': ('email', 'password')}),
         ('Personal Info', {'fields': ('first_name', 'last_name', 'phone_number', 'date_of_birth', 'profile_image')}),
         ('Permissions', {'fields': ('is_staff', 'is_active', 'is_superuser', 'groups', 'user_permissions')}),
-        ('Important Dates', {'fields': ('last_login', 'date_joined')})
+        ('Important Dates', {'fields': ('last_login', 'last_seen', 'date_joined')})
     )
+    # Maintained by apps/users/activity.py; saving the form must not overwrite them.
+    readonly_fields = ('last_login', 'last_seen', 'date_joined')
     search_fields = ('email', 'first_name', 'last_name')
     list_editable = ('is_staff', 'is_superuser')
     ordering = ('email',)
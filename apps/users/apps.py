@@ -5,3 +5,9 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = "User Management"
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+        # Replaced by the throttled recorder in signals.py (django.contrib.auth connects it first).
+        user_logged_in.disconnect(dispatch_uid="update_last_login")
+        from . import signals  # noqa: F401
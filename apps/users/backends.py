@@ -13,9 +13,12 @@
 #             return user
 #         return None
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+
+from .sessions import get_cached_user
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
@@ -23,11 +26,33 @@ class EmailBackend(ModelBackend):
         if email is None or password is None:
             return None
         try:
-            user = UserModel.objects.get(Q(email__iexact=email))
+            # Emails are stored lowercased, so an exact match hits the unique index
+            # (email__iexact can't use it and scans the whole table).
+            user = UserModel._default_manager.get_by_natural_key(email)
         except UserModel.DoesNotExist:
-            return None
-        except UserModel.MultipleObjectsReturned:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            # (no timing oracle for which emails have accounts).
+            UserModel().set_password(password)
             return None
         if user.check_password(password) and self.user_can_authenticate(user):
             return user
         return None
+
+    def get_user(self, user_id):
+        # Runs on every request with a session; served from cache in the "cache" session mode.
+        if not getattr(settings, "AUTH_USER_CACHE", False):
+            return super().get_user(user_id)
+        user = get_cached_user(user_id, self._load_user)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # request.auser() in async views. ModelBackend's version would skip the user cache.
+        if not getattr(settings, "AUTH_USER_CACHE", False):
+            return await super().aget_user(user_id)
+        return await sync_to_async(self.get_user)(user_id)
+
+    def _load_user(self, user_id):
+        try:
+            return get_user_model()._default_manager.get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
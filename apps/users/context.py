@@ -0,0 +1,102 @@
+"""
+The logged-in user's profile context: UserSettings and addresses.
+
+Profile, address and settings pages all need the same rows. `get_user_context()`
+loads them once per request (memoized on the request) and keeps them in the
+shared cache for USER_CONTEXT_CACHE_TIMEOUT seconds, so a warm profile page costs
+no query for them at all and a cold one exactly two:
+
+    SELECT ... FROM users_usersettings WHERE user_id = %s
+    SELECT ... FROM users_address WHERE user_id = %s
+
+Settings that don't exist yet are not created here (no INSERT on a GET): the
+context holds an unsaved UserSettings with the defaults. The settings view saves
+it with update_or_create(), so two concurrent first saves update one row instead
+of racing to insert it. Saving or deleting settings or addresses invalidates the
+cached copy (users/signals.py). Async views use `aget_user_context()`, which
+sends the two queries together.
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Address, UserSettings
+
+CACHE_KEY = "apps.users.user-context:{}"
+
+
+class UserContext:
+    def __init__(self, user, settings, addresses):
+        self.user = user
+        self.settings = settings
+        self.addresses = addresses
+
+
+def load_user_context(user):
+    user_settings = UserSettings.objects.filter(user_id=user.pk).first()
+    addresses = list(Address.objects.filter(user_id=user.pk).order_by("id"))
+    return UserContext(user, user_settings, addresses)
+
+
+async def aload_user_context(user):
+    """load_user_context() for async views: both queries are issued together."""
+    user_settings, addresses = await asyncio.gather(
+        UserSettings.objects.filter(user_id=user.pk).afirst(),
+        _alist(Address.objects.filter(user_id=user.pk).order_by("id")),
+    )
+    return UserContext(user, user_settings, addresses)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+def get_user_context(request):
+    """UserContext for request.user (authenticated), memoized on the request."""
+    context = getattr(request, "_user_context", None)
+    if context is not None:
+        return context
+    user = request.user
+    key = CACHE_KEY.format(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        context = load_user_context(user)
+        cache.set(key, (context.settings, context.addresses), _timeout())
+    else:
+        context = UserContext(user, *cached)
+    return _finish(request, context)
+
+
+async def aget_user_context(request):
+    """get_user_context() for async views (request.user must already be loaded)."""
+    context = getattr(request, "_user_context", None)
+    if context is not None:
+        return context
+    user = request.user
+    key = CACHE_KEY.format(user.pk)
+    cached = await cache.aget(key)
+    if cached is None:
+        context = await aload_user_context(user)
+        await cache.aset(key, (context.settings, context.addresses), _timeout())
+    else:
+        context = UserContext(user, *cached)
+    return _finish(request, context)
+
+
+def _timeout():
+    return getattr(settings, "USER_CONTEXT_CACHE_TIMEOUT", 60)
+
+
+def _finish(request, context):
+    user = request.user
+    if context.settings is None:
+        context.settings = UserSettings(user=user)
+    else:
+        context.settings.user = user  # avoid a query if a template follows settings.user
+    request._user_context = context
+    return context
+
+
+def invalidate_user_context(user_id):
+    cache.delete(CACHE_KEY.format(user_id))
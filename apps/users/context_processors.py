@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .preferences import Preferences
+
+
+def preferences(request):
+    """
+    Expose `preferences` (dark_mode, receive_emails, ...) to every template.
+    Read from the bitfield on request.user: no query besides loading the user,
+    and lazy, so pages that don't use it don't even load that.
+    """
+    def load():
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return Preferences(user.preferences)
+        return Preferences()
+
+    return {"preferences": SimpleLazyObject(load)}
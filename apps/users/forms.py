@@ -14,6 +14,8 @@ from .models.address import Address
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 
+from apps.common.uploads import ImageUploadField
+
 User = get_user_model()
 
 # For registering new users.
@@ -21,6 +23,7 @@ class CustomUserCreationForm(UserCreationForm):
     class Meta:
         model = CustomUser
         fields = ['email', 'first_name', 'last_name', 'phone_number', 'date_of_birth', 'profile_image']
+        field_classes = {'profile_image': ImageUploadField}  # header-only image check (apps/common/uploads.py)
 
 # For updating user info.
 class CustomUserChangeForm(UserChangeForm):
@@ -28,6 +31,7 @@ class CustomUserChangeForm(UserChangeForm):
     class Meta:
         model = CustomUser
         fields = ['email', 'first_name', 'last_name', 'phone_number', 'date_of_birth', 'profile_image']
+        field_classes = {'profile_image': ImageUploadField}  # header-only image check (apps/common/uploads.py)
 
 # login form
 # class LoginForm(AuthenticationForm):
@@ -0,0 +1,255 @@
+"""
+Password hashing.
+
+- `Argon2idPasswordHasher`: Argon2id with memory/time cost and parallelism taken
+  from settings (ARGON2_*), so they can be tuned per environment. Hashes made
+  with other parameters (or by another hasher in PASSWORD_HASHERS) are upgraded
+  on the next successful login.
+- `schedule_rehash()`: the upgrade itself costs one more full hash. It runs on a
+  background thread instead of inside the login request. The write is a
+  compare-and-set on the old hash, so a password changed in the meantime is
+  never overwritten.
+- `make_password()` / `check_password()`: what CustomUser uses. With
+  PASSWORD_HASH_MODE = "pool" the hashing runs in a bounded process pool
+  (`hashing_pool`) instead of on the request thread, so a login burst can't pin
+  every web worker. Past PASSWORD_HASH_POOL_MAX_QUEUE waiting jobs they raise
+  HashingPoolBusy, which HashingBackpressureMiddleware turns into a 503.
+
+The hashing profile (which hashers, in which order) is picked in core/settings.py
+with PASSWORD_HASHING_PROFILE.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers as django_hashers
+from django.contrib.auth.hashers import Argon2PasswordHasher
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class Argon2idPasswordHasher(Argon2PasswordHasher):
+    """Django's Argon2 hasher (argon2id) with costs from settings instead of class constants."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, "ARGON2_TIME_COST", Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        # KiB
+        return getattr(settings, "ARGON2_MEMORY_COST", Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, "ARGON2_PARALLELISM", Argon2PasswordHasher.parallelism)
+
+
+# ---------------------------------------------------------------------------
+# Bounded hashing pool
+# ---------------------------------------------------------------------------
+
+class HashingPoolBusy(Exception):
+    """The hashing pool is saturated (or too slow); the request should be retried later."""
+
+
+def _init_worker():
+    # Pool processes may be spawned rather than forked: give them a configured Django.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+
+
+def _hash_in_worker(raw_password):
+    return django_hashers.make_password(raw_password)
+
+
+def _verify_in_worker(raw_password, encoded):
+    """(is_correct, must_update): the caller decides what to do about outdated hashes."""
+    must_update = []
+    is_correct = django_hashers.check_password(raw_password, encoded, setter=lambda raw: must_update.append(True))
+    return is_correct, bool(must_update)
+
+
+class HashingPool:
+    """
+    A process pool for password hashing with a hard limit on waiting work.
+
+    `workers`: hashing processes (defaults to the number of cores).
+    `max_queue`: jobs allowed in flight (running + waiting); more raise HashingPoolBusy at once.
+    `timeout`: seconds a caller waits for its result before giving up with HashingPoolBusy.
+    """
+    def __init__(self, workers=None, max_queue=32, timeout=5.0, latency_samples=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_samples)  # ms, most recent jobs
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._executor
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` in the pool and wait for the result; HashingPoolBusy when saturated."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingPoolBusy("Too many password hashing jobs waiting.")
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        started = time.perf_counter()
+        future = self._get_executor().submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The job keeps its slot until it actually finishes.
+            with self._lock:
+                self._timeouts += 1
+            raise HashingPoolBusy("Password hashing timed out.")
+        self.record_latency((time.perf_counter() - started) * 1000)
+        return result
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def record_latency(self, ms):
+        with self._lock:
+            self._latencies.append(ms)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+            data = {
+                "mode": getattr(settings, "PASSWORD_HASH_MODE", "inline"),
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "saturation": round(in_flight / self.max_queue, 3),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+            }
+        if latencies:
+            data["latency_ms"] = {
+                "p50": round(latencies[len(latencies) // 2], 2),
+                "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+                "max": round(latencies[-1], 2),
+                "samples": len(latencies),
+            }
+        return data
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, "PASSWORD_HASH_POOL_WORKERS", None),
+    max_queue=getattr(settings, "PASSWORD_HASH_POOL_MAX_QUEUE", 32),
+    timeout=getattr(settings, "PASSWORD_HASH_POOL_TIMEOUT", 5.0),
+)
+atexit.register(hashing_pool.shutdown)
+
+
+def _use_pool():
+    return getattr(settings, "PASSWORD_HASH_MODE", "inline") == "pool"
+
+
+def make_password(raw_password):
+    """django.contrib.auth.hashers.make_password, in the pool when PASSWORD_HASH_MODE = "pool"."""
+    if raw_password is None:
+        return django_hashers.make_password(None)  # unusable password, nothing to hash
+    if _use_pool():
+        return hashing_pool.run(_hash_in_worker, raw_password)
+    started = time.perf_counter()
+    encoded = django_hashers.make_password(raw_password)
+    hashing_pool.record_latency((time.perf_counter() - started) * 1000)
+    return encoded
+
+
+def check_password(raw_password, encoded, setter=None):
+    """django.contrib.auth.hashers.check_password, in the pool when PASSWORD_HASH_MODE = "pool"."""
+    if not _use_pool():
+        started = time.perf_counter()
+        is_correct = django_hashers.check_password(raw_password, encoded, setter)
+        hashing_pool.record_latency((time.perf_counter() - started) * 1000)
+        return is_correct
+    if raw_password is None or not django_hashers.is_password_usable(encoded):
+        return False
+    is_correct, must_update = hashing_pool.run(_verify_in_worker, raw_password, encoded)
+    if is_correct and must_update and setter:
+        setter(raw_password)
+    return is_correct
+
+
+# ---------------------------------------------------------------------------
+# Background rehash-on-login
+# ---------------------------------------------------------------------------
+
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-rehash")
+_rehash_slots = threading.BoundedSemaphore(getattr(settings, "PASSWORD_REHASH_MAX_PENDING", 100))
+
+
+def rehash_password(user_id, old_encoded, raw_password):
+    """Store a fresh hash of `raw_password` unless the password changed since `old_encoded` was read."""
+    User = get_user_model()
+    # _base_manager: the default one's update() would bump password_changed_at and end sessions.
+    updated = User._base_manager.filter(pk=user_id, password=old_encoded).update(password=make_password(raw_password))
+    return bool(updated)
+
+
+def schedule_rehash(user_id, old_encoded, raw_password):
+    """
+    Upgrade a user's password hash off the request path. Under a login storm,
+    upgrades beyond PASSWORD_REHASH_MAX_PENDING are dropped. They are retried on
+    that user's next login.
+    """
+    if user_id is None:
+        return
+    if not getattr(settings, "PASSWORD_REHASH_IN_BACKGROUND", True):
+        rehash_password(user_id, old_encoded, raw_password)
+        return
+    if not _rehash_slots.acquire(blocking=False):
+        logger.debug("Password rehash queue full; skipping upgrade for user %s.", user_id)
+        return
+    _rehash_executor.submit(_rehash_in_background, user_id, old_encoded, raw_password)
+
+
+def _rehash_in_background(user_id, old_encoded, raw_password):
+    try:
+        rehash_password(user_id, old_encoded, raw_password)
+    except HashingPoolBusy:
+        pass  # the pool is serving logins; retried on the next one
+    except Exception:
+        logger.exception("Upgrading the password hash of user %s failed.", user_id)
+    finally:
+        _rehash_slots.release()
+        # This thread got its own DB connection; don't leak it.
+        connection.close()
@@ -0,0 +1,48 @@
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure hashing and verification cost of each PASSWORD_HASHING_PROFILES entry "
+        "(its first hasher, with the current ARGON2_* settings). Runs on one core, so "
+        "verifications/s is the login throughput per core."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="append", help="Profile(s) to run (default: all).")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        profiles = options["profile"] or list(settings.PASSWORD_HASHING_PROFILES)
+        unknown = set(profiles) - set(settings.PASSWORD_HASHING_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}.")
+
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"Active profile: {settings.PASSWORD_HASHING_PROFILE}, {cores} cores")
+        for profile in profiles:
+            hasher = import_string(settings.PASSWORD_HASHING_PROFILES[profile][0])()
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            hash_timings, verify_timings = [], []
+            for _ in range(options["iterations"]):
+                started = time.perf_counter()
+                hasher.encode(PASSWORD, hasher.salt())
+                hash_timings.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                hasher.verify(PASSWORD, encoded)
+                verify_timings.append((time.perf_counter() - started) * 1000)
+            verify_ms = statistics.median(verify_timings)
+            self.stdout.write(
+                f"{profile:>8} ({hasher.algorithm}): hash {statistics.median(hash_timings):8.2f} ms, "
+                f"verify {verify_ms:8.2f} ms -> {1000 / verify_ms:8.1f} logins/s per core"
+            )
+            summary = ", ".join(f"{key}={value}" for key, value in hasher.safe_summary(encoded).items() if key not in ("salt", "hash"))
+            self.stdout.write(f"{'':>8}  {summary}")
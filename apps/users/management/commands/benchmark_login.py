@@ -0,0 +1,119 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+BENCH_EMAIL = "bench-user-{}@example.com"
+BENCH_PASSWORD = "bench-password-1"
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    return (
+        statistics.median(timings),
+        timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users (bench-user-N@example.com) and measure login throughput: "
+        "the email lookup alone (indexed exact match vs. the old email__iexact scan) "
+        "and full EmailBackend.authenticate() for hits, wrong passwords and unknown emails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000, help="Users to have in the table (seeded once, reused).")
+        parser.add_argument("--lookups", type=int, default=2000, help="Email lookups per lookup strategy.")
+        parser.add_argument("--logins", type=int, default=50, help="authenticate() calls per scenario (each one hashes).")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic users and exit.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        bench_users = User.objects.filter(email__startswith="bench-user-", email__endswith="@example.com")
+        if options["cleanup"]:
+            deleted, _ = bench_users.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} rows."))
+            return
+
+        self.seed(User, bench_users, options["users"], options["batch_size"])
+        total = options["users"]
+        rng = random.Random(42)
+
+        # Mixed case on purpose: what people type into the login form.
+        def some_email():
+            return BENCH_EMAIL.format(rng.randrange(total)).replace("bench", "Bench", 1)
+
+        self.stdout.write(f"Email lookup ({options['lookups']} each, no hashing):")
+        lookups = {
+            "exact (indexed)": lambda email: User._default_manager.get_by_natural_key(email),
+            "iexact (old)": lambda email: User._default_manager.get(email__iexact=email),
+        }
+        for name, lookup in lookups.items():
+            timings = []
+            for _ in range(options["lookups"]):
+                email = some_email()
+                started = time.perf_counter()
+                lookup(email)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.report(name, timings)
+        self.explain(User)
+
+        self.stdout.write(f"authenticate() ({options['logins']} each):")
+        scenarios = {
+            "valid": lambda: (some_email(), BENCH_PASSWORD),
+            "wrong password": lambda: (some_email(), "not-the-password"),
+            "unknown email": lambda: (f"nobody-{rng.randrange(10**9)}@example.com", BENCH_PASSWORD),
+        }
+        for name, make_credentials in scenarios.items():
+            timings = []
+            for _ in range(options["logins"]):
+                email, password = make_credentials()
+                started = time.perf_counter()
+                authenticate(email=email, password=password)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.report(name, timings)
+        self.stdout.write("Unknown emails should cost about the same as wrong passwords (dummy hash).")
+
+    def seed(self, User, bench_users, total, batch_size):
+        existing = bench_users.count()
+        if existing >= total:
+            return
+        self.stdout.write(f"Seeding {total - existing} users...")
+        # Hash once: hashing a million passwords would take hours and measures nothing here.
+        password = make_password(BENCH_PASSWORD)
+        started = time.perf_counter()
+        for start in range(existing, total, batch_size):
+            User.objects.bulk_create(
+                [
+                    User(email=BENCH_EMAIL.format(i), first_name="Bench", password=password)
+                    for i in range(start, min(start + batch_size, total))
+                ],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+            elif connection.vendor == "postgresql":
+                cursor.execute(f"ANALYZE {User._meta.db_table}")
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s.")
+
+    def explain(self, User):
+        email = BENCH_EMAIL.format(0)
+        for name, queryset in (
+            ("exact", User._default_manager.filter(email=email)),
+            ("iexact", User._default_manager.filter(email__iexact=email)),
+        ):
+            plan = " | ".join(line.strip() for line in queryset.explain().splitlines())
+            self.stdout.write(f"  plan {name:>6}: {plan}")
+
+    def report(self, name, timings):
+        p50, p99 = _percentiles(timings)
+        per_second = len(timings) / (sum(timings) / 1000) if sum(timings) else float("inf")
+        self.stdout.write(f"  {name:>16}: p50 {p50:8.2f} ms, p99 {p99:8.2f} ms, {per_second:9.1f}/s")
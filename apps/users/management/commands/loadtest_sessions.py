@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.users.sessions import local_sessions, local_users
+
+BENCH_EMAIL = "bench-session-{}@example.com"
+DEFAULT_URLS = ["/users/profile/", "/users/addresses/", "/users/settings/update/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test logged-in page views under each session mode (SESSION_ENGINES): "
+        "latency, and session/user queries per request. Uses synthetic users that are removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", action="append", help="Session mode(s) to run (default: all).")
+        parser.add_argument("--requests", type=int, default=300, help="Requests per mode.")
+        parser.add_argument("--users", type=int, default=20, help="Concurrent sessions (round-robin).")
+        parser.add_argument("--url", action="append", help=f"Page(s) to request (default: {', '.join(DEFAULT_URLS)}).")
+
+    def handle(self, *args, **options):
+        modes = options["mode"] or list(settings.SESSION_ENGINES)
+        unknown = set(modes) - set(settings.SESSION_ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}.")
+        urls = options["url"] or DEFAULT_URLS
+
+        User = get_user_model()
+        users = [
+            User.objects.get_or_create(email=BENCH_EMAIL.format(i), defaults={"first_name": "Bench"})[0]
+            for i in range(options["users"])
+        ]
+        self._session_keys = []
+        try:
+            for mode in modes:
+                self.run_mode(mode, users, urls, options["requests"])
+        finally:
+            Session.objects.filter(session_key__in=self._session_keys).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run_mode(self, mode, users, urls, total):
+        with override_settings(
+            SESSION_ENGINE=settings.SESSION_ENGINES[mode],
+            AUTH_USER_CACHE=mode == "cache",
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            caches[settings.SESSION_CACHE_ALIAS].clear()
+            local_sessions.clear()
+            local_users.clear()
+            clients = []
+            for user in users:
+                client = Client()
+                client.force_login(user)
+                client.get(urls[0])  # warm-up
+                clients.append(client)
+                if client.session.session_key:
+                    self._session_keys.append(client.session.session_key)
+
+            timings, queries, session_queries, user_queries = [], 0, 0, 0
+            for i in range(total):
+                client = clients[i % len(clients)]
+                url = urls[i % len(urls)]
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} returned {response.status_code} in mode '{mode}'.")
+                queries += len(captured)
+                session_queries += sum('"django_session"' in query["sql"] for query in captured)
+                user_queries += sum('FROM "users_customuser"' in query["sql"] for query in captured)
+
+        timings.sort()
+        self.stdout.write(
+            f"{mode:>15}: p50 {statistics.median(timings):7.2f} ms, "
+            f"p99 {timings[min(len(timings) - 1, int(len(timings) * 0.99))]:7.2f} ms, "
+            f"{len(timings) / (sum(timings) / 1000):8.1f} req/s | per request: "
+            f"{queries / total:5.2f} queries, {session_queries / total:4.2f} session, {user_queries / total:4.2f} user"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.activity import prune_login_history
+
+
+class Command(BaseCommand):
+    help = "Delete login history (LoginEvent rows) older than LOGIN_HISTORY_RETENTION_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Override the retention period.")
+
+    def handle(self, *args, **options):
+        deleted = prune_login_history(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} login events."))
@@ -0,0 +1,63 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.fanout import run_mailing
+from apps.common.models import Mailing
+
+
+class Command(BaseCommand):
+    help = (
+        "Mail every active user with receive_emails on. Runs are named: running the same "
+        "name again resumes from its checkpoint (a finished one is left alone unless --restart)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Identifies the run, e.g. 2026-10-newsletter.")
+        parser.add_argument("--subject", help="Required for a new run.")
+        parser.add_argument("--template", default="users/emails/newsletter.html")
+        parser.add_argument("--context", default="{}", help='JSON for the template, e.g. \'{"headline": "...", "body": "..."}\'.')
+        parser.add_argument("--chunk-size", type=int, help="Recipients per chunk (default: MAILING_CHUNK_SIZE).")
+        parser.add_argument("--workers", type=int, help="Render processes, 0 = none (default: MAILING_RENDER_WORKERS).")
+        parser.add_argument("--restart", action="store_true", help="Start over from the first recipient.")
+        parser.add_argument("--email-backend", help="Override EMAIL_BACKEND, e.g. the dummy backend for a timing run.")
+
+    def handle(self, *args, **options):
+        try:
+            context = json.loads(options["context"])
+        except ValueError as exc:
+            raise CommandError(f"--context is not valid JSON: {exc}")
+
+        mailing = Mailing.objects.filter(name=options["name"]).first()
+        if mailing is None:
+            if not options["subject"]:
+                raise CommandError("--subject is required for a new run.")
+            mailing = Mailing.objects.create(
+                name=options["name"], subject=options["subject"],
+                template_name=options["template"], context=context,
+            )
+        elif options["restart"]:
+            mailing.status, mailing.last_recipient_id = Mailing.STATUS_RUNNING, 0
+            mailing.sent_count = mailing.failed_count = 0
+            mailing.finished_at = None
+            mailing.save()
+        elif mailing.status == Mailing.STATUS_DONE:
+            self.stdout.write(f"'{mailing.name}' already finished ({mailing.sent_count} sent). Use --restart to send it again.")
+            return
+        elif mailing.last_recipient_id:
+            self.stdout.write(f"Resuming '{mailing.name}' after user {mailing.last_recipient_id}.")
+
+        recipients = get_user_model().objects.with_preference("receive_emails").filter(is_active=True)
+        mailing = run_mailing(
+            mailing, recipients,
+            chunk_size=options["chunk_size"], workers=options["workers"], progress=self.progress,
+            email_backend=options["email_backend"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"'{mailing.name}': {mailing.sent_count} sent, {mailing.failed_count} handed to the outbox for retry."
+        ))
+
+    def progress(self, mailing, sent, elapsed):
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(f"  up to user {mailing.last_recipient_id}: {mailing.sent_count} sent, {rate:,.0f}/s")
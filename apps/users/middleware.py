@@ -0,0 +1,69 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.shortcuts import render
+from django.utils.functional import empty
+
+from .activity import user_activity
+from .hashers import HashingPoolBusy
+
+
+class LastSeenMiddleware:
+    """
+    Records `last_seen` for authenticated users (throttled and batched, see activity.py).
+    Only looks at requests where something already loaded request.user, so it never
+    adds a session or user query of its own.
+    Sync and async: under ASGI it doesn't push async views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = self._loaded_user(request)
+        if user is not None:
+            user_activity.touch(user)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user = self._loaded_user(request)
+        if user is not None:
+            await user_activity.atouch(user)
+        return response
+
+    def _loaded_user(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and getattr(user, "_wrapped", None) is not empty and user.is_authenticated:
+            return user
+        return None
+
+
+class HashingBackpressureMiddleware:
+    """
+    Fail fast with a 503 when the password hashing pool is saturated (see hashers.py),
+    instead of letting login/registration requests pile up behind it.
+    """
+    retry_after = 5  # seconds
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        return self.get_response(request)  # a coroutine under ASGI, awaited by the handler
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingPoolBusy):
+            return None
+        response = render(request, "users/busy.html", status=503)
+        response["Retry-After"] = str(self.retry_after)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+import django.db.models.functions.text
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def lowercase_emails(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    by_email = defaultdict(list)
+    for pk, email in CustomUser.objects.values_list('pk', 'email').iterator(chunk_size=5000):
+        by_email[email.strip().lower()].append((pk, email))
+    duplicates = {email: rows for email, rows in by_email.items() if len(rows) > 1}
+    if duplicates:
+        listing = ', '.join(f"{email} (ids {', '.join(str(pk) for pk, _ in rows)})" for email, rows in list(duplicates.items())[:20])
+        raise RuntimeError(f'Accounts whose emails differ only in case must be merged before migrating: {listing}')
+    changed = [CustomUser(pk=rows[0][0], email=email) for email, rows in by_email.items() if rows[0][1] != email]
+    CustomUser.objects.bulk_update(changed, ['email'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_login_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.CheckConstraint(condition=models.Q(('email', django.db.models.functions.text.Lower('email'))), name='users_email_lowercase'),
+        ),
+    ]
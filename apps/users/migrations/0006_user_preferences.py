@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+# Frozen copy of apps.users.preferences.PREFERENCE_BITS as of this migration, so later
+# changes there don't change what this migration writes.
+PREFERENCE_BITS = {
+    'receive_emails': 1 << 0,
+    'dark_mode': 1 << 1,
+    'show_email_publicly': 1 << 2,
+    'show_phone_number_publicly': 1 << 3,
+    'show_date_of_birth_publicly': 1 << 4,
+    'show_profile_image_publicly': 1 << 5,
+    'show_full_name_publicly': 1 << 6,
+    'show_last_login': 1 << 7,
+    'show_date_joined': 1 << 8,
+}
+
+
+def pack_preferences(user_settings):
+    value = 0
+    for name, bit in PREFERENCE_BITS.items():
+        if getattr(user_settings, name):
+            value |= bit
+    return value
+
+
+def pack_existing_settings(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    UserSettings = apps.get_model('users', 'UserSettings')
+    users = [
+        CustomUser(pk=user_settings.user_id, preferences=pack_preferences(user_settings))
+        for user_settings in UserSettings.objects.iterator(chunk_size=2000)
+    ]
+    CustomUser.objects.bulk_update(users, ['preferences'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0005_password_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='preferences',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(pack_existing_settings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(models.Func(models.F('preferences'), output_field=models.PositiveIntegerField(), template='(%(expressions)s & 1)'), models.F('id'), name='users_pref_receive_emails_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
 from .user import CustomUser
 from .address import Address
-from .user import UserSettings
\ No newline at end of file
+from .user import UserSettings
+from .activity import LoginEvent
@@ -0,0 +1,25 @@
+from django.db import models
+from django.conf import settings
+
+
+class LoginEvent(models.Model):
+    """
+    Append-only login history: one narrow row per successful login.
+    Written in batches by apps/users/activity.py; old rows are removed by the
+    prune_login_history command.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="login_events", db_index=False)
+    created_at = models.DateTimeField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # "recent logins of a user" (the user FK is covered by the leading column)
+            models.Index(fields=['user', '-created_at'], name='users_login_user_recent_idx'),
+            # pruning by age
+            models.Index(fields=['created_at'], name='users_login_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.created_at:%Y-%m-%d %H:%M}"
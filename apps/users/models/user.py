@@ -1,14 +1,57 @@
 from django.db import models
+from django.db.models.functions import Lower
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from apps.users import hashers
+from apps.users.preferences import DEFAULT_PREFERENCES, PREFERENCE_BITS
+
+
+def preference_flag(name):
+    """
+    `preferences & <bit>` with the bit inlined as a literal (F().bitand() would pass it as a
+    query parameter), so the expression matches the index below and the planner can use it.
+    """
+    return models.Func(
+        models.F('preferences'), template=f"(%(expressions)s & {int(PREFERENCE_BITS[name])})",
+        output_field=models.PositiveIntegerField(),
+    )
+
+class CustomUserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # A password written with update() ends sessions like set_password() does (see
+        # CustomUser._get_session_auth_hash). The background rehash uses _base_manager instead.
+        if "password" in kwargs:
+            kwargs.setdefault("password_changed_at", timezone.now())
+        return super().update(**kwargs)
+
+
+class  CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
+    @classmethod
+    def normalize_email(cls, email):
+        """
+        Lowercase the whole address (not just the domain) and trim whitespace, so
+        emails can be looked up with a plain `email=` that uses the unique index.
+        """
+        return super().normalize_email((email or "").strip()).lower()
+
+    def get_by_natural_key(self, username):
+        return self.get(**{self.model.USERNAME_FIELD: self.normalize_email(username)})
+
+    def with_preference(self, name, enabled=True):
+        """Users with preference `name` (see users/preferences.py) on, or off with enabled=False."""
+        bit = PREFERENCE_BITS[name]
+        return self.alias(_preference=preference_flag(name)).filter(_preference=bit if enabled else 0)
 
-class  CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         """
         Creates and saves a regular User with the given email and password.
         """
         if not email:
             raise ValueError("User must have an email address.")
-        email = self.normalize_email(email) # Normalize the email by lowercasing the domain part of the email.
+        email = self.normalize_email(email) # Normalize the email by lowercasing it (see normalize_email).
         user = self.model(email=email, **extra_fields)
         user.set_password(password) # Hashes the password.
         user.save(using=self._db)  # save to the correct database.
@@ -46,18 +89,89 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     # Timestamps
     date_joined = models.DateTimeField(auto_now_add=True)
-    last_login = models.DateTimeField(auto_now=True)
+    # Written only by apps/users/activity.py (throttled, batched), never by save().
+    last_login = models.DateTimeField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True)
+    # Set whenever the password is written (set_password(), set_unusable_password(),
+    # QuerySet.update(password=...)); sessions are tied to it (see _get_session_auth_hash).
+    password_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # UserSettings packed into bits (users/preferences.py); kept in sync by users/signals.py.
+    preferences = models.PositiveIntegerField(default=DEFAULT_PREFERENCES, editable=False)
 
     # Link Manager
     objects = CustomUserManager()
 
+    # Written only with UPDATEs of their own (activity.py, signals.py), never by a full save().
+    TARGETED_UPDATE_FIELDS = ("last_login", "last_seen", "preferences")
+
     # Tell Django which field is used to log in
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name']
 
+    class Meta:
+        constraints = [
+            # Emails are stored normalized (see CustomUserManager.normalize_email); lookups rely on it.
+            models.CheckConstraint(condition=models.Q(email=Lower('email')), name='users_email_lowercase'),
+        ]
+        indexes = [
+            # with_preference("receive_emails") walked in id order: newsletter/notification fan-out
+            models.Index(preference_flag('receive_emails'), models.F('id'), name='users_pref_receive_emails_idx'),
+        ]
+
     def __str__(self):
         return self.email
-    
+
+    def clean(self):
+        super().clean()
+        # Before ModelForm's unique check, so "Foo@x.com" is caught as a duplicate of "foo@x.com".
+        self.email = CustomUserManager.normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        self.email = CustomUserManager.normalize_email(self.email)
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            # A full save of a loaded user (a profile form, a cached request.user) would write
+            # back its possibly stale copy of the columns kept up to date with targeted UPDATEs.
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TARGETED_UPDATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        # hashers.make_password: on the request thread or in the hashing pool (PASSWORD_HASH_MODE)
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+        self.password_changed_at = timezone.now()
+
+    def set_unusable_password(self):
+        super().set_unusable_password()
+        self.password_changed_at = timezone.now()
+
+    def check_password(self, raw_password):
+        # Same as Django's, except that hashing may run in the hashing pool, and an outdated
+        # hash is upgraded in the background instead of hashing again (and saving) in the request.
+        return hashers.check_password(
+            raw_password, self.password, lambda raw: hashers.schedule_rehash(self.pk, self.password, raw)
+        )
+
+    async def acheck_password(self, raw_password):
+        return await sync_to_async(self.check_password)(raw_password)
+
+    def _get_session_auth_hash(self, secret=None):
+        """
+        Django derives this from the password hash, so any rehash (new algorithm or
+        costs, same password) would log the user out. Key it on when the password
+        last changed instead: changing the password, or making it unusable, still
+        ends other sessions.
+        """
+        changed_at = self.password_changed_at or self.date_joined
+        return salted_hmac(
+            "apps.users.CustomUser.get_session_auth_hash",
+            f"{self.pk}:{changed_at.isoformat() if changed_at else ''}",
+            secret=secret,
+            algorithm="sha256",
+        ).hexdigest()
+
 
 class UserSettings(models.Model):
     """
@@ -0,0 +1,60 @@
+"""
+User preferences packed into one integer (CustomUser.preferences).
+
+UserSettings stays the editable record; its nine booleans are mirrored into a
+bitfield on the user row whenever it is saved (users/signals.py). request.user
+is loaded on every authenticated request anyway (and cached in the "cache"
+session mode), so templates get the preferences with no query of their own:
+
+    {% if preferences.dark_mode %}...{% endif %}
+
+and bulk queries filter on the bitfield through an expression index:
+
+    CustomUser.objects.with_preference("receive_emails")
+
+Bits are append-only: never reorder or reuse them, old rows keep their meaning.
+Migration 0006 keeps its own frozen copy of the bits and of pack_preferences().
+"""
+
+PREFERENCE_BITS = {
+    "receive_emails": 1 << 0,
+    "dark_mode": 1 << 1,
+    "show_email_publicly": 1 << 2,
+    "show_phone_number_publicly": 1 << 3,
+    "show_date_of_birth_publicly": 1 << 4,
+    "show_profile_image_publicly": 1 << 5,
+    "show_full_name_publicly": 1 << 6,
+    "show_last_login": 1 << 7,
+    "show_date_joined": 1 << 8,
+}
+# Same defaults as a fresh UserSettings: only receive_emails on.
+DEFAULT_PREFERENCES = PREFERENCE_BITS["receive_emails"]
+
+
+def pack_preferences(user_settings):
+    """UserSettings (or any object with the same boolean attributes) -> int."""
+    value = 0
+    for name, bit in PREFERENCE_BITS.items():
+        if getattr(user_settings, name):
+            value |= bit
+    return value
+
+
+class Preferences:
+    """Read-only view of a packed preferences int: `prefs.dark_mode`, `prefs.as_dict()`."""
+    __slots__ = ("value",)
+
+    def __init__(self, value=DEFAULT_PREFERENCES):
+        self.value = value
+
+    def __getattr__(self, name):
+        try:
+            return bool(self.value & PREFERENCE_BITS[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def as_dict(self):
+        return {name: bool(self.value & bit) for name, bit in PREFERENCE_BITS.items()}
+
+    def __repr__(self):
+        return f"Preferences({self.as_dict()})"
@@ -0,0 +1,142 @@
+"""
+"cache" session mode (SESSION_MODE = "cache" in core/settings.py).
+
+Built on Django's cached_db engine (shared cache in front of django_session,
+the database stays the source of truth), plus:
+
+- a per-process LRU in front of the shared cache, so most requests read their
+  session without any I/O. Other workers see a change after at most
+  SESSION_LOCAL_CACHE_TTL seconds; this worker sees it at once.
+- write-back only when the data actually changed: `request.session[k] = v`
+  with the value it already had marks the session modified, but saving it
+  again would write the same row (unless SESSION_SAVE_EVERY_REQUEST, which
+  saves to push the expiry forward).
+- batched expired-session cleanup (`clearsessions` uses it), instead of one
+  DELETE over the whole expired range holding locks on django_session.
+
+It also caches `request.user` (see `get_cached_user()`, used by EmailBackend)
+the same way, invalidated when the user is saved or deleted.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import caches
+from django.utils import timezone
+
+from apps.common.cache import LRUCache
+
+local_sessions = LRUCache(
+    maxsize=getattr(settings, "SESSION_LOCAL_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "SESSION_LOCAL_CACHE_TTL", 5),
+)
+local_users = LRUCache(
+    maxsize=getattr(settings, "SESSION_LOCAL_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "SESSION_LOCAL_CACHE_TTL", 5),
+)
+USER_CACHE_PREFIX = "apps.users.auth-user:"
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = "apps.users.sessions"
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_data = None  # serialized data as loaded, to detect real changes
+
+    def _serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = self._load_local()
+        if data is None:
+            data = self._remember(super().load())
+        return data
+
+    async def aload(self):
+        # request.auser() in async views reads the session through here.
+        data = self._load_local()
+        if data is None:
+            data = self._remember(await super().aload())
+        return data
+
+    def _load_local(self):
+        if self.session_key is None:
+            return None
+        serialized = local_sessions.get(self.session_key)
+        if serialized is None:
+            return None
+        self._loaded_data = serialized
+        # Deserialize a fresh dict: the caller mutates it in place.
+        return self.serializer().loads(serialized)
+
+    def _remember(self, data):
+        self._loaded_data = self._serialize(data)
+        if data and self.session_key is not None:
+            local_sessions.set(self.session_key, self._loaded_data)
+        return data
+
+    def save(self, must_create=False):
+        data = getattr(self, "_session_cache", None)  # unset = never loaded
+        skippable = not must_create and not settings.SESSION_SAVE_EVERY_REQUEST
+        if skippable and self.session_key is not None and data is not None:
+            serialized = self._serialize(data)
+            if serialized == self._loaded_data:
+                return  # modified, but back to what it was: nothing to write
+        super().save(must_create)
+        self._loaded_data = self._serialize(self._get_session())
+        local_sessions.set(self.session_key, self._loaded_data)
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        super().delete(session_key)
+        if key is not None:
+            local_sessions.delete(key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """Delete expired sessions in batches of primary keys. Returns the number deleted."""
+        batch_size = batch_size or getattr(settings, "SESSION_CLEAR_BATCH_SIZE", 1000)
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=timezone.now())
+                .values_list("session_key", flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+
+
+# ---------------------------------------------------------------------------
+# request.user cache
+# ---------------------------------------------------------------------------
+
+def _shared_cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def get_cached_user(user_id, loader):
+    """
+    The user with `user_id`, from the per-process LRU, then the shared cache,
+    then `loader(user_id)` (None = no such user; not cached).
+    Always returns a private copy, since callers modify request.user freely.
+    """
+    user = local_users.get(user_id)
+    if user is None:
+        user = _shared_cache().get(f"{USER_CACHE_PREFIX}{user_id}")
+        if user is None:
+            user = loader(user_id)
+            if user is None:
+                return None
+            _shared_cache().set(
+                f"{USER_CACHE_PREFIX}{user_id}", user, getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+            )
+        local_users.set(user_id, user)
+    return copy.copy(user)
+
+
+def invalidate_cached_user(user_id):
+    _shared_cache().delete(f"{USER_CACHE_PREFIX}{user_id}")
+    local_users.delete(user_id)
@@ -0,0 +1,47 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .activity import user_activity
+from .context import invalidate_user_context
+from .models import Address, CustomUser, UserSettings
+from .preferences import DEFAULT_PREFERENCES, pack_preferences
+from .sessions import invalidate_cached_user
+
+
+@receiver(user_logged_in, dispatch_uid="users_record_login")
+def record_login(sender, request, user, **kwargs):
+    ip = request.META.get("REMOTE_ADDR") if request is not None else None
+    user_activity.record_login(user, ip=ip)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    # After commit, so no worker can re-cache the old row in between.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def invalidate_user_context_on_change(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_context(user_id))
+
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+def sync_preferences(sender, instance, raw=False, **kwargs):
+    # Mirror the settings into CustomUser.preferences with a single-column UPDATE.
+    if raw:
+        return
+    value = DEFAULT_PREFERENCES if kwargs["signal"] is post_delete else pack_preferences(instance)
+    CustomUser.objects.filter(pk=instance.user_id).update(preferences=value)
+    # update() skips post_save: drop the cached request.user ourselves.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
@@ -1,3 +1,392 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user, get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from django.utils import timezone
+
+from . import hashers
+from .activity import ActivityRecorder
+from .backends import EmailBackend
+from .forms import CustomUserChangeForm
+from .models import LoginEvent, UserSettings
+from .sessions import SessionStore, local_sessions, local_users
+
+User = get_user_model()
+
+
+class ActivityRecorderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(email=f"user{i}@example.com", password="pw") for i in range(3)]
+
+    def recorder(self, **kwargs):
+        return ActivityRecorder(**{"interval": 300, "flush_interval": 3600, "background": False, **kwargs})
+
+    def test_last_seen_is_throttled_per_user(self):
+        recorder = self.recorder()
+        user = User.objects.get(pk=self.users[0].pk)
+        with self.assertNumQueries(0):
+            recorder.touch(user)
+            recorder.touch(user)
+        self.assertEqual(recorder.flush(), 1)
+        seen = User.objects.get(pk=user.pk).last_seen
+        self.assertIsNotNone(seen)
+
+        # Another worker loading the user sees the fresh value and skips the write too.
+        other = self.recorder()
+        other.touch(User.objects.get(pk=user.pk))
+        self.assertEqual(other.flush(), 0)
+
+    def test_logins_are_written_in_one_batch(self):
+        recorder = self.recorder()
+        with self.assertNumQueries(3):  # last_login, one UPDATE per login
+            for user in self.users:
+                recorder.record_login(user, ip="203.0.113.7")
+
+        with self.assertNumQueries(5):  # savepoint, UPDATE last_seen, user check, INSERT, release
+            recorder.flush()
+        self.assertEqual(LoginEvent.objects.count(), 3)
+        self.assertFalse(User.objects.filter(last_login__isnull=True).exists())
+        self.assertFalse(User.objects.filter(last_seen__isnull=True).exists())
+
+    def test_login_invalidates_password_reset_tokens(self):
+        User.objects.filter(pk=self.users[0].pk).update(last_login=timezone.now() - timedelta(minutes=1))
+        user = User.objects.get(pk=self.users[0].pk)
+        token = default_token_generator.make_token(user)
+
+        self.recorder().record_login(user)  # within the throttle interval of the last login
+        self.assertFalse(default_token_generator.check_token(User.objects.get(pk=user.pk), token))
+
+    def test_failed_inline_flush_is_logged_and_retried(self):
+        recorder = self.recorder(flush_interval=0)
+        with mock.patch.object(recorder, "_write", side_effect=DatabaseError("down")):
+            with self.assertLogs("apps.users.activity", "ERROR"):
+                recorder.record_login(self.users[0])  # must not raise
+        self.assertEqual(LoginEvent.objects.count(), 0)
+
+        recorder.flush()
+        self.assertEqual(LoginEvent.objects.count(), 1)
+
+
+class EmailLoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="  Jane.Doe@Example.COM ", password="s3cret", first_name="Jane")
+
+    def test_email_is_stored_normalized(self):
+        self.assertEqual(self.user.email, "jane.doe@example.com")
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            User.objects.filter(pk=self.user.pk).update(email="Jane.Doe@example.com")
+
+    def test_login_is_one_exact_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = authenticate(email="JANE.DOE@example.com", password="s3cret")
+        self.assertEqual(user, self.user)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"].upper()
+        self.assertNotIn("LIKE", sql)
+        self.assertNotIn("LOWER(", sql)
+
+    def test_wrong_password(self):
+        self.assertIsNone(authenticate(email="jane.doe@example.com", password="nope"))
+
+    def test_unknown_email_still_hashes(self):
+        # Same work as a wrong password, so the response time doesn't tell which emails exist.
+        with mock.patch.object(hashers, "make_password", wraps=hashers.make_password) as make_password:
+            self.assertIsNone(authenticate(email="nobody@example.com", password="s3cret"))
+        make_password.assert_called_once_with("s3cret")
+
+
+class PasswordHashingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="hash@example.com", password="s3cret")
+
+    def give_old_hash(self):
+        # PBKDF2 with few iterations: not the profile's first hasher, and outdated costs.
+        old = PBKDF2PasswordHasher().encode("s3cret", "saltsaltsalt", iterations=1000)
+        User.objects.filter(pk=self.user.pk).update(password=old)
+        return old
+
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1)
+    def test_argon2_costs_come_from_settings(self):
+        hasher = hashers.Argon2idPasswordHasher()
+        encoded = hasher.encode("s3cret", hasher.salt())
+        self.assertIn("m=1024,t=1,p=1", encoded)
+        self.assertTrue(hasher.verify("s3cret", encoded))
+        with override_settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(hasher.must_update(encoded))
+
+    @override_settings(PASSWORD_REHASH_IN_BACKGROUND=False)
+    def test_outdated_hash_is_upgraded_on_login(self):
+        self.give_old_hash()
+        user = User.objects.get(pk=self.user.pk)
+        session_hash = user.get_session_auth_hash()
+
+        self.assertTrue(user.check_password("s3cret"))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("md5$"))  # the test profile's first hasher
+        self.assertTrue(user.check_password("s3cret"))
+        # Same password: the session that logged in stays valid.
+        self.assertEqual(user.get_session_auth_hash(), session_hash)
+
+    @override_settings(PASSWORD_REHASH_IN_BACKGROUND=False)
+    def test_wrong_password_is_not_upgraded(self):
+        old = self.give_old_hash()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.check_password("nope"))
+        user.refresh_from_db()
+        self.assertEqual(user.password, old)
+
+    def test_rehash_never_overwrites_a_changed_password(self):
+        old = self.give_old_hash()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("changed")
+        user.save()
+        self.assertFalse(hashers.rehash_password(user.pk, old, "s3cret"))
+        user.refresh_from_db()
+        self.assertTrue(user.check_password("changed"))
+
+    def test_unusable_password_ends_sessions(self):
+        self.client.force_login(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_unusable_password()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertFalse(get_user(self.client).is_authenticated)
+
+    def test_password_written_with_update_ends_sessions(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(password=make_password("changed"))
+        self.assertFalse(get_user(self.client).is_authenticated)
+
+    def test_rehash_runs_off_the_request(self):
+        old = self.give_old_hash()
+        user = User.objects.get(pk=self.user.pk)
+        with mock.patch.object(hashers, "_rehash_executor") as executor, self.assertNumQueries(0):
+            self.assertTrue(user.check_password("s3cret"))
+        executor.submit.assert_called_once_with(hashers._rehash_in_background, user.pk, old, "s3cret")
+        hashers._rehash_slots.release()  # the mocked executor never ran the job
+
+    def test_full_rehash_queue_drops_the_upgrade(self):
+        with mock.patch.object(hashers, "_rehash_slots", mock.Mock(**{"acquire.return_value": False})), \
+                mock.patch.object(hashers, "_rehash_executor") as executor:
+            hashers.schedule_rehash(self.user.pk, self.user.password, "s3cret")
+        executor.submit.assert_not_called()
+
+
+class HashingPoolTests(TestCase):
+    def pool(self, **kwargs):
+        # Threads instead of processes: the slot accounting is the same.
+        pool = hashers.HashingPool(workers=1, **kwargs)
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown, wait=True)
+        pool._get_executor = lambda: executor
+        return pool
+
+    def test_jobs_past_max_queue_are_rejected_at_once(self):
+        pool = self.pool(max_queue=1, timeout=5)
+        release = threading.Event()
+        waiter = threading.Thread(target=pool.run, args=(release.wait,))
+        waiter.start()
+        try:
+            while pool.stats()["in_flight"] < 1:
+                pass
+            with self.assertRaises(hashers.HashingPoolBusy):
+                pool.run(str, "second")
+        finally:
+            release.set()
+            waiter.join()
+        self.assertEqual(pool.run(str, "third"), "third")  # the slot is free again
+        stats = pool.stats()
+        self.assertEqual((stats["rejected"], stats["completed"], stats["in_flight"]), (1, 2, 0))
+
+    def test_a_slow_job_times_out_and_keeps_its_slot(self):
+        pool = self.pool(max_queue=1, timeout=0.01)
+        release = threading.Event()
+        with self.assertRaises(hashers.HashingPoolBusy):
+            pool.run(release.wait)
+        with self.assertRaises(hashers.HashingPoolBusy):
+            pool.run(str, "next")  # still running, still holding the only slot
+        release.set()
+        while pool.stats()["in_flight"]:
+            pass
+        self.assertEqual(pool.run(str, "after"), "after")
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    @override_settings(PASSWORD_HASH_MODE="pool")
+    def test_saturated_pool_turns_login_into_503(self):
+        User.objects.create_user(email="busy@example.com", password="s3cret")
+        busy = hashers.HashingPoolBusy("Too many password hashing jobs waiting.")
+        with mock.patch.object(hashers.hashing_pool, "run", side_effect=busy):
+            response = self.client.post(reverse("login"), {"email": "busy@example.com", "password": "s3cret"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertTemplateUsed(response, "users/busy.html")
+
+
+@override_settings(AUTH_USER_CACHE=True)
+class CachedSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="cached@example.com", password="s3cret", first_name="Old")
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        local_sessions.clear()
+
+    def test_user_is_loaded_once(self):
+        backend = EmailBackend()
+        with self.assertNumQueries(1):
+            backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.pk)
+        user.first_name = "Changed in memory"
+        self.assertEqual(backend.get_user(self.user.pk).first_name, "Old")  # callers get a copy
+
+    def test_saving_the_user_invalidates_it(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "New"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.user.pk).first_name, "New")
+
+    def test_password_change_reaches_the_cached_user(self):
+        backend = EmailBackend()
+        old_hash = backend.get_user(self.user.pk).get_session_auth_hash()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("changed")
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertNotEqual(backend.get_user(self.user.pk).get_session_auth_hash(), old_hash)
+
+    def test_settings_change_invalidates_the_mirrored_preferences(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSettings.objects.create(user=self.user, receive_emails=False)
+        fresh = User.objects.get(pk=self.user.pk).preferences
+        self.assertEqual(backend.get_user(self.user.pk).preferences, fresh)
+
+    def test_deactivated_user_is_not_served_from_cache(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_session_is_read_locally_and_unchanged_data_not_written(self):
+        session = SessionStore()
+        session["cart"] = [1, 2]
+        session.save()
+
+        again = SessionStore(session.session_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(again["cart"], [1, 2])
+            again["cart"] = [1, 2]  # marks it modified, same data
+            again.save()
+
+        again["cart"] = [3]
+        with self.assertNumQueries(3):  # savepoint, UPDATE, release
+            again.save()
+        self.assertEqual(SessionStore(session.session_key)["cart"], [3])
+
+        again.delete()
+        self.assertIsNone(local_sessions.get(session.session_key))
+
+
+class UserSettingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="settings@example.com", password="s3cret")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_first_save_creates_the_row(self):
+        self.client.get(reverse("settings_update"))  # context cached with unsaved defaults
+        # session, user; then in savepoints: the settings lookup, INSERT, the preferences mirror
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse("settings_update"), {"dark_mode": "on"})
+        self.assertRedirects(response, reverse("profile"), fetch_redirect_response=False)
+        saved = UserSettings.objects.get(user=self.user)
+        self.assertEqual((saved.dark_mode, saved.receive_emails), (True, False))
+
+    def test_concurrent_first_save_updates_the_other_row(self):
+        self.client.get(reverse("settings_update"))
+        # Another request saved the settings after this one loaded the defaults
+        # (its cache invalidation hasn't run: no on_commit in this test).
+        UserSettings.objects.create(user=self.user, receive_emails=True)
+
+        response = self.client.post(reverse("settings_update"), {"dark_mode": "on"})
+        self.assertEqual(response.status_code, 302)
+        saved = UserSettings.objects.get(user=self.user)
+        self.assertEqual((saved.dark_mode, saved.receive_emails), (True, False))
+
+
+class ProfileSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="profile@example.com", password="s3cret", first_name="Old")
+
+    def profile_data(self, **overrides):
+        return {"email": self.user.email, "first_name": "New", "last_name": "Doe", "phone_number": "555", **overrides}
+
+    def test_full_save_keeps_columns_written_elsewhere(self):
+        stale = User.objects.get(pk=self.user.pk)  # e.g. request.user, or a cached copy of it
+        UserSettings.objects.create(user=self.user, receive_emails=False, dark_mode=True)
+        seen = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(last_seen=seen)
+        expected = User.objects.get(pk=self.user.pk).preferences
+        self.assertNotEqual(stale.preferences, expected)
+
+        form = CustomUserChangeForm(self.profile_data(), instance=stale)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertEqual(fresh.first_name, "New")
+        self.assertEqual(fresh.preferences, expected)
+        self.assertEqual(fresh.last_seen, seen)
+
+    @override_settings(AUTH_USER_CACHE=True)
+    def test_profile_update_with_a_cached_user_keeps_preferences(self):
+        cache.clear()
+        local_users.clear()
+        self.client.force_login(self.user)
+        self.client.get(reverse("profile_update"))  # caches request.user
+        # Its invalidation runs on commit, which this test never reaches: request.user stays stale.
+        UserSettings.objects.create(user=self.user, receive_emails=False)
+        expected = User.objects.get(pk=self.user.pk).preferences
+
+        response = self.client.post(reverse("profile_update"), self.profile_data())
+        self.assertRedirects(response, reverse("profile"), fetch_redirect_response=False)
+        self.assertEqual(User.objects.get(pk=self.user.pk).preferences, expected)
+
+    def test_profile_update_refuses_a_non_image_while_streaming_it(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile("avatar.png", b"%PDF-1.7 not an image at all" * 100)
+
+        response = self.client.post(reverse("profile_update"), self.profile_data(profile_image=upload))
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context["form"], "profile_image", "Upload a JPEG, PNG, GIF or WebP image.")
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, "Old")
@@ -7,7 +7,7 @@ from ..models import *
 def deactivate_account_view(request):
     user = request.user
     user.is_active = False
-    user.save()
+    user.save(update_fields=["is_active"])
     logout(request)
     messages.success(request, "Your account has been deactivated.")
     return redirect('login')
@@ -1,8 +1,13 @@
+import asyncio
+
 from django.shortcuts import render, redirect 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from ..models import *
 from ..forms import  AddressForm
+from ..context import aget_user_context
+from apps.common.async_views import AsyncLoginRequiredMixin
+from apps.products.navigation import aload_navigation
 
 # for CBVs
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
@@ -25,14 +30,17 @@ def add_address_view(request):
         form = AddressForm()
     return render(request, 'users/add_address.html', {'form':form})
 
-class AddressListView(LoginRequiredMixin, ListView):
+class AddressListView(AsyncLoginRequiredMixin, ListView):
     model = Address 
     template_name = 'users/address_list.html'
     context_object_name = 'addresses'
 
-    def get_queryset(self):
-        # only return the addresses for the logged in users.
-        return Address.objects.filter(user= self.request.user)
+    async def get(self, request, *args, **kwargs):
+        # Async under ASGI (see apps/common/async_views.py).
+        # Only the logged in user's addresses (cached, see users/context.py).
+        user_context, _ = await asyncio.gather(aget_user_context(request), aload_navigation(request))
+        self.object_list = user_context.addresses
+        return self.render_to_response(self.get_context_data()).render()
 
 class AddressDetailView(LoginRequiredMixin, DetailView):
     model = Address
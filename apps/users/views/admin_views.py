@@ -1 +1,11 @@
 # (future) custom staff-only views
+from django.http import JsonResponse
+
+from apps.common.decorators import superuser_required
+from ..hashers import hashing_pool
+
+
+@superuser_required
+def hashing_stats_view(request):
+    """Password hashing pool saturation and latency in this worker process, as JSON."""
+    return JsonResponse(hashing_pool.stats())
@@ -7,11 +7,15 @@ from django.contrib.auth.decorators import login_required
 
 from ..models import *
 
+from apps.common.uploads import add_upload_errors, streaming_uploads
+
 from ..forms import CustomUserCreationForm, LoginForm
 # Create your views here.
+@streaming_uploads # The profile image streams to disk and is checked as it arrives (common/uploads.py).
 def register_view(request):
     if request.method == 'POST': # If the form is submitted (i.e., form uses method="POST"), process the data.
         form = CustomUserCreationForm(request.POST, request.FILES) # Instantiate the registration form with submitted data. Also handles file input (like profile images).
+        add_upload_errors(form, request) # A profile image the upload handler refused (too large, not an image) is a form error.
         if form.is_valid(): # form.is_valid() checks if all form validations pass.
             form.save() # If yes, save the new user to the database.
             messages.success(request, "Account created successfully! Please login to continue.")
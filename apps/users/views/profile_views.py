@@ -4,6 +4,10 @@ from django.contrib.auth.decorators import login_required
 
 from ..models import *
 from ..forms import  CustomUserChangeForm
+from ..context import aget_user_context, get_user_context
+from apps.common.async_views import AsyncLoginRequiredMixin
+from apps.common.images import aprefetch_image_variants
+from apps.common.uploads import add_upload_errors, streaming_uploads
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
@@ -11,39 +15,38 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 
 @login_required
 def profile_view(request):
-    user = request.user
-    addresses = Address.objects.filter(user = user)
-    settings = UserSettings.objects.filter(user = user)
+    user_context = get_user_context(request)  # settings + addresses, cached (see users/context.py)
     # return render(request, 'profile.html', {'user':user, 'addresses':addresses})
     context = {
-        'user': user,
-        'addresses' : addresses,
-        'settings': settings,
+        'user': request.user,
+        'addresses' : user_context.addresses,
+        'settings': user_context.settings,
     }
     return render(request, 'users/profile.html', context)
 
-class ProfileView(LoginRequiredMixin, TemplateView):
+class ProfileView(AsyncLoginRequiredMixin, TemplateView):
     template_name = "users/profile.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        # Get user info
-        user = self.request.user
-        context["user"] = user
-
-        # Get addresses
-        context["addresses"] = Address.objects.filter(user=user)
-
-        # ✅ Ensure settings always exist
-        settings_obj, created = UserSettings.objects.get_or_create(user=user)
-        context["settings"] = settings_obj
-
-        return context    
-
+    async def get(self, request, *args, **kwargs):
+        # Async under ASGI (see apps/common/async_views.py): load what the template reads, then render.
+        # Addresses and settings in at most two concurrent queries, usually none (see users/context.py).
+        # Missing settings show the defaults; the row is created on first save, not here.
+        user_context = await aget_user_context(request)
+        await aprefetch_image_variants([request.user.profile_image])
+
+        context = self.get_context_data(
+            user=request.user,
+            addresses=user_context.addresses,
+            settings=user_context.settings,
+            **kwargs,
+        )
+        return self.render_to_response(context).render()
+
+@streaming_uploads  # the profile image streams to disk and is checked as it arrives (common/uploads.py)
 def profile_update_view(request):
     if request.method == 'POST':
         form = CustomUserChangeForm(request.POST, request.FILES, instance = request.user)  # The instance=request.user binds the form to the logged-in user's instance, so it updates rather than creates.
+        add_upload_errors(form, request)  # refused uploads (too large, not an image) become form errors
 
         if form.is_valid():
             form.save()
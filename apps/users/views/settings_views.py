@@ -1,8 +1,10 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponseRedirect
 from django.views.generic import UpdateView
 from django.urls import reverse_lazy
 from ..models.user import UserSettings
 from ..forms import SettingsForm
+from ..context import get_user_context
 
 class UserSettingsUpdateView(LoginRequiredMixin, UpdateView):
     model = UserSettings 
@@ -11,6 +13,15 @@ class UserSettingsUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('profile') # redirect after saving
 
     def get_object(self, queryset=None):
-        # Ensure settings always exist for the logged-in user
-        obj, created = UserSettings.objects.get_or_create(user=self.request.user)
-        return obj
\ No newline at end of file
+        # Unsaved defaults if the user has no settings yet; saving the form creates the row.
+        return get_user_context(self.request).settings
+
+    def form_valid(self, form):
+        if not form.instance._state.adding:
+            return super().form_valid(form)
+        # First save. Another request (a second tab, a double submit) may have created the
+        # row since the defaults were loaded: update it then, instead of a second INSERT
+        # failing on the unique user_id.
+        values = {name: form.cleaned_data[name] for name in form._meta.fields}
+        self.object, _ = UserSettings.objects.update_or_create(user=self.request.user, defaults=values)
+        return HttpResponseRedirect(self.get_success_url())
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# No persistent connections by default under ASGI (see DATABASES in core/settings.py).
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,75 @@
+"""
+DATABASES entries from database URLs (dj-database-url), tuned per backend.
+
+PostgreSQL
+- Connections are reused instead of opened per request: either psycopg's
+  connection pool (`pool`, Django >= 5.1 with psycopg[pool]) or persistent
+  connections (`conn_max_age`) with a health check before reuse.
+- `statement_timeout` (ms) makes the server cancel runaway queries.
+- `pgbouncer`: the URL points at PgBouncer in transaction mode, which can't
+  keep server-side cursors open across statements.
+
+SQLite (dev and local load tests)
+- WAL, so readers don't wait for the writer and the writer doesn't wait for readers.
+- synchronous=NORMAL: safe with WAL, no fsync per commit.
+- A memory-mapped file and a larger page cache.
+- BEGIN IMMEDIATE: a transaction takes the write lock when it starts, so two
+  read-then-write transactions queue up instead of one of them failing with
+  "database is locked" on its first write (waiting can't help a transaction
+  that has already read, so SQLite doesn't). `sqlite_immediate=False` keeps
+  SQLite's deferred transactions, for databases where nothing can wait for a
+  lock anyway (the shared-cache in-memory test database).
+- `sqlite_busy_timeout` (seconds) to wait for the write lock.
+"""
+import dj_database_url
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def database_config(
+    url,
+    *,
+    conn_max_age=60,
+    pool=False,
+    pool_min_size=2,
+    pool_max_size=10,
+    pool_timeout=10,
+    statement_timeout=0,
+    connect_timeout=5,
+    pgbouncer=False,
+    sqlite_mmap_size=256 * 1024 * 1024,
+    sqlite_cache_size=64 * 1024,
+    sqlite_busy_timeout=20,
+    sqlite_immediate=True,
+):
+    """One DATABASES entry for `url`; see the module docstring for the options."""
+    db = dj_database_url.parse(
+        url, conn_max_age=conn_max_age, conn_health_checks=True, disable_server_side_cursors=pgbouncer
+    )
+    options = db.setdefault("OPTIONS", {})
+
+    if db["ENGINE"] == "django.db.backends.postgresql":
+        options.setdefault("connect_timeout", connect_timeout)
+        if statement_timeout:
+            options["options"] = f"-c statement_timeout={statement_timeout}"
+        if pool:
+            # The pool hands out healthy connections itself, and Django refuses
+            # a pool together with persistent connections.
+            db["CONN_MAX_AGE"] = 0
+            db["CONN_HEALTH_CHECKS"] = False
+            options["pool"] = {"min_size": pool_min_size, "max_size": pool_max_size, "timeout": pool_timeout}
+
+    elif db["ENGINE"] == "django.db.backends.sqlite3":
+        options["init_command"] = ";".join(
+            SQLITE_PRAGMAS
+            + (f"PRAGMA mmap_size={sqlite_mmap_size}", f"PRAGMA cache_size=-{sqlite_cache_size}")  # KiB
+        )
+        if sqlite_immediate:
+            options["transaction_mode"] = "IMMEDIATE"
+        options["timeout"] = sqlite_busy_timeout
+
+    return db
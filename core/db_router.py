@@ -0,0 +1,52 @@
+"""
+Read replicas (DATABASE_REPLICA_URLS).
+
+Reads go to a random replica, except
+- inside a transaction on the primary (the rows may be locked or just written),
+- for the rest of a request after it wrote anything (read your own writes),
+- for PRIMARY_APPS: a session or login written by one request must be
+  readable by the next one, whatever the replication lag.
+Writes and migrations always go to the primary ("default").
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_APPS = {"sessions", "auth", "users"}
+
+_wrote = ContextVar("wrote_to_primary", default=False)
+
+
+def _forget_writes(**kwargs):
+    _wrote.set(False)
+
+
+request_started.connect(_forget_writes)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.replicas = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+    def db_for_read(self, model, **hints):
+        if (
+            not self.replicas
+            or _wrote.get()
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # the replicas hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+
+from core.database import database_config
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +45,7 @@ INSTALLED_APPS = [
     # local apps
     "apps.users",
     "apps.common",
+    "apps.products",
 
     # third-party apps
     "crispy_forms",
@@ -62,6 +66,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.users.middleware.LastSeenMiddleware',
+    'apps.users.middleware.HashingBackpressureMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,6 +84,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.products.context_processors.navigation',
+                'apps.users.context_processors.preferences',
             ],
         },
     },
@@ -89,14 +97,76 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_URL picks the backend (default: SQLite in the project directory); core/database.py
+# tunes it: pooled or persistent PostgreSQL connections with a statement timeout, WAL for SQLite.
+# Compare the per-request connection cost of the setups with `manage.py benchmark_db_connections`.
+# Persistent connections are per thread, and under ASGI sync code runs on changing threads, which
+# would leave connections open until they time out: DATABASE_CONN_MAX_AGE defaults to 0 when
+# served by core/asgi.py. Reuse connections under ASGI with DATABASE_POOL (PostgreSQL) instead.
+# DATABASE_STATEMENT_TIMEOUT applies to every query of the process, so set it for the web
+# processes only; migrations and backfills (management commands) legitimately run longer.
+DATABASE_URL = config('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+DATABASE_OPTIONS = {
+    'conn_max_age': config(  # seconds a connection is reused
+        'DATABASE_CONN_MAX_AGE', default=0 if os.environ.get('SERVER_INTERFACE') == 'asgi' else 60, cast=int
+    ),
+    'pool': config('DATABASE_POOL', default=False, cast=bool),  # PostgreSQL: psycopg pool instead
+    'pool_min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+    'pool_max_size': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+    'pool_timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+    'statement_timeout': config('DATABASE_STATEMENT_TIMEOUT', default=0, cast=int),  # ms, 0 = none
+    'pgbouncer': config('DATABASE_PGBOUNCER', default=False, cast=bool),
+    'sqlite_mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),  # bytes
+    'sqlite_busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),  # seconds
+    # Off in core/test_settings.py (see there).
+    'sqlite_immediate': config('SQLITE_IMMEDIATE', default=True, cast=bool),
+}
+DATABASES = {'default': database_config(DATABASE_URL, **DATABASE_OPTIONS)}
+# Read replicas (comma separated URLs); core/db_router.py sends reads there.
+for number, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{number}'] = {**database_config(url, **DATABASE_OPTIONS), 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter'] if len(DATABASES) > 1 else []
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMem by default (per-process, fine for dev and tests); point CACHE_BACKEND/CACHE_LOCATION
+# at Redis or Memcached in production so all workers share one cache.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='rasuwas-mart'),
     }
 }
 
 
+# Admin
+# Performance mode for changelists over huge tables (apps/common/admin_performance.py):
+# estimated counts, autocomplete foreign key filters, cached thumbnail URLs.
+ADMIN_PERFORMANCE_MODE = config('ADMIN_PERFORMANCE_MODE', default=True, cast=bool)
+ADMIN_FILE_URL_TTL = 300  # seconds a thumbnail URL is reused
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+# "cache": cached_db plus a per-process LRU, write-back only on real changes, batched
+# cleanup and a cached request.user (apps/users/sessions.py). Compare the modes with
+# `manage.py loadtest_sessions`.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'apps.users.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = config('SESSION_MODE', default='db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+# Max staleness of another worker's local copy of a session / user, in seconds (0 = no local copy).
+SESSION_LOCAL_CACHE_TTL = config('SESSION_LOCAL_CACHE_TTL', default=5, cast=int)
+SESSION_LOCAL_CACHE_SIZE = config('SESSION_LOCAL_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE = config('AUTH_USER_CACHE', default=SESSION_MODE == 'cache', cast=bool)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -116,6 +186,51 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# The first hasher of the profile hashes new passwords; the others only verify old
+# hashes, which are upgraded on the next login (apps/users/hashers.py).
+# "fast" is for test suites only: core/test_settings.py picks it unless overridden.
+PASSWORD_HASHING_PROFILES = {
+    'argon2': [
+        'apps.users.hashers.Argon2idPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    'pbkdf2': [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'apps.users.hashers.Argon2idPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    'fast': [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'apps.users.hashers.Argon2idPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ],
+}
+PASSWORD_HASHING_PROFILE = config('PASSWORD_HASHING_PROFILE', default='argon2')  # 'fast' in core/test_settings.py
+PASSWORD_HASHERS = PASSWORD_HASHING_PROFILES[PASSWORD_HASHING_PROFILE]
+# Argon2id costs. Raise memory before time; keep parallelism at 1 on busy multi-worker
+# hosts (each worker already has its own core). Check with `manage.py benchmark_hashers`.
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=65536, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_REHASH_IN_BACKGROUND = config('PASSWORD_REHASH_IN_BACKGROUND', default=True, cast=bool)
+# "inline": hash on the request thread. "pool": hash in a bounded process pool; when more than
+# PASSWORD_HASH_POOL_MAX_QUEUE jobs are in flight, logins/registrations get a 503 right away.
+# Pool metrics: /internal/hashing-stats/
+PASSWORD_HASH_MODE = config('PASSWORD_HASH_MODE', default='inline')
+PASSWORD_HASH_POOL_WORKERS = config('PASSWORD_HASH_POOL_WORKERS', default=0, cast=int) or None  # None = one per core
+PASSWORD_HASH_POOL_MAX_QUEUE = config('PASSWORD_HASH_POOL_MAX_QUEUE', default=32, cast=int)
+PASSWORD_HASH_POOL_TIMEOUT = config('PASSWORD_HASH_POOL_TIMEOUT', default=5.0, cast=float)
+
+# Buffered writes (product counters, user activity) get one last flush when the process
+# exits. Off in core/test_settings.py.
+FLUSH_BUFFERS_ON_EXIT = config('FLUSH_BUFFERS_ON_EXIT', default=True, cast=bool)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -133,6 +248,34 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Image uploads stream to a temporary file and are checked as they arrive, in the views that take
+# them (apps/common/uploads.py); FILE_UPLOAD_HANDLERS stays Django's default everywhere else.
+# Keep FILE_UPLOAD_TEMP_DIR on the same filesystem as MEDIA_ROOT: saving is then a rename, not a copy.
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+UPLOAD_MAX_FILE_SIZE = config('UPLOAD_MAX_FILE_SIZE', default=10 * 1024 * 1024, cast=int)
+UPLOAD_MAX_REQUEST_SIZE = config('UPLOAD_MAX_REQUEST_SIZE', default=25 * 1024 * 1024, cast=int)
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_UPLOAD_MAX_PIXELS = config('IMAGE_UPLOAD_MAX_PIXELS', default=40_000_000, cast=int)
+
+# Resized WebP variants of uploads, stored next to the original (apps/common/images.py).
+# Backfill existing images with `manage.py generate_image_derivatives`.
+IMAGE_DERIVATIVE_FIELDS = [
+    'products.Product.image',
+    'products.ProductImage.image',
+    'products.Category.image',
+    'users.CustomUser.profile_image',
+]
+IMAGE_DERIVATIVES = {
+    'thumb': {'size': (80, 80), 'crop': True},  # admin changelists, avatars
+    'small': {'size': (320, 320)},
+    'medium': {'size': (800, 800)},
+    'large': {'size': (1600, 1600)},
+}
+IMAGE_DERIVATIVE_FORMAT = 'WEBP'
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)  # 0 = generate inline
+IMAGE_DERIVATIVE_MAX_PENDING = 100
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # optional, useful for deployment
 
@@ -156,3 +299,27 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+
+# send_html_email() queues into the email outbox ("outbox", delivered by
+# `manage.py run_email_worker`) or sends inside the request ("sync").
+EMAIL_DELIVERY_MODE = config('EMAIL_DELIVERY_MODE', default='outbox')
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_RETRY_BACKOFF = 30  # seconds before the first retry, doubled on each one
+EMAIL_OUTBOX_RETRY_MAX_BACKOFF = 3600
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300  # a claimed batch not finished by then is retried
+EMAIL_OUTBOX_KEEP_DAYS = 7  # sent emails are purged after this
+# Bulk mailings (common/fanout.py, `manage.py send_newsletter`)
+MAILING_CHUNK_SIZE = config('MAILING_CHUNK_SIZE', default=1000, cast=int)
+MAILING_RENDER_WORKERS = config('MAILING_RENDER_WORKERS', default=os.cpu_count() or 1, cast=int)  # 0 = render in the sending process
+
+# Product search (products/search.py): a category or tag rename reindexes its products in a
+# background thread (inline when False). Past SEARCH_REINDEX_MAX_PENDING waiting jobs, renames
+# are not reindexed until `manage.py rebuild_search_index` runs.
+SEARCH_REINDEX_IN_BACKGROUND = config('SEARCH_REINDEX_IN_BACKGROUND', default=True, cast=bool)
+SEARCH_REINDEX_MAX_PENDING = 20
+
+# Stock reservations (products/inventory.py): how long checkout holds stock, and
+# how many expired holds `manage.py reap_reservations` returns per transaction.
+INVENTORY_RESERVATION_TTL = config('INVENTORY_RESERVATION_TTL', default=900, cast=int)
+INVENTORY_REAP_BATCH_SIZE = 500
@@ -0,0 +1,24 @@
+"""
+Settings for the test suite: core.settings with test defaults.
+
+Used by `manage.py test` (see manage.py) and by pytest (pytest.ini). Each
+default can still be overridden from the environment, like in core/settings.py.
+"""
+
+from core.settings import *  # noqa: F401,F403
+from core.settings import DATABASES, PASSWORD_HASHING_PROFILES, config
+
+# The test database is shared-cache in-memory SQLite, where a lock conflict fails at once
+# instead of waiting, and BEGIN IMMEDIATE makes every transaction (reads included) take
+# the write lock. Keep SQLite's deferred transactions.
+if not config('SQLITE_IMMEDIATE', default=False, cast=bool):
+    for database in DATABASES.values():
+        database.get('OPTIONS', {}).pop('transaction_mode', None)
+
+# MD5: a login costs microseconds instead of a real Argon2id hash.
+PASSWORD_HASHING_PROFILE = config('PASSWORD_HASHING_PROFILE', default='fast')
+PASSWORD_HASHERS = PASSWORD_HASHING_PROFILES[PASSWORD_HASHING_PROFILE]
+
+# The test database is gone when the process exits; a last flush of the buffered
+# writes would land in the real one.
+FLUSH_BUFFERS_ON_EXIT = config('FLUSH_BUFFERS_ON_EXIT', default=False, cast=bool)
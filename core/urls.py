@@ -17,10 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from .views import homepage_view
+from apps.common.views import cache_stats_view, outbox_stats_view
+from apps.users.views import hashing_stats_view
 
 
 urlpatterns = [
     path('', homepage_view, name = 'home'),
     path('admin/', admin.site.urls),
-    path('users/', include('apps.users.urls'))
+    path('users/', include('apps.users.urls')),
+    path('products/', include('apps.products.urls')),
+    path('internal/cache-stats/', cache_stats_view, name='cache_stats'),
+    path('internal/email-outbox/', outbox_stats_view, name='outbox_stats'),
+    path('internal/hashing-stats/', hashing_stats_view, name='hashing_stats'),
 ]
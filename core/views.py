@@ -1,10 +1,43 @@
+import asyncio
+
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.views .generic import ListView, CreateView,DetailView,UpdateView,DeleteView
 
+from apps.common.async_views import aload_user
+from apps.common.images import aprefetch_image_variants
+from apps.products.models import Product
+from apps.products.navigation import aload_navigation
+
 # Create your views here.
 # 2 -> FBV,CBV (function base views, )
 
+HOMEPAGE_RAIL_SIZE = 8
+# rail name -> flag; each one is served by its partial index (product_featured_idx, ...)
+HOMEPAGE_RAILS = {
+    "featured": "is_featured",
+    "on_sale": "is_on_sale",
+    "bestsellers": "is_bestseller",
+}
+
+
+async def _rail(flag):
+    products = (
+        Product.objects.published()
+        .filter(**{flag: True})
+        .order_by("-created_at", "-id")
+        .only("id", "name", "slug", "price", "discount_price", "currency", "image")
+    )
+    return [product async for product in products[:HOMEPAGE_RAIL_SIZE]]
+
+
 #Function Base Views
-def homepage_view(request):
-    return render(request, 'home.html')
\ No newline at end of file
+async def homepage_view(request):
+    # Async under ASGI (see apps/common/async_views.py): the user and the three rails are
+    # loaded concurrently with the navigation, then the template renders from memory.
+    _, _, *rails = await asyncio.gather(
+        aload_user(request), aload_navigation(request), *(_rail(flag) for flag in HOMEPAGE_RAILS.values())
+    )
+    rails = dict(zip(HOMEPAGE_RAILS, rails))
+    await aprefetch_image_variants([product.image for rail in rails.values() for product in rail])
+    return render(request, 'home.html', {'rails': rails})